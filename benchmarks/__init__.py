@@ -0,0 +1 @@
+# Created by Andre Machon 18/10/2026
@@ -0,0 +1,49 @@
+# Created by Andre Machon 18/10/2026
+"""Compares the end to end latency of Analyzer and AsyncAnalyzer on a fleet whose installations and plugins are git
+repositories, with --git-state
+
+    python -m benchmarks.bench_async_analyzer --installations 30 --plugins 10 --repeat 3
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from ilinfo import Analyzer, AsyncAnalyzer, IliasFileParser, JSONOutput
+from benchmarks.fleet import build_fleet
+
+
+def run(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        root = os.path.join(tmp, 'fleet')
+        build_fleet(root, args.installations, args.plugins, args.clients, data_dirs=10, depth=2, git=True)
+
+        results = {}
+        for name, analyzer_class, kwargs in (
+                ('Analyzer', Analyzer, {}),
+                ('AsyncAnalyzer', AsyncAnalyzer, {'io_concurrency': args.io_workers})):
+            best = None
+            for _ in range(args.repeat):
+                analyzer = analyzer_class(
+                    IliasFileParser(git_state=True, git_concurrency=args.git_concurrency),
+                    output_processor=JSONOutput(output_path=os.path.join(tmp, name)), **kwargs
+                )
+                start = time.perf_counter()
+                output = analyzer.analyze_path(root)
+                elapsed = time.perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+            with open(output) as f:
+                results[name] = f.read()
+            print(f'{name:<14} {best * 1000:9.1f} ms')
+        print(f"identical output: {results['Analyzer'] == results['AsyncAnalyzer']}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--installations', type=int, default=30)
+    parser.add_argument('--plugins', type=int, default=10)
+    parser.add_argument('--clients', type=int, default=2)
+    parser.add_argument('--io-workers', type=int, default=8)
+    parser.add_argument('--git-concurrency', type=int, default=8)
+    parser.add_argument('--repeat', type=int, default=3)
+    run(parser.parse_args())
@@ -0,0 +1,94 @@
+# Created by Andre Machon 18/10/2026
+"""Compares writing an inventory through the former deep copying accessors with the read-only views, measuring time
+and peak memory
+
+    python -m benchmarks.bench_data_access --installations 1000 --plugins 30 --clients 3
+"""
+import argparse
+import json
+import tempfile
+import time
+import tracemalloc
+from copy import deepcopy
+
+from ilinfo import IliasFileParser, JSONOutput
+from ilinfo.utils import parse_ini_to_dict, parse_php_assignments
+from benchmarks.fleet import FIXTURE_FILES_DIR, PLUGIN_SLOT
+
+
+def build_parser(installations, plugins, clients):
+    parser = IliasFileParser()
+    ilias_ini = parse_ini_to_dict(str(FIXTURE_FILES_DIR / 'ilias.ini.php'))
+    client_ini = parse_ini_to_dict(str(FIXTURE_FILES_DIR / 'client.ini.php'))
+    plugin_php = parse_php_assignments((FIXTURE_FILES_DIR / 'plugin.php').read_bytes())
+
+    for i in range(installations):
+        ilias_path = f'/srv/www/customer_{i:04d}/ILIAS'
+        parser._add_installation({
+            'ilias_path': ilias_path,
+            'ilias.ini.php': dict(ilias_ini, source_file=f'{ilias_path}/ilias.ini.php'),
+            'client.ini.php': [
+                {section: dict(values) if isinstance(values, dict) else f'{ilias_path}/data/client_{c}/client.ini.php'
+                 for section, values in client_ini.items()}
+                for c in range(clients)
+            ],
+            'plugin.php': [
+                dict(plugin_php, source_file=f'{ilias_path}/{PLUGIN_SLOT}/Plugin{p:03d}/plugin.php',
+                     remotes={'origin': f'https://git.example.com/plugins/Plugin{p:03d}.git'})
+                for p in range(plugins)
+            ],
+        })
+    return parser
+
+
+def legacy_output(data, output_path):
+    # how JSONOutput.output_data used to do it, file_parser.data deep copied the whole inventory on every access
+    if not deepcopy(data):
+        raise ValueError
+    with open(f'{output_path}/ilinfo.json', 'w') as jsonfile:
+        json.dump(deepcopy(data), jsonfile)
+
+
+def view_output(parser, output_path):
+    JSONOutput(output_path=output_path).output_data(parser)
+
+
+def measure(func, *args):
+    # tracing slows python down a lot, time and peak memory are taken in separate runs
+    start = time.perf_counter()
+    func(*args)
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    func(*args)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def repeat(access, times):
+    for _ in range(times):
+        access()
+
+
+def run(args):
+    parser = build_parser(args.installations, args.plugins, args.clients)
+    # the mutable dicts the parser used to keep
+    data = parser.snapshot()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, func, source in (('deepcopy', legacy_output, data), ('views', view_output, parser)):
+            elapsed, peak = measure(func, source, tmp)
+            print(f'{name:<9} output_data {elapsed * 1000:9.1f} ms   peak {peak / 2 ** 20:7.1f} MiB')
+
+    for name, access in (('deepcopy', lambda: deepcopy(data)), ('views', lambda: parser.data)):
+        elapsed, peak = measure(repeat, access, args.accesses)
+        print(f'{name:<9} {args.accesses} x data {elapsed * 1000:9.1f} ms   peak {peak / 2 ** 20:7.1f} MiB')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--installations', type=int, default=1000)
+    parser.add_argument('--plugins', type=int, default=30)
+    parser.add_argument('--clients', type=int, default=3)
+    parser.add_argument('--accesses', type=int, default=10)
+    run(parser.parse_args())
@@ -0,0 +1,77 @@
+# Created by Andre Machon 18/10/2026
+"""Compares the former three walk discovery with the single pass IliasPathFinder.discover
+
+    python -m benchmarks.bench_discovery --installations 10 --plugins 20 --data-dirs 2000
+"""
+import argparse
+import os
+import tempfile
+import time
+from os import path as osp
+
+from ilinfo import IliasPathFinder
+from ilinfo.discovery import TreeWalker, DISCOVERY_FILES
+from benchmarks.fleet import build_fleet
+
+
+def legacy_discovery(start_path):
+    """The discovery as it was done before: a walk for ilias.php, one for plugin.php and one per installation
+
+    :return: number of visited directories
+    :rtype: int
+    """
+    visited = 0
+
+    def walk(path, filename):
+        nonlocal visited
+        for current_path, dirnames, filenames in os.walk(path):
+            visited += 1
+            if filename in filenames:
+                yield osp.join(current_path, filename)
+
+    for ilias_php in list(walk(start_path, 'ilias.php')):
+        list(walk(osp.dirname(ilias_php), 'client.ini.php'))
+    list(walk(start_path, 'plugin.php'))
+    return visited
+
+
+def single_pass_discovery(start_path):
+    IliasPathFinder().discover(start_path)
+
+
+def count_single_pass(start_path):
+    # discover walks exactly like this, the walk is repeated outside of the timing to get hold of the counter
+    walker = TreeWalker(DISCOVERY_FILES, ['_Examples'])
+    walker.scan(start_path)
+    return walker.dirs_visited
+
+
+def timed(func, start_path, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(start_path)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def run(args):
+    with tempfile.TemporaryDirectory() as root:
+        build_fleet(root, args.installations, args.plugins, args.clients, args.data_dirs)
+        results = (
+            ('three walks', legacy_discovery(root), timed(legacy_discovery, root, args.repeat)),
+            ('single pass', count_single_pass(root), timed(single_pass_discovery, root, args.repeat)),
+        )
+        for name, visited, best in results:
+            print(f'{name:<12} directories visited: {visited:>8}   best of {args.repeat}: {best * 1000:9.1f} ms')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--installations', type=int, default=10)
+    parser.add_argument('--plugins', type=int, default=20)
+    parser.add_argument('--clients', type=int, default=2)
+    parser.add_argument('--data-dirs', type=int, default=2000)
+    parser.add_argument('--repeat', type=int, default=3)
+    run(parser.parse_args())
@@ -0,0 +1,49 @@
+# Created by Andre Machon 18/10/2026
+"""Compares parsing client.ini.php and ilias.ini.php files with ConfigParser and with IniReader
+
+    python -m benchmarks.bench_ini_reader --files 2000 --repeat 3
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from ilinfo import IliasFileParser
+from ilinfo.utils import _parse_ini_configparser
+from benchmarks.fleet import FIXTURE_FILES_DIR
+
+
+def run(args):
+    client_ini = (FIXTURE_FILES_DIR / 'client.ini.php').read_text()
+    ilias_ini = (FIXTURE_FILES_DIR / 'ilias.ini.php').read_text()
+    readers = {'client.ini.php': IliasFileParser._CLIENT_INI_READER, 'ilias.ini.php': IliasFileParser._ILIAS_INI_READER}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        files = []
+        for n in range(args.files):
+            # roughly one ilias.ini.php per ten clients, as on the servers
+            name = 'ilias.ini.php' if n % 10 == 0 else 'client.ini.php'
+            file_path = os.path.join(tmp, f'{n}.{name}')
+            with open(file_path, 'w') as f:
+                f.write((ilias_ini if name == 'ilias.ini.php' else client_ini).replace('CLIENT_NAME', f'client_{n}'))
+            files.append((name, file_path))
+
+        results = {}
+        for label, parse in (
+                ('configparser', lambda name, path: _parse_ini_configparser(path, readers[name]._parse_config)),
+                ('IniReader', lambda name, path: readers[name].read(path))):
+            best = None
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                results[label] = [parse(name, file_path) for name, file_path in files]
+                elapsed = time.perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+            print(f'{label:<13} {best * 1000:9.1f} ms')
+        print(f"identical results: {results['configparser'] == results['IniReader']}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--files', type=int, default=2000)
+    parser.add_argument('--repeat', type=int, default=3)
+    run(parser.parse_args())
@@ -0,0 +1,67 @@
+# Created by Andre Machon 18/10/2026
+"""Compares parsing a fleet without the parse cache, with an empty one and with the one an earlier run left behind
+
+    python -m benchmarks.bench_parse_cache --installations 200 --plugins 30 --repeat 3
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from ilinfo import IliasFileParser, IliasPathFinder
+from ilinfo.cache import ParseCache
+from benchmarks.fleet import build_fleet
+
+
+def age_files(root, seconds=3600):
+    # files modified just before a run are not trusted by their stat(), on the servers they are months old
+    for dir_path, _, names in os.walk(root):
+        for name in names:
+            path = os.path.join(dir_path, name)
+            stat = os.stat(path)
+            os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns - seconds * 10 ** 9))
+
+
+def parse(root, parse_cache):
+    # the pathfinder is used up by parsing, every run needs one of its own
+    pathfinder = IliasPathFinder()
+    pathfinder.discover(root)
+    parser = IliasFileParser(parse_cache=parse_cache)
+    start = time.perf_counter()
+    data = parser.parse_from_pathfinder(pathfinder)
+    elapsed = time.perf_counter() - start
+    if parse_cache is not None:
+        parse_cache.close()
+    return data, elapsed, parser.stats().get('parse_cache')
+
+
+def run(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        root = os.path.join(tmp, 'fleet')
+        build_fleet(root, args.installations, args.plugins, args.clients, data_dirs=10, depth=2)
+        age_files(root)
+        cache_file = os.path.join(tmp, 'parsecache.sqlite3')
+
+        results = {}
+        for label, new_cache in (
+                ('no cache', lambda run: None),
+                ('cold cache', lambda run: ParseCache(os.path.join(tmp, f'cold-{run}.sqlite3'))),
+                ('warm cache', lambda run: ParseCache(cache_file))):
+            if label == 'warm cache':
+                parse(root, ParseCache(cache_file))
+            best, stats = None, None
+            for n in range(args.repeat):
+                results[label], elapsed, stats = parse(root, new_cache(n))
+                best = elapsed if best is None else min(best, elapsed)
+            counts = f"   {stats['hits']} hits, {stats['misses']} misses" if stats else ''
+            print(f'{label:<11} {best * 1000:9.1f} ms{counts}')
+        print(f"identical results: {results['no cache'] == results['cold cache'] == results['warm cache']}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--installations', type=int, default=200)
+    parser.add_argument('--plugins', type=int, default=30)
+    parser.add_argument('--clients', type=int, default=3)
+    parser.add_argument('--repeat', type=int, default=3)
+    run(parser.parse_args())
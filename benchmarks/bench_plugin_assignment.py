@@ -0,0 +1,57 @@
+# Created by Andre Machon 18/10/2026
+"""Compares assigning plugins to installations by substring test with the PathTrie lookup
+
+    python -m benchmarks.bench_plugin_assignment --installations 100 --plugins 10000
+"""
+import argparse
+import random
+import time
+from os import path as osp
+
+from ilinfo.discovery import PathTrie
+from benchmarks.fleet import PLUGIN_SLOT
+
+
+def substring_assignment(ilias_paths, plugin_paths):
+    # how IliasPathFinder.find_plugins used to do it
+    assigned = {path: {} for path in ilias_paths}
+    for plugin_path in plugin_paths:
+        for path, plugins in assigned.items():
+            if path in plugin_path:
+                plugins[osp.basename(plugin_path)] = plugin_path
+    return assigned
+
+
+def trie_assignment(ilias_paths, plugin_paths):
+    assigned = {path: {} for path in ilias_paths}
+    installations = PathTrie(ilias_paths)
+    for plugin_path in plugin_paths:
+        ilias_path = installations.nearest(plugin_path)
+        if ilias_path is not None:
+            assigned[ilias_path][osp.basename(plugin_path)] = plugin_path
+    return assigned
+
+
+def run(args):
+    rnd = random.Random(0)
+    # /srv/www/customer_1 is a prefix of /srv/www/customer_10 ..., which trips the substring test
+    ilias_paths = [f'/srv/www/customer_{i}' for i in range(args.installations)]
+    plugin_paths = [
+        f'{rnd.choice(ilias_paths)}/{PLUGIN_SLOT}/Plugin{p:05d}' for p in range(args.plugins)
+    ]
+
+    results = {}
+    for name, func in (('substring', substring_assignment), ('trie', trie_assignment)):
+        start = time.perf_counter()
+        results[name] = func(ilias_paths, plugin_paths)
+        elapsed = time.perf_counter() - start
+        assigned = sum(len(plugins) for plugins in results[name].values())
+        print(f'{name:<10} {elapsed * 1000:9.1f} ms   assignments: {assigned}')
+    print(f"wrong substring assignments: {sum(len(p) for p in results['substring'].values()) - args.plugins}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--installations', type=int, default=100)
+    parser.add_argument('--plugins', type=int, default=10000)
+    run(parser.parse_args())
@@ -0,0 +1,115 @@
+# Created by Andre Machon 18/10/2026
+"""Compares the line based plugin.php regexes with the single pass parse_php_assignments on a synthetic corpus
+
+    python -m benchmarks.bench_plugin_php --files 5000 --repeat 3
+"""
+import argparse
+import random
+import re
+import tempfile
+import time
+from os import path as osp
+
+from ilinfo import IliasFileParser
+from ilinfo.utils import parse_php_assignments
+
+LICENSE_HEADER = b"""/* Copyright (c) 1998-2021 ILIAS open source, Extended GPL, see docs/LICENSE */
+/**
+ * Plugin definition, see https://docu.ilias.de/goto_docu_pg_29963_42.html
+ *
+ * $version = "0.0.0"; is read by the ILIAS setup from the assignments below, not from this comment
+ */
+"""
+
+VERSIONS = ['1.1.0', '2.0.12', '3.4.1-beta', '7.0.0-rc.2', 'v1.3.5', '1.0.0_r7']
+MIN_VERSIONS = ['5.3.0', '5.4.0', '6.0', '7.0']
+MAX_VERSIONS = ['5.4.999', '6.999', '7.999', '8.999']
+RESPONSIBLES = [b'Andre Machon', b'J\xc3\xbcrgen M\xc3\xbcller', b'S\xe9verine Dupont', b'studer + raimann ag']
+
+
+def plugin_php(rnd, n):
+    quote = rnd.choice((b"'", b'"'))
+    newline = rnd.choice((b'\n', b'\r\n'))
+
+    def assign(name, value):
+        value = value if isinstance(value, bytes) else value.encode()
+        separator = b'\n    ' if rnd.random() < 0.1 else b' '
+        return b'$' + name.encode() + b' =' + separator + quote + value + quote + b';'
+
+    lines = [b'<?php']
+    if rnd.random() < 0.7:
+        lines.extend(LICENSE_HEADER.splitlines())
+    lines.extend([
+        assign('id', f'xp{n:04d}'),
+        assign('version', rnd.choice(VERSIONS)),
+        assign('ilias_min_version', rnd.choice(MIN_VERSIONS)),
+        assign('ilias_max_version', rnd.choice(MAX_VERSIONS)),
+        # a latin-1 name in a utf-8 file, as some older plugins have it
+        assign('responsible', rnd.choice(RESPONSIBLES)),
+        assign('responsible_mail', f'support{n}@example.com'),
+    ])
+    if rnd.random() < 0.3:
+        lines.append(b"define('IL_PLUGIN_" + str(n).encode() + b"_VERSION', '" + rnd.choice(VERSIONS).encode() + b"');")
+    lines.extend([assign('learning_progress', 'true'), assign('supports_export', 'true')])
+    # some plugins carry their update logic in plugin.php
+    lines.extend(b'    $ilDB->manipulate("UPDATE xp_config SET value = \'' + str(i).encode() + b'\'");'
+                 for i in range(rnd.randint(0, 200)))
+    return newline.join(lines) + newline
+
+
+def legacy_parse_plugin_php(file_path, encoding='utf-8'):
+    # how IliasFileParser.parse_plugin_php used to do it
+    d = {"source_file": file_path}
+    with open(file_path, encoding=encoding) as plugin_php:
+        for i, line in enumerate(plugin_php):
+            if i == 0:
+                continue
+            result_php_var = re.search(r"\$(\w+)\s+?=\s+?[\"']([a-zA-Z\@\s\.]+|[0-9\.]+)[\"'];", line)
+            result_define = re.search(r"define\(['\"]([a-zA-Z_]+)['\"],\s?['\"]([0-9\.]+)['\"]\);", line)
+            if result_php_var:
+                d[result_php_var.groups()[0]] = result_php_var.groups()[1]
+            if result_define:
+                d[result_define.groups()[0]] = result_define.groups()[1]
+    return d
+
+
+def single_pass_parse_plugin_php(file_path, encoding='utf-8'):
+    with open(file_path, 'rb') as plugin_php:
+        data = plugin_php.read()
+    d = {"source_file": file_path}
+    d.update(parse_php_assignments(data, encoding, until=IliasFileParser.PLUGIN_PHP_FIELDS))
+    return d
+
+
+def run(args):
+    rnd = random.Random(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        files = []
+        for n in range(args.files):
+            file_path = osp.join(tmp, f'plugin{n}.php')
+            with open(file_path, 'wb') as f:
+                f.write(plugin_php(rnd, n))
+            files.append(file_path)
+
+        for name, func in (('line regex', legacy_parse_plugin_php), ('single pass', single_pass_parse_plugin_php)):
+            best, errors, complete = None, 0, 0
+            for _ in range(args.repeat):
+                errors, complete = 0, 0
+                start = time.perf_counter()
+                for file_path in files:
+                    try:
+                        d = func(file_path)
+                    except UnicodeDecodeError:
+                        errors += 1
+                        continue
+                    complete += all(field in d for field in IliasFileParser.PLUGIN_PHP_FIELDS)
+                elapsed = time.perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+            print(f'{name:<12} {best * 1000:9.1f} ms   complete: {complete}/{len(files)}   decode errors: {errors}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--files', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=3)
+    run(parser.parse_args())
@@ -0,0 +1,44 @@
+# Created by Andre Machon 18/10/2026
+"""Compares the memory an inventory takes as nested dicts and as records, and the time it takes to write it as JSON
+
+    python -m benchmarks.bench_records --installations 1000 --plugins 30 --clients 3
+"""
+import argparse
+import json
+import time
+import tracemalloc
+
+from ilinfo.records import Installation, to_json
+from benchmarks.bench_data_access import build_parser
+
+
+def measure(build):
+    tracemalloc.start()
+    result = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, size
+
+
+def run(args):
+    # both are built from the same parsed strings, so the sizes compare the containers holding them
+    parser = build_parser(args.installations, args.plugins, args.clients)
+
+    dicts, dicts_size = measure(parser.snapshot)
+    records, records_size = measure(lambda: {path: Installation.from_dict(d) for path, d in parser.snapshot().items()})
+    for name, size in (('dicts', dicts_size), ('records', records_size)):
+        print(f'{name:<8} {size / 2 ** 20:7.1f} MiB')
+
+    for name, data in (('dicts', dicts), ('records', records)):
+        start = time.perf_counter()
+        out = json.dumps(data, default=to_json)
+        print(f'{name:<8} json {(time.perf_counter() - start) * 1000:7.1f} ms   {len(out)} bytes')
+    print(f"identical JSON: {json.dumps(dicts) == json.dumps(records, default=to_json)}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--installations', type=int, default=1000)
+    parser.add_argument('--plugins', type=int, default=30)
+    parser.add_argument('--clients', type=int, default=3)
+    run(parser.parse_args())
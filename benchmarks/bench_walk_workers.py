@@ -0,0 +1,57 @@
+# Created by Andre Machon 18/10/2026
+"""Compares sequential and threaded TreeWalker on a deep tree with simulated per directory latency
+
+Every directory listing sleeps for --latency milliseconds first, which mimics the round trip of a NFS or CIFS mount.
+
+    python -m benchmarks.bench_walk_workers --latency 2 --workers 1 4 8 16
+"""
+import argparse
+import tempfile
+import time
+
+from ilinfo import discovery
+from ilinfo.discovery import TreeWalker, DISCOVERY_FILES
+from benchmarks.fleet import build_fleet
+
+
+def with_latency(latency):
+    scandir = discovery.scandir
+
+    def slow_scandir(path):
+        time.sleep(latency)
+        return scandir(path)
+    return slow_scandir
+
+
+def run(args):
+    with tempfile.TemporaryDirectory() as root:
+        build_fleet(root, args.installations, args.plugins, args.clients, args.data_dirs, args.depth)
+        original_scandir = discovery.scandir
+        discovery.scandir = with_latency(args.latency / 1000)
+        try:
+            baseline, expected = None, None
+            for workers in args.workers:
+                walker = TreeWalker(DISCOVERY_FILES, workers=workers)
+                start = time.perf_counter()
+                found = list(walker.walk(root))
+                elapsed = time.perf_counter() - start
+
+                baseline = baseline or elapsed
+                expected = expected or found
+                assert found == expected, 'result order differs from the first run'
+                print(f'workers: {workers:>3}   directories: {walker.dirs_visited:>6}   '
+                      f'{elapsed * 1000:9.1f} ms   speedup: {baseline / elapsed:5.1f}x')
+        finally:
+            discovery.scandir = original_scandir
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--installations', type=int, default=4)
+    parser.add_argument('--plugins', type=int, default=10)
+    parser.add_argument('--clients', type=int, default=2)
+    parser.add_argument('--data-dirs', type=int, default=400)
+    parser.add_argument('--depth', type=int, default=4)
+    parser.add_argument('--latency', type=float, default=2.0, help='simulated latency per directory in ms')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8, 16])
+    run(parser.parse_args())
@@ -0,0 +1,85 @@
+# Created by Andre Machon 18/10/2026
+"""Builds synthetic ILIAS trees for the benchmarks"""
+import os
+import shutil
+import subprocess
+from pathlib import Path
+
+FIXTURE_FILES_DIR = Path(__file__).parents[1] / 'tests' / 'fixtures'
+PLUGIN_SLOT = 'Customizing/global/plugins/Services/UIComponent/UserInterfaceHook'
+# folders old copies of installations are kept in on the servers, all of them are in the CLI's EXCLUDED_FOLDERS
+DECOY_FOLDERS = ('Backup', 'iliasold', 'ilias5_old', 'dump')
+
+GIT_ENV = dict(os.environ, GIT_AUTHOR_NAME='bench', GIT_AUTHOR_EMAIL='bench@example.com',
+               GIT_COMMITTER_NAME='bench', GIT_COMMITTER_EMAIL='bench@example.com')
+
+
+def build_fleet(root, installations=5, plugins=10, clients=2, data_dirs=200, depth=3, decoys=0, git=False):
+    """Creates installations below root, each with plugins, clients and a data dir of data_dirs nested directories
+
+    :param root: directory the installations are created in
+    :type root: Path
+    :param decoys: number of installations that get a backup copy next to them, in one of DECOY_FOLDERS
+    :type decoys: int
+    :param git: make each installation and each of its plugins a git repository, with a remote
+    :type git: bool
+    :return: paths of the created installations, without the decoys
+    :rtype: list
+    """
+    root = Path(root)
+    ilias_ini = (FIXTURE_FILES_DIR / 'ilias.ini.php').read_text()
+    client_ini = (FIXTURE_FILES_DIR / 'client.ini.php').read_text()
+    plugin_php = (FIXTURE_FILES_DIR / 'plugin.php').read_text()
+    gitmodules = (FIXTURE_FILES_DIR / '.gitmodules').read_text()
+    ilias_paths = []
+
+    for i in range(installations):
+        ilias_path = root / f'customer_{i:03d}' / 'ILIAS'
+        (ilias_path / 'include').mkdir(parents=True)
+        (ilias_path / 'ilias.php').touch()
+        (ilias_path / 'ilias.ini.php').write_text(ilias_ini)
+        (ilias_path / '.gitmodules').write_text(gitmodules)
+
+        for c in range(clients):
+            client_path = ilias_path / 'data' / f'client_{c}'
+            client_path.mkdir(parents=True)
+            (client_path / 'client.ini.php').write_text(client_ini)
+
+        for p in range(plugins):
+            plugin_path = ilias_path / PLUGIN_SLOT / f'Plugin{p:03d}'
+            plugin_path.mkdir(parents=True)
+            # plugins differ in id and version, as installations are updated at different times
+            (plugin_path / 'plugin.php').write_text(
+                plugin_php.replace('gp_webshopauth', f'plugin{p:03d}').replace('1.1.0', f'1.{(i + p) % 7}.0')
+            )
+            if git:
+                init_repo(plugin_path, f'git@git.example.com:plugins/Plugin{p:03d}.git')
+
+        _build_data_dirs(ilias_path / 'data' / 'files', data_dirs, depth)
+        if git:
+            # plugins are separate repositories, as on the servers
+            (ilias_path / '.gitignore').write_text('/Customizing/global/plugins/\n/data/\n')
+            init_repo(ilias_path, 'https://github.com/ILIAS-eLearning/ILIAS.git')
+        if i < decoys:
+            shutil.copytree(ilias_path, ilias_path.parent / DECOY_FOLDERS[i % len(DECOY_FOLDERS)] / 'ILIAS',
+                            symlinks=True)
+        ilias_paths.append(ilias_path)
+    return ilias_paths
+
+
+def init_repo(path, remote=None):
+    """Makes path a git repository with a single commit of its files"""
+    commands = [['init', '-q'], ['add', '.'], ['commit', '-q', '-m', 'initial']]
+    if remote:
+        commands.append(['remote', 'add', 'origin', remote])
+    for args in commands:
+        subprocess.run(['git', *args], cwd=path, env=GIT_ENV, check=True, stdout=subprocess.DEVNULL)
+
+
+def _build_data_dirs(path, count, depth):
+    # spread count directories over a tree that is depth levels deep, like ILIAS' hashed file storage
+    for n in range(count):
+        parts = [f'{(n // (10 ** level)) % 10:02d}' for level in range(depth)]
+        d = path.joinpath(*parts, f'file_{n}')
+        d.mkdir(parents=True, exist_ok=True)
+        (d / 'content.bin').touch()
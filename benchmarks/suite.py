@@ -0,0 +1,207 @@
+# Created by Andre Machon 18/10/2026
+"""Times each stage of a run on a synthetic fleet, with memory peaks, and compares the results with a baseline
+
+    python -m benchmarks.suite --installations 50 --plugins 20 --decoys 5 --git --save-baseline baseline.json
+    python -m benchmarks.suite --installations 50 --plugins 20 --decoys 5 --git --baseline baseline.json
+
+The stages are timed on their own: discovery, ini parsing (ilias.ini.php, client.ini.php, .gitmodules), plugin
+parsing (plugin.php), git (remotes and states) and each output format, plus the whole analyze run. Wall time and CPU
+time, including that of git subprocesses, are the best of --repeat runs. The memory peak is the largest amount
+allocated by Python during one further run, traced with tracemalloc.
+
+Compared with a baseline, a stage that got slower or needs more memory by more than --tolerance is flagged as a
+regression, and the suite exits with 1. Differences below --min-delta ms are noise and never flagged.
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from ilinfo import Analyzer, IliasFileParser, IliasPathFinder, JSONOutput, StreamingJSONOutput, SQLiteOutput
+from ilinfo.analyzers import GitHelper
+from ilinfo.cli import EXCLUDED_FOLDERS
+from benchmarks.fleet import build_fleet
+
+# the absolute prefixes of the CLI would exclude the temporary directory the fleet is built in
+EXCLUDED = [folder for folder in EXCLUDED_FOLDERS if not folder.startswith('/')]
+
+
+def measure(func, repeat):
+    """Runs func repeat times for its best wall and CPU time, then once more under tracemalloc for its memory peak
+
+    :param func: called without arguments, a fresh setup per call is its own business
+    :return: {'wall_ms': ..., 'cpu_ms': ..., 'peak_kib': ...}
+    :rtype: dict
+    """
+    wall = cpu = None
+    for _ in range(repeat):
+        start_wall, start_cpu = time.perf_counter(), _cpu_time()
+        func()
+        elapsed, used = time.perf_counter() - start_wall, _cpu_time() - start_cpu
+        wall = elapsed if wall is None else min(wall, elapsed)
+        cpu = used if cpu is None else min(cpu, used)
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {'wall_ms': round(wall * 1000, 3), 'cpu_ms': round(cpu * 1000, 3), 'peak_kib': round(peak / 1024, 1)}
+
+
+def _cpu_time():
+    # git runs in subprocesses, their CPU time counts as well once they were waited for
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return time.process_time() + children.ru_utime + children.ru_stime
+
+
+def discover(root):
+    pathfinder = IliasPathFinder(excluded_folders=EXCLUDED)
+    pathfinder.discover(root)
+    return pathfinder
+
+
+def stages(root, output_dir, git):
+    """Returns the stages to time, by name
+
+    :rtype: dict
+    """
+    found = discover(root).snapshot()
+    plugin_paths = [os.path.dirname(path) for d in found.values() for path in d['plugins'].values()]
+    parsed = IliasFileParser()
+    parsed.parse_from_pathfinder(discover(root))
+
+    def parse_ini():
+        parser = IliasFileParser()
+        for d in found.values():
+            files = d['files']
+            parser.parse_ilias_ini(files.get('ilias.ini.php'))
+            parser.parse_gitmodules(files.get('.gitmodules'))
+            for client_ini in files.get('client.ini.php', ()):
+                parser.parse_client_ini(client_ini)
+
+    def parse_plugins():
+        parser = IliasFileParser()
+        for d in found.values():
+            for plugin_php in d['plugins'].values():
+                parser.parse_plugin_php(plugin_php)
+
+    def read_git():
+        git_helper = GitHelper()
+        for plugin_path in plugin_paths:
+            git_helper.parse_git_remotes(plugin_path)
+        if git:
+            git_helper.collect_states(list(found) + plugin_paths)
+
+    def output(processor_class, **kwargs):
+        # the installations were parsed once above, only writing them is timed
+        return lambda: processor_class(output_path=output_dir, **kwargs).output_data(parsed)
+
+    def analyze():
+        parser = IliasFileParser(git_state=git)
+        analyzer = Analyzer(parser, IliasPathFinder(excluded_folders=EXCLUDED),
+                            output_processor=JSONOutput(output_path=output_dir), excluded_folders=EXCLUDED)
+        analyzer.analyze_path(root)
+
+    def output_sqlite():
+        # every run adds a snapshot, each timing starts from an empty database
+        db_file = os.path.join(output_dir, SQLiteOutput.FILE_NAME)
+        if os.path.exists(db_file):
+            os.remove(db_file)
+        output(SQLiteOutput)()
+
+    return {
+        'discovery': lambda: discover(root),
+        'parse_ini': parse_ini,
+        'parse_plugins': parse_plugins,
+        'git': read_git,
+        'output_json': output(JSONOutput),
+        'output_ndjson': output(StreamingJSONOutput, fmt='ndjson'),
+        'output_sqlite': output_sqlite,
+        'analyze': analyze,
+    }
+
+
+def compare(results, baseline, tolerance, min_delta):
+    """Returns the regressions of results against baseline
+
+    :return: [(stage, metric, baseline value, value)]
+    :rtype: list
+    """
+    regressions = []
+    for stage, metrics in results.items():
+        before = baseline.get(stage)
+        if before is None:
+            continue
+        for metric in ('wall_ms', 'cpu_ms', 'peak_kib'):
+            old, new = before[metric], metrics[metric]
+            # time differences below min_delta ms are noise, for memory the same number of KiB
+            if new > old * (1 + tolerance) and new - old > min_delta:
+                regressions.append((stage, metric, old, new))
+    return regressions
+
+
+def run(args):
+    fleet = {key: getattr(args, key) for key in ('installations', 'plugins', 'clients', 'data_dirs', 'depth',
+                                                 'decoys', 'git')}
+    with tempfile.TemporaryDirectory() as tmp:
+        root = os.path.join(tmp, 'fleet')
+        output_dir = os.path.join(tmp, 'out')
+        os.mkdir(output_dir)
+        start = time.perf_counter()
+        build_fleet(root, **fleet)
+        print(f'fleet built in {time.perf_counter() - start:.1f} s: {fleet}', file=sys.stderr)
+
+        results = {}
+        for stage, func in stages(root, output_dir, args.git).items():
+            if args.stages and stage not in args.stages:
+                continue
+            results[stage] = measure(func, args.repeat)
+            print(f"{stage:<14} {results[stage]['wall_ms']:10.1f} ms wall {results[stage]['cpu_ms']:10.1f} ms cpu "
+                  f"{results[stage]['peak_kib']:10.1f} KiB peak", file=sys.stderr)
+
+    report = {'fleet': fleet, 'python': platform.python_version(), 'repeat': args.repeat, 'stages': results}
+    if args.json:
+        print(json.dumps(report, indent=2))
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f'baseline saved to {args.save_baseline}', file=sys.stderr)
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get('fleet') != fleet:
+            print(f"warning: the baseline was measured on another fleet: {baseline.get('fleet')}", file=sys.stderr)
+        regressions = compare(results, baseline.get('stages', {}), args.tolerance, args.min_delta)
+        for stage, metric, old, new in regressions:
+            print(f'REGRESSION {stage} {metric}: {old} -> {new} (+{(new / old - 1) * 100 if old else 100:.0f}%)',
+                  file=sys.stderr)
+        if regressions:
+            return 1
+        print(f'no regressions against {args.baseline}', file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--installations', type=int, default=20)
+    parser.add_argument('--plugins', type=int, default=20)
+    parser.add_argument('--clients', type=int, default=2)
+    parser.add_argument('--data-dirs', type=int, default=500)
+    parser.add_argument('--depth', type=int, default=3)
+    parser.add_argument('--decoys', type=int, default=5, help='installations with a backup copy next to them')
+    parser.add_argument('--git', action='store_true', help='make installations and plugins git repositories')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--stages', nargs='*', help='only time these stages')
+    parser.add_argument('--json', action='store_true', help='print the results as JSON to stdout')
+    parser.add_argument('--save-baseline', metavar='FILE')
+    parser.add_argument('--baseline', metavar='FILE', help='compare with a baseline saved before')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='slowdown flagged as regression, 0.25 is 25%%')
+    parser.add_argument('--min-delta', type=float, default=5.0,
+                        help='ms, and KiB for memory, a stage may change by without being flagged')
+    sys.exit(run(parser.parse_args()))
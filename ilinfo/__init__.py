@@ -1,3 +1,36 @@
 # Created by Andre Machon 07/02/2021
-from ilinfo.analyzers import *
-from ilinfo.output_processors import JSONOutput
+import importlib
+
+# the public names and the modules they come from, a module is only imported once one of its names is used, so that
+# e.g. "ilinfo --help" does not load the analyzers and the output backends
+_EXPORTS = {
+    'Analyzer': 'ilinfo.analyzers',
+    'AsyncAnalyzer': 'ilinfo.analyzers',
+    'IliasFileParser': 'ilinfo.analyzers',
+    'IliasPathFinder': 'ilinfo.analyzers',
+    'GitHelper': 'ilinfo.analyzers',
+    'JSONOutput': 'ilinfo.output_processors',
+    'StreamingJSONOutput': 'ilinfo.output_processors',
+    'AgentOutput': 'ilinfo.output_processors',
+    'SQLiteOutput': 'ilinfo.output_processors',
+    'Installation': 'ilinfo.records',
+    'Client': 'ilinfo.records',
+    'Plugin': 'ilinfo.records',
+    'Submodule': 'ilinfo.records',
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        # submodules, like "from ilinfo import analyzers", are imported by the import system after this
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS))
@@ -1,20 +1,35 @@
 # Created by Andre Machon 14/02/2021
+import logging
+import os
 import re
-import subprocess
+import time
+from collections import deque
+from contextlib import nullcontext
 from os import path as osp
 from pathlib import Path
-from copy import deepcopy
 
-from ilinfo.utils import parse_ini_to_dict, find_files_recursive
-from ilinfo.output_processors import OutputProcessor, JSONOutput
+from ilinfo.discovery import TreeWalker, PathTrie, DISCOVERY_FILES
+from ilinfo.records import Installation
+from ilinfo.git import GitConfig, GitConfigError, find_repository, read_head, resolve_ref, user_config_files
+from ilinfo.utils import FrozenDict, IniReader, freeze, parse_php_assignments, thaw
 
-__all__ = ['Analyzer', 'IliasFileParser', 'IliasPathFinder', 'GitHelper']
+__all__ = ['Analyzer', 'AsyncAnalyzer', 'IliasFileParser', 'IliasPathFinder', 'GitHelper']
+
+# asyncio, concurrent.futures, subprocess and the output processors are imported where they are used, a plain analyze
+# run without --async, --jobs or --git-state does not need most of them
 
 
 class Analyzer:
     """Aggregates the IliasFileParser, IliasPathFinder and GitHelper to main the systems ILIAS installations"""
 
-    def __init__(self, fileparser=None, pathfinder=None, git_helper=None, output_processor=None, excluded_folders=None):
+    def __init__(self, fileparser=None, pathfinder=None, git_helper=None, output_processor=None, excluded_folders=None,
+                 metrics=None):
+        """
+        :param metrics: gets the wall and CPU time of the stages 'discovery', 'parse' and 'output' of analyze_path and
+            counts the installations and errors, pass the same to fileparser and pathfinder for the details
+        :type metrics: ilinfo.metrics.RunMetrics
+        """
+        from ilinfo.output_processors import JSONOutput
         self._data = {}
         self._check_init_params(fileparser, pathfinder, git_helper, output_processor)
 
@@ -23,9 +38,11 @@ class Analyzer:
         self._git_helper = git_helper or GitHelper()
         self._output_processor = output_processor or JSONOutput()
         self._excluded_folders = excluded_folders
+        self._metrics = metrics
 
     def _check_init_params(self, fileparser=None, pathfinder=None, git_helper=None, output_processor=None,
                            excluded_folders=None):
+        from ilinfo.output_processors import OutputProcessor
         if fileparser is not None:
             if not isinstance(fileparser, IliasFileParser):
                 raise TypeError('Param fileparser needs to be of type IliasFileParser, or None')
@@ -43,10 +60,194 @@ class Analyzer:
                 raise TypeError('Param excluded_folders needs to be of type dict, or None')
 
     def analyze_path(self, start_path):
-        self._pathfinder.find_installations(start_path, self._excluded_folders)
-        self._pathfinder.find_plugins(start_path, self._excluded_folders)
-        self._file_parser.parse_from_pathfinder(self._pathfinder)
-        return self._output_processor.output_data(self._file_parser)
+        cache_stats = self._file_parser.stats()
+        with self._stage('discovery'):
+            self._pathfinder.discover(start_path, self._excluded_folders)
+        if self._output_processor.streaming:
+            installations = self._file_parser.iter_installations(self._pathfinder)
+            if self._metrics is not None:
+                # the installations are parsed while they are written, that time is the one of 'parse'
+                installations = self._metrics.iterate('parse', self._counted(installations))
+            with self._stage('output', exclude=('parse',)):
+                result = self._output_processor.stream(installations, self._file_parser.stats)
+        else:
+            with self._stage('parse'):
+                self._file_parser.parse_from_pathfinder(self._pathfinder)
+            if self._metrics is not None:
+                for installation in self._file_parser.data.values():
+                    self._count(installation)
+            with self._stage('output'):
+                result = self._output_processor.output_data(self._file_parser)
+        self._add_cache_counters(cache_stats)
+        return result
+
+    def _stage(self, name, exclude=()):
+        if self._metrics is None:
+            return nullcontext()
+        return self._metrics.stage(name, exclude)
+
+    def _counted(self, installations):
+        for installation in installations:
+            self._count(installation)
+            yield installation
+
+    def _count(self, installation):
+        self._metrics.add('installations')
+        if installation.get('error'):
+            self._metrics.add('errors')
+
+    def _add_cache_counters(self, before):
+        if self._metrics is None:
+            return
+        before = before.get('parse_cache', {'hits': 0, 'misses': 0})
+        after = self._file_parser.stats().get('parse_cache', before)
+        self._metrics.add('parse_cache_hits', after['hits'] - before['hits'])
+        self._metrics.add('parse_cache_misses', after['misses'] - before['misses'])
+
+
+class AsyncAnalyzer(Analyzer):
+    """Analyzer running on asyncio, overlapping file reads, git processes and database probes of the installations
+
+    Files are parsed in a thread pool, git states are collected with asyncio subprocesses, so parsing one installation
+    overlaps with waiting on git for another. The results are the same as those of Analyzer.
+    """
+
+    def __init__(self, fileparser=None, pathfinder=None, git_helper=None, output_processor=None, excluded_folders=None,
+                 io_concurrency=8, git_concurrency=None, db_probe=False, db_concurrency=8, db_timeout=3.0,
+                 metrics=None):
+        """
+        :param io_concurrency: number of threads reading and parsing files
+        :type io_concurrency: int
+        :param git_concurrency: maximum number of git processes running at the same time, defaults to the one of
+            fileparser
+        :type git_concurrency: int
+        :param db_probe: add whether the database server of each client accepts connections, under the client's key
+            'db_probe'
+        :type db_probe: bool
+        :param db_concurrency: maximum number of database probes running at the same time
+        :type db_concurrency: int
+        :param db_timeout: seconds a single database probe may take
+        :type db_timeout: float
+        :param metrics: see Analyzer, installations are parsed while they are written, which is part of 'parse'
+        :type metrics: ilinfo.metrics.RunMetrics
+        """
+        super().__init__(fileparser, pathfinder, git_helper, output_processor, excluded_folders, metrics)
+        self._io_concurrency = io_concurrency
+        self._git_concurrency = git_concurrency or self._file_parser._git_concurrency
+        self._db_probe = db_probe
+        self._db_concurrency = db_concurrency
+        self._db_timeout = db_timeout
+
+    def analyze_path(self, start_path):
+        import asyncio
+        return asyncio.run(self.analyze_path_async(start_path))
+
+    async def analyze_path_async(self, start_path):
+        import asyncio
+        from concurrent.futures import ThreadPoolExecutor
+        loop = asyncio.get_running_loop()
+        cache_stats = self._file_parser.stats()
+        with ThreadPoolExecutor(max_workers=self._io_concurrency) as executor:
+            with self._stage('discovery'):
+                await loop.run_in_executor(executor, self._pathfinder.discover, start_path, self._excluded_folders)
+            installations = self._analyzed_installations(executor)
+            if self._output_processor.streaming:
+                with self._stage('parse', exclude=('output',)):
+                    await loop.run_in_executor(executor, self._output_processor.begin)
+                    async for installation in installations:
+                        await loop.run_in_executor(executor, self._write_installation, installation)
+                    await loop.run_in_executor(executor, self._file_parser.flush_parse_cache)
+                with self._stage('output'):
+                    result = await loop.run_in_executor(
+                        executor, self._output_processor.finish, self._file_parser.stats()
+                    )
+            else:
+                with self._stage('parse'):
+                    async for installation in installations:
+                        self._file_parser._add_installation(installation)
+                    await loop.run_in_executor(executor, self._file_parser.flush_parse_cache)
+                if self._metrics is not None:
+                    for installation in self._file_parser.data.values():
+                        self._count(installation)
+                with self._stage('output'):
+                    result = await loop.run_in_executor(
+                        executor, self._output_processor.output_data, self._file_parser
+                    )
+        self._add_cache_counters(cache_stats)
+        return result
+
+    async def _analyzed_installations(self, executor):
+        # yields the installations in the order of the pathfinder, which makes the output the same as the one of
+        # Analyzer. Like IliasFileParser._parse_installations_parallel, only a window of installations is in flight,
+        # finished ones wait for the caller, so memory does not grow with the number of installations.
+        import asyncio
+        git_semaphore = asyncio.Semaphore(self._git_concurrency)
+        db_semaphore = asyncio.Semaphore(self._db_concurrency)
+        pending = deque()
+        installations = iter(self._pathfinder)
+        try:
+            while True:
+                for ilias_path, ilias_dict in installations:
+                    pending.append(asyncio.ensure_future(
+                        self._analyze_installation(executor, git_semaphore, db_semaphore, ilias_path, ilias_dict)
+                    ))
+                    if len(pending) >= 2 * self._io_concurrency:
+                        break
+                if not pending:
+                    return
+                yield await pending.popleft()
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def _write_installation(self, installation):
+        if self._metrics is None:
+            return self._output_processor.write_installation(installation)
+        self._count(installation)
+        with self._metrics.record('output'):
+            return self._output_processor.write_installation(installation)
+
+    async def _analyze_installation(self, executor, git_semaphore, db_semaphore, ilias_path, ilias_dict):
+        import asyncio
+        loop = asyncio.get_running_loop()
+        installation = await loop.run_in_executor(
+            executor, self._file_parser._detached()._parse_installation, ilias_path, ilias_dict
+        )
+
+        tasks = []
+        if self._file_parser._git_state:
+            tasks.append(self._add_git_states(installation, git_semaphore))
+        if self._db_probe:
+            tasks.extend(self._probe_db(client, db_semaphore) for client in installation['client.ini.php'])
+        if self._file_parser._db_inspector is not None:
+            tasks.append(loop.run_in_executor(executor, self._file_parser._apply_installation_db_info, installation))
+        await asyncio.gather(*tasks)
+        return installation
+
+    async def _add_git_states(self, installation, semaphore):
+        states = await self._file_parser._git_helper.collect_states_async(
+            IliasFileParser._installation_git_paths(installation), timeout=self._file_parser._git_timeout,
+            semaphore=semaphore
+        )
+        IliasFileParser._apply_installation_git_states(installation, states)
+
+    async def _probe_db(self, client, semaphore):
+        import asyncio
+        db = client.get('db') or {}
+        host, port = db.get('host') or 'localhost', db.get('port') or '3306'
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                _, writer = await asyncio.wait_for(asyncio.open_connection(host, int(port)), self._db_timeout)
+            except asyncio.TimeoutError:
+                client['db_probe'] = {'reachable': False, 'error': f"timed out after {self._db_timeout}s"}
+                return
+            except (OSError, ValueError) as err:
+                client['db_probe'] = {'reachable': False, 'error': str(err)}
+                return
+            writer.close()
+            await writer.wait_closed()
+        client['db_probe'] = {'reachable': True, 'seconds': round(time.perf_counter() - start, 6)}
 
 
 class IliasFileParser:
@@ -60,52 +261,397 @@ class IliasFileParser:
 
     """
 
-    def __init__(self):
+    # the fields ILIAS itself reads from plugin.php, parsing stops once all of them were found
+    PLUGIN_PHP_FIELDS = ('id', 'version', 'ilias_min_version', 'ilias_max_version', 'responsible', 'responsible_mail')
+
+    _ILIAS_INI_READER = IniReader({
+        "server": ['http_path', 'absolute_path'],
+        "clients": ['path', 'inifile', 'datadir', 'default']
+    })
+    _CLIENT_INI_READER = IniReader({
+        "client": ['name', 'access'],
+        "db": ['type', 'host', 'user', 'name', 'pass', 'port'],
+        'language': ['default'],
+        'layout': ['skin', 'style']
+    })
+
+    def __init__(self, git_state=False, git_concurrency=8, git_timeout=10.0, jobs=1, parse_cache=None,
+                 db_inspector=None, metrics=None):
+        """
+        :param git_state: add commit, branch, upstream divergence and dirty flag of each installation's and plugin's
+            repository under the key 'git', see GitHelper.collect_states
+        :type git_state: bool
+        :param git_concurrency: maximum number of git processes running at the same time
+        :type git_concurrency: int
+        :param git_timeout: seconds a single git process may take
+        :type git_timeout: float
+        :param jobs: number of processes parse_from_pathfinder spreads the installations across
+        :type jobs: int
+        :param parse_cache: cache of the results of ilias.ini.php, client.ini.php, plugin.php and .gitmodules files,
+            remotes and git states are always read again
+        :type parse_cache: ilinfo.cache.ParseCache
+        :param db_inspector: add schema version, active plugins and user counts read from the database of each client
+            under the client's key 'db_info'
+        :type db_inspector: ilinfo.db.DBInspector
+        :param metrics: gets the time of every file read, git and database lookup, not those of the worker processes
+            of jobs > 1
+        :type metrics: ilinfo.metrics.RunMetrics
+        """
         self._data = {}
         self._current_installation = {
             'ilias_path': '',
             'client.ini.php': [],
             'plugin.php': []
         }
-        self._git_helper = GitHelper()
-
-    __slots__ = ['_data', '_git_helper', '_current_installation']
+        self._git_helper = GitHelper(metrics)
+        self._git_state = git_state
+        self._git_concurrency = git_concurrency
+        self._git_timeout = git_timeout
+        self._jobs = jobs
+        self._parse_cache = parse_cache
+        self._db_inspector = db_inspector
+        self._metrics = metrics
+        # read-only view of _data handed out by the data property, rebuilt after _data changed
+        self._view = None
+
+    __slots__ = ['_data', '_git_helper', '_current_installation', '_git_state', '_git_concurrency', '_git_timeout',
+                 '_jobs', '_parse_cache', '_db_inspector', '_metrics', '_view']
 
     @property
     def data(self):
+        """The parsed installations as a read-only view, see snapshot for a mutable copy
+
+        Installations are turned into read-only Installation records as they are added and replaced as a whole when
+        they change, so views handed out before stay the same.
+
+        :rtype: ilinfo.utils.FrozenDict
+        """
         self._append_current_installation_to_data()
-        return deepcopy(self._data)
+        if self._view is None:
+            self._view = FrozenDict(self._data)
+        return self._view
+
+    def snapshot(self):
+        """Returns a mutable deep copy of the parsed installations
+
+        :rtype: dict
+        """
+        return thaw(self.data)
+
+    def clear(self):
+        """Drops all parsed installations"""
+        self._data = {}
+        self._view = None
+        self._current_installation = {
+            'ilias_path': '',
+            'client.ini.php': [],
+            'plugin.php': []
+        }
 
     def _append_current_installation_to_data(self):
         ilias_path = self._current_installation.get('ilias_path', None)
         if ilias_path and ilias_path not in self._data:
-            self._data[ilias_path] = self._current_installation
+            self._data[ilias_path] = Installation.from_dict(self._current_installation)
+            self._view = None
             self._current_installation = {
                 'ilias_path': '',
                 'client.ini.php': [],
                 'plugin.php': []
             }
 
+    def _add_installation(self, installation):
+        self._current_installation = installation
+        self._append_current_installation_to_data()
+
+    def _detached(self):
+        # a parser for a single installation, sharing the remotes cache of the GitHelper and the parse cache
+        parser = IliasFileParser(parse_cache=self._parse_cache, metrics=self._metrics)
+        parser._git_helper = self._git_helper
+        return parser
+
+    def stats(self):
+        """Returns the counters of the parse cache, empty without one
+
+        :return: {'parse_cache': {'hits': 12, 'misses': 3}}
+        :rtype: dict
+        """
+        if self._parse_cache is None:
+            return {}
+        return {'parse_cache': {'hits': self._parse_cache.hits, 'misses': self._parse_cache.misses}}
+
+    def flush_parse_cache(self):
+        """Writes the pending results of the parse cache, done at the end of parse_from_pathfinder and
+        iter_installations"""
+        if self._parse_cache is not None:
+            self._parse_cache.flush()
+
+    def _cached(self, kind, file_path, parse):
+        if self._metrics is not None and file_path:
+            parse = self._recorded('parse_plugins' if kind.startswith('plugin.php') else 'parse_ini', parse)
+        if self._parse_cache is None or not file_path:
+            return parse(file_path)
+        return self._parse_cache.get(kind, file_path, parse)
+
+    def _recorded(self, stage, parse):
+        # files served by the parse cache are not read, only the parse function is timed
+        def read(file_path):
+            with self._metrics.record(stage, file_path):
+                return parse(file_path)
+        return read
+
+    def _record(self, stage):
+        if self._metrics is None:
+            return nullcontext()
+        return self._metrics.record(stage)
+
     def parse_from_pathfinder(self, pathfinder):
         if not isinstance(pathfinder, IliasPathFinder):
             raise TypeError("Param pathfinder needs to be of class IliasPathFinder")
 
-        for ilias_path, ilias_dict in pathfinder:
-            self._current_installation['ilias_path'] = ilias_path
-            ilias_files = ilias_dict.get('files', {})
+        for installation in self._parsed_installations(pathfinder, self):
+            self._add_installation(installation)
+        self.flush_parse_cache()
+
+        if self._git_state:
+            self.add_git_states()
+        if self._db_inspector is not None:
+            self.add_db_info()
+        return self.data
 
+    def iter_installations(self, pathfinder):
+        """Parses the installations of pathfinder, yielding each one as soon as it is parsed
+
+        Unlike parse_from_pathfinder, the installations are not kept, so memory does not grow with their number. Git
+        states are collected per installation.
+
+        :type pathfinder: IliasPathFinder
+        :return: generator of installation dicts, in the order of pathfinder
+        :rtype: generator
+        """
+        if not isinstance(pathfinder, IliasPathFinder):
+            raise TypeError("Param pathfinder needs to be of class IliasPathFinder")
+
+        for installation in self._parsed_installations(pathfinder, self._detached()):
+            self._complete_installation(installation)
+            yield installation
+        self.flush_parse_cache()
+
+    def add_installation(self, ilias_path, ilias_dict):
+        """Parses an installation that was found after parse_from_pathfinder and adds it to the data
+
+        :param ilias_path: path of the installation
+        :type ilias_path: str
+        :param ilias_dict: the installation's entry in IliasPathFinder.ilias_paths
+        :type ilias_dict: dict
+        :return: the parsed installation
+        :rtype: ilinfo.records.Installation
+        """
+        self._append_current_installation_to_data()
+        installation = self._detached()._parse_installation(ilias_path, ilias_dict)
+        self._complete_installation(installation)
+        self.flush_parse_cache()
+        self._add_installation(installation)
+        return self._data[ilias_path]
+
+    def _complete_installation(self, installation):
+        # git states and database facts of a single installation, parse_from_pathfinder collects them for all at once
+        if self._git_state:
+            with self._record('git'):
+                states = self._git_helper.collect_states(
+                    self._installation_git_paths(installation), self._git_concurrency, self._git_timeout
+                )
+            self._apply_installation_git_states(installation, states)
+        if self._db_inspector is not None:
+            self._apply_installation_db_info(installation)
+
+    def _parsed_installations(self, pathfinder, parser):
+        installations = list(pathfinder)
+        if self._jobs > 1 and len(installations) > 1:
+            return self._parse_installations_parallel(installations)
+        return (parser._parse_installation(ilias_path, ilias_dict) for ilias_path, ilias_dict in installations)
+
+    def _parse_installation(self, ilias_path, ilias_dict):
+        # an installation that fails to parse gets an 'error' entry instead of aborting the other installations
+        self._current_installation = {'ilias_path': ilias_path, 'client.ini.php': [], 'plugin.php': []}
+        ilias_files = ilias_dict.get('files', {})
+        try:
             self.parse_ilias_ini(ilias_files.get('ilias.ini.php'))
             self.parse_gitmodules(ilias_files.get('.gitmodules'))
 
-            for client_ini in ilias_files.get('client.ini.php'):
-                self.parse_client_ini(client_ini)
+            client_ini_paths = ilias_files.get('client.ini.php')
+            if self._parse_cache is None and self._metrics is None:
+                clients = self._CLIENT_INI_READER.read_many(client_ini_paths)
+            else:
+                clients = [
+                    self._cached('client.ini.php', path, self._CLIENT_INI_READER.read) for path in client_ini_paths
+                ]
+            self._current_installation['client.ini.php'].extend(clients)
             for pl_name, pl_php_path in ilias_dict.get('plugins').items():
                 # get dirname as parse_plugin does not expect full path to plugin.php
                 self.parse_plugin(osp.dirname(pl_php_path))
+        except Exception as err:
+            self._current_installation['error'] = f"{type(err).__name__}: {err}"
+        return self._current_installation
+
+    def _parse_installations_parallel(self, installations):
+        # results are collected in the order of installations, so the output does not depend on which process is done
+        # first. Only a few installations per process are in flight, finished ones wait for the caller to consume them.
+        from concurrent.futures import ProcessPoolExecutor
+        pending = deque()
+        installations = iter(installations)
+        with ProcessPoolExecutor(max_workers=self._jobs) as executor:
+            while True:
+                for ilias_path, ilias_dict in installations:
+                    pending.append((ilias_path, executor.submit(
+                        _parse_installation_job, ilias_path, ilias_dict, self._parse_cache
+                    )))
+                    if len(pending) >= 2 * self._jobs:
+                        break
+                if not pending:
+                    return
+                ilias_path, future = pending.popleft()
+                try:
+                    installation, (hits, misses) = future.result()
+                except Exception as err:
+                    # the worker process died, e.g. killed for running out of memory
+                    yield {'ilias_path': ilias_path, 'client.ini.php': [], 'plugin.php': [],
+                           'error': f"{type(err).__name__}: {err}"}
+                    continue
+                if self._parse_cache is not None:
+                    self._parse_cache.hits += hits
+                    self._parse_cache.misses += misses
+                yield installation
 
-            self._append_current_installation_to_data()
+    def add_git_states(self):
+        """Adds the state of the git repository each parsed installation and plugin belongs to, under the key 'git'
 
-        return self.data
+        The states of all repositories are collected concurrently, see GitHelper.collect_states
+        """
+        self._append_current_installation_to_data()
+        with self._record('git'):
+            states = self._git_helper.collect_states(
+                self._git_state_paths(), self._git_concurrency, self._git_timeout
+            )
+        self._apply_git_states(states)
+
+    def _git_state_paths(self):
+        paths = []
+        for installation in self._data.values():
+            paths.extend(self._installation_git_paths(installation))
+        return paths
+
+    def _apply_git_states(self, states):
+        for ilias_path, installation in self._data.items():
+            installation = thaw(installation)
+            self._apply_installation_git_states(installation, states)
+            self._data[ilias_path] = Installation.from_dict(installation)
+        self._view = None
+
+    @staticmethod
+    def _installation_git_paths(installation):
+        return [installation['ilias_path']] + [
+            osp.dirname(str(d['source_file'])) for d in installation.get('plugin.php', [])
+        ]
+
+    @staticmethod
+    def _apply_installation_git_states(installation, states):
+        installation['git'] = states.get(installation['ilias_path'])
+        for d in installation.get('plugin.php', []):
+            d['git'] = states.get(osp.dirname(str(d['source_file'])))
+
+    def add_db_info(self):
+        """Adds the facts read from the database of each parsed client, under the client's key 'db_info'
+
+        The clients of all installations are inspected in parallel, see ilinfo.db.DBInspector
+        """
+        self._append_current_installation_to_data()
+        installations = {ilias_path: thaw(installation) for ilias_path, installation in self._data.items()}
+        clients = [client for installation in installations.values() for client in self._db_clients(installation)]
+        with self._record('db'):
+            results = self._db_inspector.inspect_clients(clients)
+        for client, result in zip(clients, results):
+            client['db_info'] = result
+        for ilias_path, installation in installations.items():
+            self._data[ilias_path] = Installation.from_dict(installation)
+        self._view = None
+
+    def _apply_installation_db_info(self, installation):
+        clients = self._db_clients(installation)
+        with self._record('db'):
+            results = self._db_inspector.inspect_clients(clients)
+        for client, result in zip(clients, results):
+            client['db_info'] = result
+
+    @staticmethod
+    def _db_clients(installation):
+        return [client for client in installation.get('client.ini.php', []) if client]
+
+    def update_file(self, ilias_path, file_path):
+        """Parses a single file of an already parsed installation again and updates the installation's data with it
+
+        Entries of files that no longer exist are removed from the installation.
+
+        :param ilias_path: path of the installation the file belongs to
+        :type ilias_path: str
+        :param file_path: path to a ilias.ini.php, client.ini.php, plugin.php or .gitmodules file
+        :type file_path: str
+        :return: the new parse result, None if the file was removed
+        :rtype: dict
+        """
+        self._append_current_installation_to_data()
+        if ilias_path not in self._data:
+            raise ValueError(f"{ilias_path} is not a parsed installation")
+
+        # copy on write, views of data handed out before keep the old installation
+        installation = thaw(self._data[ilias_path])
+        result = self._update_installation(installation, file_path)
+        self._data[ilias_path] = Installation.from_dict(installation)
+        self._view = None
+        return result
+
+    def _update_installation(self, installation, file_path):
+        file_name = osp.basename(file_path)
+        exists = osp.isfile(file_path)
+        if file_name == 'ilias.ini.php':
+            installation['ilias.ini.php'] = self._parse_detached(self.parse_ilias_ini, file_path) if exists else None
+            return installation['ilias.ini.php']
+        if file_name == '.gitmodules':
+            installation['submodules'] = self._parse_detached(self.parse_gitmodules, file_path)
+            return installation['submodules'] if exists else None
+        if file_name == 'client.ini.php':
+            return self._update_entry(installation['client.ini.php'], file_path, self.parse_client_ini, exists)
+        if file_name == 'plugin.php':
+            d = self._update_entry(
+                installation['plugin.php'], file_path, lambda path: self.parse_plugin(osp.dirname(path)), exists
+            )
+            if d is not None and self._git_state:
+                plugin_path = osp.dirname(file_path)
+                d['git'] = self._git_helper.collect_states([plugin_path], 1, self._git_timeout)[plugin_path]
+            return d
+        raise ValueError(f"{file_name} is not a file IliasFileParser can parse")
+
+    def _update_entry(self, entries, file_path, parse, exists):
+        index = next((i for i, d in enumerate(entries) if str(d.get('source_file')) == str(file_path)), None)
+        if not exists:
+            if index is not None:
+                del entries[index]
+            return None
+
+        d = self._parse_detached(parse, file_path)
+        if index is None:
+            entries.append(d)
+        else:
+            entries[index] = d
+        return d
+
+    def _parse_detached(self, parse, file_path):
+        # the parse methods write into the current installation, a scratch installation keeps them off the real one
+        current = self._current_installation
+        self._current_installation = {'ilias_path': '', 'client.ini.php': [], 'plugin.php': []}
+        try:
+            return parse(file_path)
+        finally:
+            self._current_installation = current
 
     def parse_ilias_ini(self, file_path):
         """Parses ilias.ini.php file for information about ILIAS installation
@@ -115,10 +661,7 @@ class IliasFileParser:
         :return: dict with client and path information
         :rtype: dict
         """
-        d = parse_ini_to_dict(file_path, {
-            "server": ['http_path', 'absolute_path'],
-            "clients": ['path', 'inifile', 'datadir', 'default']
-        })
+        d = self._cached('ilias.ini.php', file_path, self._ILIAS_INI_READER.read)
         self._current_installation['ilias.ini.php'] = d
         return d
 
@@ -130,12 +673,7 @@ class IliasFileParser:
         :return: dict with db connection and further client specific information
         :rtype: dict
         """
-        d = parse_ini_to_dict(file_path, {
-            "client": ['name', 'access'],
-            "db": ['type', 'host', 'user', 'name', 'pass', 'port'],
-            'language': ['default'],
-            'layout': ['skin', 'style']
-        })
+        d = self._cached('client.ini.php', file_path, self._CLIENT_INI_READER.read)
         self._current_installation['client.ini.php'].append(d)
         return d
 
@@ -145,10 +683,10 @@ class IliasFileParser:
         else:
             plugin_php_path = f"{plugin_path}/plugin.php"
 
+        # parse_plugin_php already appended plugin_php_dict to the installation, adding the remotes extends that entry
         plugin_php_dict = self.parse_plugin_php(plugin_php_path, encoding)
-        plugin_php_dict['remotes'] = self._git_helper.parse_git_remotes(plugin_path)
-        # replace last entry in plugin.php list with our extended version
-        self._current_installation['plugin.php'][-1:] = plugin_php_dict
+        with self._record('git'):
+            plugin_php_dict['remotes'] = self._git_helper.parse_git_remotes(plugin_path)
         return plugin_php_dict
 
     def parse_plugin_php(self, file_path, encoding='utf-8'):
@@ -158,25 +696,22 @@ class IliasFileParser:
         :type file_path: str
         :param encoding: encoding of file
         :type encoding: str
-        :return: dict with plugin version, compatible ILIAS versions and author information
+        :return: dict with plugin id, version, compatible ILIAS versions, author information and every other string
+            variable or constant assigned before those
         :rtype: dict
         """
-        d = {"source_file": file_path}
-
-        with open(file_path, encoding=encoding) as plugin_php:
-            for i, line in enumerate(plugin_php):
-                if i == 0:
-                    continue
-                result_php_var = re.search(r"\$(\w+)\s+?=\s+?[\"']([a-zA-Z\@\s\.]+|[0-9\.]+)[\"'];", line)
-                result_define = re.search(r"define\(['\"]([a-zA-Z_]+)['\"],\s?['\"]([0-9\.]+)['\"]\);", line)
-                if result_php_var:
-                    d[result_php_var.groups()[0]] = result_php_var.groups()[1]
-                if result_define:
-                    d[result_define.groups()[0]] = result_define.groups()[1]
-
+        d = self._cached(f'plugin.php:{encoding}', file_path, lambda path: self._read_plugin_php(path, encoding))
         self._current_installation['plugin.php'].append(d)
         return d
 
+    def _read_plugin_php(self, file_path, encoding):
+        d = {"source_file": file_path}
+        with open(file_path, 'rb') as plugin_php:
+            data = plugin_php.read()
+        # the fields ILIAS reads are at the top of plugin.php, the rest of the file is not scanned
+        d.update(parse_php_assignments(data, encoding, until=self.PLUGIN_PHP_FIELDS))
+        return d
+
     def parse_version(self, file_path):
         """Returns the ILIAS version from file
 
@@ -197,6 +732,12 @@ class IliasFileParser:
         :return: {'submodule_name': {'path': '/path/to/submodule', 'url': 'git_project_url', 'branch': 'branch_name'}}
         :rtype: dict
         """
+        d = self._cached('.gitmodules', file_path, self._read_gitmodules)
+        self._current_installation['submodules'] = d
+        return d
+
+    @staticmethod
+    def _read_gitmodules(file_path):
         d = {}
         try:
             with open(file_path, 'r') as gitmodules:
@@ -215,22 +756,46 @@ class IliasFileParser:
                     }
         except FileNotFoundError as err:
             pass # TODO log here
-
-        self._current_installation['submodules'] = d
         return d
 
 
+def _parse_installation_job(ilias_path, ilias_dict, parse_cache=None):
+    # runs in a worker process of IliasFileParser.parse_from_pathfinder, git states are collected by the parent for
+    # all installations at once. The counters of the parse cache are handed back to the parent along with the result.
+    if parse_cache is None:
+        return IliasFileParser()._parse_installation(ilias_path, ilias_dict), (0, 0)
+
+    hits, misses = parse_cache.hits, parse_cache.misses
+    installation = IliasFileParser(parse_cache=parse_cache)._parse_installation(ilias_path, ilias_dict)
+    parse_cache.flush()
+    return installation, (parse_cache.hits - hits, parse_cache.misses - misses)
+
+
 class IliasPathFinder:
 
-    def __init__(self, excluded_folders=None):
+    def __init__(self, excluded_folders=None, exclude_mode='path', walk_workers=1, dir_cache=None, metrics=None):
         """
-        :param excluded_folders: list of folders to skip
+        :param excluded_folders: list of folders to skip, see ilinfo.discovery.ExclusionMatcher for the pattern syntax
         :type excluded_folders: list
+        :param exclude_mode: 'path' or 'substring', the latter skips every path containing one of excluded_folders
+        :type exclude_mode: str
+        :param walk_workers: number of threads listing directories concurrently, helps on network file systems
+        :type walk_workers: int
+        :param dir_cache: makes discover only list directories that changed since the last run
+        :type dir_cache: ilinfo.discovery.DirectoryCache
+        :param metrics: gets the directories visited and pruned, the hits of dir_cache and the time of every
+            directory listing
+        :type metrics: ilinfo.metrics.RunMetrics
         """
         self._ilias_paths = {}
         self._excluded = excluded_folders or ['_Examples']
+        self._exclude_mode = exclude_mode
+        self._walk_workers = walk_workers
+        self._dir_cache = dir_cache
+        self._metrics = metrics
+        self._view = None
 
-    __slots__ = ('_ilias_paths', '_excluded')
+    __slots__ = ('_ilias_paths', '_excluded', '_exclude_mode', '_walk_workers', '_dir_cache', '_metrics', '_view')
 
     def __iter__(self):
         return self
@@ -239,13 +804,54 @@ class IliasPathFinder:
         while self._ilias_paths:
             for path, d in self._ilias_paths.items():
                 del self._ilias_paths[path]
+                self._view = None
                 return path, d
         else:
             raise StopIteration
 
     @property
     def ilias_paths(self):
-        return deepcopy(self._ilias_paths)
+        """The found installations as a read-only view, rebuilt only after installations or plugins were added
+
+        :rtype: ilinfo.utils.FrozenDict
+        """
+        if self._view is None:
+            self._view = freeze(self._ilias_paths)
+        return self._view
+
+    def snapshot(self):
+        """Returns a mutable deep copy of the found installations
+
+        :rtype: dict
+        """
+        return thaw(self._ilias_paths)
+
+    def discover(self, start_path, excluded_folders=None):
+        """Finds all ILIAS installations, their plugins and analyzable files with a single walk over start_path
+
+        This replaces calling find_installations and find_plugins one after another, each of which walks the whole
+        tree on its own. If the pathfinder has a dir_cache, only directories that changed since the last run are
+        listed and the cache is updated afterwards.
+
+        :param start_path: path to start searching from. In most cases "/" is the best option
+        :type start_path: str
+        :param excluded_folders: list of folders to skip while searching
+        :type excluded_folders: list
+        :return: full path to each found ILIAS installation
+        :rtype: list
+        """
+        if self._dir_cache is not None:
+            self._dir_cache.load(DISCOVERY_FILES)
+        walker = self._walker(DISCOVERY_FILES, excluded_folders, self._dir_cache)
+        found = walker.scan(str(start_path))
+        if self._dir_cache is not None:
+            self._dir_cache.save()
+            self._add_counters(dir_cache_hits=self._dir_cache.hits, dir_cache_misses=self._dir_cache.misses)
+        self._add_counters(dirs_visited=walker.dirs_visited, dirs_pruned=walker.dirs_pruned)
+
+        ilias_paths = self._add_installations(found)
+        self._add_plugins(found['plugin.php'])
+        return ilias_paths
 
     def find_installations(self, start_path, excluded_folders=None):
         """Recursively searches a path for all ILIAS installations
@@ -257,21 +863,15 @@ class IliasPathFinder:
         :type start_path: str
         :param excluded_folders: list of folders to skip while searching
         :type excluded_folders: list
-        :return: yields full path to each found ILIAS installation
-        :rtype: str
+        :return: full path to each found ILIAS installation
+        :rtype: list
         """
 
         # TODO could add behaviour to only find active installations based on the presence of ilias.ini.php
-        excluded_dirs = self._extend_excluded_folders(excluded_folders)
-        excluded_dirs.append('Customizing/global')
-        ilias_paths = []
-
-        for file in find_files_recursive(str(start_path), 'ilias.php', excluded_dirs):
-            ilias_path = osp.dirname(file)
-            if ilias_path not in self._ilias_paths:
-                self._ilias_paths[ilias_path] = {'plugins': {}, 'files': self._find_analyzable_files(ilias_path)}
-            ilias_paths.append(ilias_path)
-        return ilias_paths
+        walker = self._walker(('ilias.php', 'client.ini.php'), excluded_folders)
+        found = walker.scan(str(start_path))
+        self._add_counters(dirs_visited=walker.dirs_visited, dirs_pruned=walker.dirs_pruned)
+        return self._add_installations(found)
 
     def find_plugins(self, start_path, excluded_folders=None):
         """Recursively searches a path for all ILIAS plugins
@@ -280,35 +880,72 @@ class IliasPathFinder:
         :type start_path: str
         :param excluded_folders: list of folders to skip while searching
         :type excluded_folders: list
-        :return: yields full path to each found ILIAS installation
-        :rtype: str
+        :return: full path to each found ILIAS plugin
+        :rtype: list
         """
-        excluded_dirs = self._extend_excluded_folders(excluded_folders)
+        walker = self._walker(('plugin.php',), excluded_folders)
+        found = walker.scan(str(start_path))
+        self._add_counters(dirs_visited=walker.dirs_visited, dirs_pruned=walker.dirs_pruned)
+        return self._add_plugins(found['plugin.php'])
+
+    def _add_installations(self, found):
+        ilias_paths = []
+        new_paths = set()
+        self._view = None
+
+        for file in found['ilias.php']:
+            ilias_path = osp.dirname(file)
+            # ilias.php files inside of plugins do not mark an installation
+            if 'Customizing/global' in ilias_path:
+                continue
+            if ilias_path not in self._ilias_paths:
+                self._ilias_paths[ilias_path] = {'plugins': {}, 'files': self._find_analyzable_files(ilias_path)}
+                new_paths.add(ilias_path)
+            ilias_paths.append(ilias_path)
+
+        # every client belongs to the nearest installation it is located in
+        installations = PathTrie(self._ilias_paths)
+        for client_ini in found.get('client.ini.php', []):
+            ilias_path = installations.nearest(client_ini)
+            if ilias_path in new_paths:
+                self._ilias_paths[ilias_path]['files']['client.ini.php'].append(client_ini)
+        return ilias_paths
+
+    def _add_plugins(self, plugin_files):
         plugin_paths = []
+        installations = PathTrie(self._ilias_paths)
+        self._view = None
 
-        for file in find_files_recursive(start_path, 'plugin.php', excluded_dirs):
+        for file in plugin_files:
             plugin_path = osp.dirname(file)
             plugin_paths.append(plugin_path)
-            for path, d in self._ilias_paths.items():
-                if path in plugin_path:
-                    d['plugins'][osp.basename(plugin_path)] = file
+            ilias_path = installations.nearest(plugin_path)
+            if ilias_path is not None:
+                self._ilias_paths[ilias_path]['plugins'][osp.basename(plugin_path)] = file
 
         return plugin_paths
 
     def _find_analyzable_files(self, ilias_path):
-        d = {
+        return {
             '.gitmodules': osp.join(ilias_path, '.gitmodules'),
             'ilias.ini.php': osp.join(ilias_path, 'ilias.ini.php'),
             'inc.ilias_version.php': osp.join(ilias_path, 'include', 'inc.ilias.version.php'),
             'client.ini.php': []
         }
 
-        for client_ini in find_files_recursive(ilias_path, 'client.ini.php'):
-            d['client.ini.php'].append(client_ini)
-        return d
+    def _walker(self, target_names, excluded_folders, cache=None):
+        return TreeWalker(
+            target_names, self._extend_excluded_folders(excluded_folders), self._exclude_mode, self._walk_workers,
+            cache, self._metrics
+        )
+
+    def _add_counters(self, **counters):
+        if self._metrics is not None:
+            for counter, n in counters.items():
+                self._metrics.add(counter, n)
 
     def _extend_excluded_folders(self, excluded_folders):
-        excluded_dirs = deepcopy(self._excluded)
+        excluded_dirs = list(self._excluded)
         if excluded_folders and isinstance(excluded_folders, list):
             excluded_dirs.extend(excluded_folders)
         return excluded_dirs
@@ -316,16 +953,178 @@ class IliasPathFinder:
 
 class GitHelper:
 
-    def __init__(self):
+    def __init__(self, metrics=None):
+        """
+        :param metrics: counts the git processes spawned
+        :type metrics: ilinfo.metrics.RunMetrics
+        """
+        # remotes per repository config file
         self._data = {}
+        self._user_config = None
+        self._metrics = metrics
 
-    __slots__ = '_data'
+    __slots__ = ('_data', '_user_config', '_metrics')
 
     @property
     def data(self):
-        return deepcopy(self._data)
+        """The remotes read so far per repository config file, read-only
+
+        :rtype: ilinfo.utils.FrozenDict
+        """
+        return FrozenDict(self._data)
 
     def parse_git_remotes(self, repo_path):
+        """Returns the remotes of the repository repo_path belongs to
+
+        The repository's config is read directly, following .git files of submodules and worktrees, and cached, so
+        plugins sharing a repository are read once. "git remote -v" is only run if the config contains something the
+        reader does not understand.
+
+        :param repo_path: path inside of a git work tree
+        :type repo_path: str
+        :return: {'remote_name': 'url'}
+        :rtype: dict
+        """
+        if 'GIT_DIR' in os.environ:
+            return self._run_git_remote(repo_path)
+        repo = find_repository(repo_path)
+        if repo is None:
+            return {}
+
+        config_path = osp.join(repo.common_dir, 'config')
+        if config_path not in self._data:
+            try:
+                remotes = self._read_user_config().extend(GitConfig.read(config_path)).remotes()
+            except GitConfigError:
+                remotes = self._run_git_remote(repo_path)
+            self._data[config_path] = freeze(remotes)
+        return dict(self._data[config_path])
+
+    def collect_states(self, repo_paths, concurrency=8, timeout=10.0, dirty=True):
+        """Collects the checked out commit, branch, upstream divergence and dirty flag of the repositories the paths
+        belong to
+
+        See collect_states_async, which this runs in a new event loop.
+
+        :param repo_paths: paths inside of git work trees
+        :type repo_paths: iterable
+        :param concurrency: maximum number of git processes running at the same time
+        :type concurrency: int
+        :param timeout: seconds a single git process may take
+        :type timeout: float
+        :param dirty: whether to run "git status" for the dirty flag
+        :type dirty: bool
+        :return: {'repo_path': state dict or None, if repo_path is not inside of a repository}
+        :rtype: dict
+        """
+        import asyncio
+        return asyncio.run(self.collect_states_async(repo_paths, concurrency, timeout, dirty))
+
+    async def collect_states_async(self, repo_paths, concurrency=8, timeout=10.0, dirty=True, semaphore=None):
+        """Coroutine version of collect_states
+
+        HEAD, the branch and its upstream are read from disk. A git process is only spawned to count how far HEAD and
+        upstream diverged, if they differ, and for "git status". Paths in the same repository share one collection.
+
+        :param semaphore: limits the git processes instead of concurrency, to share a limit with other callers
+        :type semaphore: asyncio.Semaphore
+        :rtype: dict
+        """
+        import asyncio
+        semaphore = semaphore or asyncio.Semaphore(concurrency)
+        repos = {str(path): find_repository(path) for path in repo_paths}
+        pending = {}
+        for repo in repos.values():
+            if repo is not None and repo.git_dir not in pending:
+                pending[repo.git_dir] = asyncio.ensure_future(self._repo_state(repo, semaphore, timeout, dirty))
+
+        states = dict(zip(pending, await asyncio.gather(*pending.values())))
+        return {path: dict(states[repo.git_dir]) if repo else None for path, repo in repos.items()}
+
+    async def _repo_state(self, repo, semaphore, timeout, dirty):
+        head, branch = read_head(repo)
+        state = {'work_tree': repo.work_tree, 'head': head, 'branch': branch, 'upstream': None,
+                 'ahead': None, 'behind': None, 'dirty': None}
+        errors = []
+
+        upstream_ref = self._upstream_ref(repo, branch)
+        if upstream_ref:
+            state['upstream'] = upstream_ref[len('refs/remotes/'):]
+            upstream = resolve_ref(repo, upstream_ref)
+            if head and upstream == head:
+                state['ahead'] = state['behind'] = 0
+            elif head and upstream:
+                counts = await self._run_git_async(
+                    repo.work_tree, ['rev-list', '--left-right', '--count', f'{head}...{upstream}'], semaphore, timeout,
+                    errors
+                )
+                if counts:
+                    state['ahead'], state['behind'] = (int(n) for n in counts.split())
+
+        if dirty:
+            # GIT_OPTIONAL_LOCKS=0 keeps git status from writing the index of a production checkout
+            status = await self._run_git_async(
+                repo.work_tree, ['status', '--porcelain', '--untracked-files=no'], semaphore, timeout, errors
+            )
+            if status is not None:
+                state['dirty'] = bool(status.strip())
+
+        if errors:
+            state['error'] = '; '.join(errors)
+        return state
+
+    def _upstream_ref(self, repo, branch):
+        if not branch:
+            return None
+        try:
+            config = self._read_user_config().extend(GitConfig.read(osp.join(repo.common_dir, 'config')))
+        except GitConfigError:
+            return None
+        remote = (config.get_all('branch', branch, 'remote') or [None])[-1]
+        merge = (config.get_all('branch', branch, 'merge') or [None])[-1]
+        if not remote or not merge or remote == '.':
+            return None
+        return f"refs/remotes/{remote}/{merge[len('refs/heads/'):] if merge.startswith('refs/heads/') else merge}"
+
+    async def _run_git_async(self, work_tree, args, semaphore, timeout, errors):
+        import asyncio
+        async with semaphore:
+            try:
+                proc = await asyncio.create_subprocess_exec(
+                    'git', *args, cwd=work_tree, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
+                    env=dict(os.environ, GIT_OPTIONAL_LOCKS='0')
+                )
+            except OSError as err:
+                errors.append(str(err))
+                return None
+            self._count_process()
+            try:
+                stdout, stderr = await asyncio.wait_for(proc.communicate(), timeout)
+            except asyncio.TimeoutError:
+                try:
+                    proc.kill()
+                except ProcessLookupError:
+                    # exited between the timeout and the kill
+                    pass
+                await proc.wait()
+                errors.append(f"git {args[0]} timed out after {timeout}s")
+                return None
+        if proc.returncode != 0:
+            errors.append(stderr.decode('utf-8', 'replace').strip() or f"git {args[0]} failed")
+            return None
+        return stdout.decode('utf-8', 'replace')
+
+    def _read_user_config(self):
+        if self._user_config is None:
+            config = GitConfig()
+            for file_path in user_config_files():
+                config = config.extend(GitConfig.read(file_path, missing_ok=True))
+            self._user_config = config
+        return self._user_config
+
+    def _run_git_remote(self, repo_path):
+        import subprocess
+        self._count_process()
         try:
             if "run" in dir(subprocess):
                 # CalledProcessError
@@ -334,9 +1133,14 @@ class GitHelper:
             else:
                 cp = subprocess.check_output(['git', 'remote', '-v'], cwd=repo_path)
                 return self._format_git_remote_to_dict(str(cp, 'utf-8'))
-        except subprocess.CalledProcessError as err:
-            print(err)
-            return ""
+        except (subprocess.CalledProcessError, OSError) as err:
+            # OSError: git is not installed
+            logging.getLogger('ilinfo').warning("git remote -v failed in %s: %s", repo_path, err)
+            return {}
+
+    def _count_process(self):
+        if self._metrics is not None:
+            self._metrics.add('git_processes')
 
     def _format_git_remote_to_dict(self, remote_str):
         remote_dict = {}
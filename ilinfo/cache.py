@@ -0,0 +1,233 @@
+# Created by Andre Machon 18/10/2026
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from os import path as osp
+from pathlib import Path
+
+from ilinfo.discovery import DirectoryCache
+
+__all__ = ['ParseCache']
+
+
+class ParseCache:
+    """Persistent cache of parse results, shared by runs and by the processes and threads parsing in parallel
+
+    A file's result is looked up by (device, inode, size, mtime_ns). If that changed, or the file was modified shortly
+    before it was cached (see DirectoryCache), the content hash decides: a file with the same content as a cached one,
+    at the same path or at any other, gets that result. Results are stored without their 'source_file' key, which is
+    set to the looked up path on a hit, so the same plugin deployed in many installations is parsed once.
+
+    The cache is a SQLite database in WAL mode, so several processes can read and write it at the same time. New
+    results and the last use of hits are written in batches, see flush. Once it holds more than max_entries results,
+    the least recently used ones are dropped.
+    """
+
+    # bump whenever a parser's results change, the stored results are dropped on the next open
+    VERSION = 1
+    RACY_NS = DirectoryCache.RACY_NS
+    FLUSH_EVERY = 256
+
+    def __init__(self, cache_file, max_entries=100000):
+        """
+        :param cache_file: path of the SQLite database the cache is stored in
+        :type cache_file: str
+        :param max_entries: number of results kept, the least recently used ones beyond it are dropped
+        :type max_entries: int
+        """
+        self._cache_file = Path(cache_file)
+        self._max_entries = max_entries
+        self._connection = None
+        self._pid = None
+        # (kind, path) -> row, and (kind, digest) -> value, of results not written yet
+        self._pending = {}
+        self._pending_digests = {}
+        self._used = {}
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+
+    __slots__ = ('_cache_file', '_max_entries', '_connection', '_pid', '_pending', '_pending_digests', '_used',
+                 '_lock', 'hits', 'misses')
+
+    @staticmethod
+    def default_path():
+        """Returns the default cache file, shared by all start paths
+
+        :rtype: Path
+        """
+        cache_home = os.environ.get('XDG_CACHE_HOME') or osp.join(osp.expanduser('~'), '.cache')
+        return Path(cache_home) / 'ilinfo' / 'parsecache.sqlite3'
+
+    @property
+    def cache_file(self):
+        return self._cache_file
+
+    @property
+    def max_entries(self):
+        return self._max_entries
+
+    def get(self, kind, file_path, parse):
+        """Returns the cached result of parse(file_path), parsing and storing it if there is none
+
+        Results of files that can't be stat()ed and results parse raises for are not cached.
+
+        :param kind: name of the parser, results of different kinds never mix
+        :type kind: str
+        :param file_path: path of the file to parse
+        :type file_path: str
+        :param parse: function parsing file_path into a JSON serializable dict
+        :type parse: callable
+        :rtype: dict
+        """
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            return parse(file_path)
+
+        path = str(file_path)
+        key = (stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns)
+        with self._lock:
+            row = self._row(kind, path)
+            if row is not None and row[0] and tuple(row[1:5]) == key:
+                return self._hit(kind, path, row[6], file_path)
+
+        try:
+            with open(file_path, 'rb') as f:
+                digest = hashlib.sha1(f.read()).hexdigest()
+        except OSError:
+            return parse(file_path)
+        with self._lock:
+            value = self._value_by_digest(kind, digest)
+            if value is not None:
+                self._store(kind, path, stat, digest, value)
+                return self._hit(kind, path, value, file_path)
+
+        result = parse(file_path)
+        value = _encode(result)
+        with self._lock:
+            self.misses += 1
+            self._store(kind, path, stat, digest, value)
+        return result
+
+    def flush(self):
+        """Writes the new results and the last use of hits to the database, then drops results beyond max_entries"""
+        with self._lock:
+            if not self._pending and not self._used:
+                return
+            connection = self._connect()
+            with connection:
+                connection.executemany(
+                    'INSERT OR REPLACE INTO results (kind, path, trusted, dev, ino, size, mtime_ns, digest, value, '
+                    'last_used) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                    [(kind, path, *row) for (kind, path), row in self._pending.items()]
+                )
+                connection.executemany(
+                    'UPDATE results SET last_used = ? WHERE kind = ? AND path = ? AND last_used < ?',
+                    [(used, kind, path, used) for (kind, path), used in self._used.items()]
+                )
+                excess = connection.execute('SELECT count(*) FROM results').fetchone()[0] - self._max_entries
+                if excess > 0:
+                    connection.execute(
+                        'DELETE FROM results WHERE rowid IN (SELECT rowid FROM results ORDER BY last_used LIMIT ?)',
+                        (excess,)
+                    )
+            self._pending = {}
+            self._pending_digests = {}
+            self._used = {}
+
+    def close(self):
+        """Flushes and closes the database, the cache can still be used afterwards"""
+        with self._lock:
+            self.flush()
+            if self._connection is not None and self._pid == os.getpid():
+                self._connection.close()
+            self._connection = None
+
+    def __reduce__(self):
+        # every worker process opens the database once and uses it for all the jobs it runs
+        return _process_cache, (str(self._cache_file), self._max_entries)
+
+    def _hit(self, kind, path, value, file_path):
+        self.hits += 1
+        self._used[(kind, path)] = time.time_ns()
+        return _decode(value, file_path)
+
+    def _store(self, kind, path, stat, digest, value):
+        now = time.time_ns()
+        trusted = stat.st_mtime_ns < now - self.RACY_NS
+        self._pending[(kind, path)] = (
+            trusted, stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns, digest, value, now
+        )
+        self._pending_digests[(kind, digest)] = value
+        if len(self._pending) >= self.FLUSH_EVERY:
+            self.flush()
+
+    def _row(self, kind, path):
+        row = self._pending.get((kind, path))
+        if row is not None:
+            return row
+        return self._connect().execute(
+            'SELECT trusted, dev, ino, size, mtime_ns, digest, value FROM results WHERE kind = ? AND path = ?',
+            (kind, path)
+        ).fetchone()
+
+    def _value_by_digest(self, kind, digest):
+        value = self._pending_digests.get((kind, digest))
+        if value is not None:
+            return value
+        row = self._connect().execute(
+            'SELECT value FROM results WHERE kind = ? AND digest = ? LIMIT 1', (kind, digest)
+        ).fetchone()
+        return row[0] if row else None
+
+    def _connect(self):
+        # a connection must not be used across fork, a forked worker opens its own
+        if self._connection is not None and self._pid == os.getpid():
+            return self._connection
+
+        self._cache_file.parent.mkdir(parents=True, exist_ok=True)
+        connection = sqlite3.connect(str(self._cache_file), timeout=30, check_same_thread=False)
+        connection.execute('PRAGMA journal_mode = WAL')
+        connection.execute('PRAGMA synchronous = NORMAL')
+        with connection:
+            if connection.execute('PRAGMA user_version').fetchone()[0] != self.VERSION:
+                connection.execute('DROP TABLE IF EXISTS results')
+                connection.execute(f'PRAGMA user_version = {self.VERSION}')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS results (kind TEXT NOT NULL, path TEXT NOT NULL, trusted INTEGER NOT NULL,'
+                ' dev INTEGER, ino INTEGER, size INTEGER, mtime_ns INTEGER, digest TEXT NOT NULL, value TEXT NOT NULL,'
+                ' last_used INTEGER NOT NULL, PRIMARY KEY (kind, path))'
+            )
+            connection.execute('CREATE INDEX IF NOT EXISTS results_digest ON results (kind, digest)')
+            connection.execute('CREATE INDEX IF NOT EXISTS results_last_used ON results (last_used)')
+        if self._pid is not None:
+            # forked, the results pending in the parent are written by the parent
+            self._pending, self._pending_digests, self._used = {}, {}, {}
+        self._connection = connection
+        self._pid = os.getpid()
+        return connection
+
+
+# (cache_file, max_entries) -> ParseCache of this process
+_PROCESS_CACHES = {}
+
+
+def _process_cache(cache_file, max_entries):
+    key = (cache_file, max_entries)
+    if key not in _PROCESS_CACHES:
+        _PROCESS_CACHES[key] = ParseCache(cache_file, max_entries)
+    return _PROCESS_CACHES[key]
+
+
+def _encode(result):
+    # the items in their order, 'source_file' is left out so the value does not depend on where the file is
+    return json.dumps([None if key == 'source_file' else [key, value] for key, value in result.items()])
+
+
+def _decode(value, file_path):
+    # decoded on every hit, callers get a dict of their own to change
+    return dict(['source_file', file_path] if item is None else item for item in json.loads(value))
@@ -1,8 +1,16 @@
 # Created by Andre Machon 07/02/2021
 
+import json
+import os.path as osp
+import sys
+
 import click
 
-from ilinfo import Analyzer, JSONOutput
+# the commands import what they use, so "ilinfo --help" and each command only load the modules they need, e.g. the
+# MySQL driver only with analyze --with-db
+from ilinfo.discovery import EXCLUDE_MODES
+
+LOG_LEVELS = ('DEBUG', 'INFO', 'WARNING', 'ERROR')
 
 INI_MAPPING = {
     "ilias.ini.php": {
@@ -17,6 +25,7 @@ INI_MAPPING = {
     },
 }
 
+# directory names, absolute prefixes or globs, see ilinfo.discovery.ExclusionMatcher
 EXCLUDED_FOLDERS = [
     'Backup', 'backup', '_Examples', 'Dump', 'dump', 'iliasold', 'ilias5_old', 'ilias4_old', 'defekt',
     'ilias5old', 'ilias4old', 'iliasOld', 'iliasold', 'ilias4svn', 'ilias5svn',
@@ -25,31 +34,405 @@ EXCLUDED_FOLDERS = [
 
 
 @click.group()
-@click.option('--debug', default=False) # TODO implement
-@click.option('-l', '--log-level') # TODO implement, set params here: default=LOG_LEVEL_INFO, show_default=True
+@click.option('--debug', is_flag=True,
+              help='Write a run report of analyze, see its --report option, and log at DEBUG level')
+@click.option('-l', '--log-level', type=click.Choice(LOG_LEVELS, case_sensitive=False),
+              help='Level of the log written to stderr  [default: WARNING, DEBUG with --debug]')
 @click.pass_context
 def main(ctx, debug, log_level):
+    import logging
+
     ctx.ensure_object(dict)
     ctx.obj['debug'] = debug
-    ctx.obj['log_level'] = log_level
-    click.secho(f"ILIAS Info CLI", fg='green') # TODO output version dynamically from __about__.py
+    ctx.obj['log_level'] = (log_level or ('DEBUG' if debug else 'WARNING')).upper()
+    # the level is the one of ilinfo's own log, other libraries, like asyncio, only get to log warnings
+    logging.basicConfig(stream=sys.stderr, format='%(levelname)s %(name)s: %(message)s')
+    logging.getLogger('ilinfo').setLevel(ctx.obj['log_level'])
+    # TODO output version dynamically from __about__.py
+    # the stdout of agent and diff carries their records, the banner goes to stderr there
+    click.secho(f"ILIAS Info CLI", fg='green', err=ctx.invoked_subcommand in ('agent', 'diff'))
 
 
 @main.command()
 @click.argument('start-path', type=str, default='/')
 # @click.option('-c', '--parse-config') TODO implement this, read config from file
 @click.option('-o', '--output-path', type=str)
+@click.option('-f', '--format', 'output_format', type=click.Choice(['json', 'ndjson', 'sqlite']), default='json',
+              show_default=True,
+              help="'ndjson' writes one record per installation as soon as it is parsed, 'sqlite' adds a snapshot to "
+                   "ilinfo.sqlite3")
+@click.option('--stream', is_flag=True, help='Write ilinfo.json incrementally, one installation at a time')
+@click.option('--exclude-mode', type=click.Choice(EXCLUDE_MODES), default='path', show_default=True,
+              help="'substring' skips every path that contains one of the excluded folders")
+@click.option('--walk-workers', type=click.IntRange(min=1), default=1, show_default=True,
+              help='Number of threads listing directories concurrently, speeds up scans of NFS or CIFS mounts')
+@click.option('--incremental', is_flag=True, help='Only list directories that changed since the last run')
+@click.option('--cache-file', type=click.Path(dir_okay=False),
+              help='Directory cache used by --incremental, defaults to one file per start path in ~/.cache/ilinfo')
+@click.option('--full-rescan', is_flag=True, help='Ignore the directory cache of --incremental and rebuild it')
+@click.option('--parse-cache', 'use_parse_cache', is_flag=True,
+              help='Reuse the results of files that did not change since an earlier run')
+@click.option('--parse-cache-file', type=click.Path(dir_okay=False),
+              help='Database of --parse-cache, defaults to ~/.cache/ilinfo/parsecache.sqlite3')
+@click.option('--parse-cache-size', type=click.IntRange(min=1), default=100000, show_default=True,
+              help='Number of results --parse-cache keeps, the least recently used ones beyond it are dropped')
+@click.option('--git-state', is_flag=True,
+              help='Add commit, branch, upstream divergence and dirty flag of every installation and plugin repository')
+@click.option('--git-concurrency', type=click.IntRange(min=1), default=8, show_default=True,
+              help='Maximum number of git processes running at the same time for --git-state')
+@click.option('--git-timeout', type=float, default=10.0, show_default=True,
+              help='Seconds a single git process of --git-state may take')
+@click.option('-j', '--jobs', type=click.IntRange(min=1), default=1, show_default=True,
+              help='Number of processes parsing installations in parallel, not with --async or --db-probe')
+@click.option('--async', 'use_async', is_flag=True,
+              help='Overlap file parsing, git processes and database probes of the installations on asyncio')
+@click.option('--io-workers', type=click.IntRange(min=1), default=8, show_default=True,
+              help='Number of threads parsing files for --async')
+@click.option('--db-probe', is_flag=True, help="Check whether each client's database server accepts connections, "
+                                               "implies --async")
+@click.option('--with-db', is_flag=True,
+              help="Read schema version, active plugins and user counts from each client's database")
+@click.option('--db-concurrency', type=click.IntRange(min=1), default=8, show_default=True,
+              help='Number of client databases --with-db reads at the same time')
+@click.option('--db-pool-size', type=click.IntRange(min=1), default=4, show_default=True,
+              help='Maximum number of connections --with-db opens to a single database server and user')
+@click.option('--db-connect-timeout', type=float, default=5.0, show_default=True,
+              help='Seconds connecting to a database server may take, a server that times out is skipped afterwards')
+@click.option('--db-query-timeout', type=float, default=10.0, show_default=True,
+              help='Seconds a single query of --with-db may take')
+@click.option('--report', 'report_file', type=click.Path(dir_okay=False),
+              help='Write a JSON run report: wall and CPU time per stage, directories visited and pruned, files '
+                   'opened, bytes read, git processes, cache hits and the slowest files and directories. Defaults to '
+                   'ilinfo-report.json next to the result file with --debug')
+@click.option('--prometheus', 'prometheus_file', type=click.Path(dir_okay=False),
+              help='Write the run report for the textfile collector of the node exporter as well, to a .prom file')
+@click.option('--slowest', type=click.IntRange(min=0), default=10, show_default=True,
+              help='Number of the slowest files and directories in the run report')
+@click.pass_obj
+def analyze(obj, start_path, output_path, output_format, stream, exclude_mode, walk_workers, incremental, cache_file,
+            full_rescan, use_parse_cache, parse_cache_file, parse_cache_size, git_state, git_concurrency, git_timeout,
+            jobs, use_async, io_workers, db_probe, with_db, db_concurrency, db_pool_size, db_connect_timeout,
+            db_query_timeout, report_file, prometheus_file, slowest):
+    if jobs > 1 and (use_async or db_probe):
+        # AsyncAnalyzer parses the installations in the threads of --io-workers, it has no worker processes
+        raise click.UsageError("--jobs can't be combined with --async or --db-probe, use --io-workers instead")
+    from ilinfo.analyzers import Analyzer, AsyncAnalyzer, IliasFileParser, IliasPathFinder
+    from ilinfo.output_processors import JSONOutput, StreamingJSONOutput, SQLiteOutput
+
+    metrics = None
+    if obj['debug'] or report_file or prometheus_file:
+        from ilinfo.metrics import RunMetrics
+        metrics = RunMetrics(slowest)
+    dir_cache = None
+    if incremental:
+        from ilinfo.discovery import DirectoryCache
+        dir_cache = DirectoryCache(cache_file or DirectoryCache.default_path(start_path), full_rescan)
+    pathfinder = IliasPathFinder(exclude_mode=exclude_mode, walk_workers=walk_workers, dir_cache=dir_cache,
+                                 metrics=metrics)
+    parse_cache = None
+    if use_parse_cache or parse_cache_file:
+        from ilinfo.cache import ParseCache
+        parse_cache = ParseCache(parse_cache_file or ParseCache.default_path(), parse_cache_size)
+    db_inspector = None
+    if with_db:
+        from ilinfo.db import DBInspector
+        db_inspector = DBInspector(db_concurrency, db_pool_size, db_connect_timeout, db_query_timeout)
+    fileparser = IliasFileParser(git_state, git_concurrency, git_timeout, jobs, parse_cache, db_inspector, metrics)
+    if output_format == 'sqlite':
+        processor = SQLiteOutput(output_path=output_path)
+    elif output_format == 'ndjson' or stream:
+        processor = StreamingJSONOutput(output_path=output_path, fmt=output_format)
+    else:
+        processor = JSONOutput(output_path=output_path) if output_path else None
+    if use_async or db_probe:
+        analyzer = AsyncAnalyzer(fileparser, pathfinder, output_processor=processor, excluded_folders=EXCLUDED_FOLDERS,
+                                 io_concurrency=io_workers, db_probe=db_probe, metrics=metrics)
+    else:
+        analyzer = Analyzer(fileparser, pathfinder, output_processor=processor, excluded_folders=EXCLUDED_FOLDERS,
+                            metrics=metrics)
+
+    try:
+        json_path = analyzer.analyze_path(start_path)
+    finally:
+        if parse_cache is not None:
+            parse_cache.close()
+        if db_inspector is not None:
+            db_inspector.close()
+    if isinstance(processor, SQLiteOutput):
+        click.secho(f"SQLite database was updated at: {json_path}, snapshot {processor.snapshot}", fg='green')
+    else:
+        click.secho(f"JSON result file was created at: {json_path}", fg='green')
+    if isinstance(processor, (StreamingJSONOutput, SQLiteOutput)):
+        summary = processor.summary
+        click.echo(f"{summary['installations']} installations, {summary['errors']} with errors, "
+                   f"{summary['seconds']}s")
+    if parse_cache is not None:
+        click.echo(f"parse cache: {parse_cache.hits} hits, {parse_cache.misses} misses")
+    if db_inspector is not None:
+        for host, down in db_inspector.hosts_down.items():
+            click.secho(f"database server {host} is down, {down['error_class']}: {down['error']}", fg='yellow')
+    if metrics is not None:
+        _write_report(metrics, report_file or osp.join(osp.dirname(str(json_path)), 'ilinfo-report.json'),
+                      prometheus_file, start_path=start_path, result_file=str(json_path))
+
+
+def _write_report(metrics, report_file, prometheus_file, **fields):
+    import logging
+    log = logging.getLogger('ilinfo')
+    report = metrics.report(**fields)
+    for name, stage in report['stages'].items():
+        log.info('stage %s: %.3fs wall, %.3fs cpu', name, stage['wall_seconds'], stage['cpu_seconds'])
+    for entry in report['slowest_files']:
+        log.debug('slow file %s: %.3fs, %d bytes', entry['path'], entry['seconds'], entry['bytes'])
+    for entry in report['slowest_dirs']:
+        log.debug('slow directory %s: %.3fs, %d entries', entry['path'], entry['seconds'], entry['entries'])
+    click.echo(f"run report was written to: {metrics.write_json(report_file, report)}")
+    if prometheus_file:
+        click.echo(f"Prometheus metrics were written to: {metrics.write_prometheus(prometheus_file, report)}")
+
+
+def _address(value):
+    host, _, port = value.rpartition(':')
+    if not port.isdigit():
+        raise click.BadParameter(f"{value} is not HOST:PORT")
+    return host or '127.0.0.1', int(port)
+
+
+def _is_loopback(host):
+    import ipaddress
+    if host == 'localhost':
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        # a host name, it may resolve to any interface
+        return False
+
+
+@main.command()
+@click.argument('start-path', type=str, default='/')
+@click.option('--connect', type=str, help='HOST:PORT of ilinfo collect, the records are written to stdout without it')
+@click.option('--exclude-mode', type=click.Choice(EXCLUDE_MODES), default='path', show_default=True,
+              help="'substring' skips every path that contains one of the excluded folders")
+@click.option('--walk-workers', type=click.IntRange(min=1), default=1, show_default=True,
+              help='Number of threads listing directories concurrently, speeds up scans of NFS or CIFS mounts')
+@click.option('--git-state', is_flag=True,
+              help='Add commit, branch, upstream divergence and dirty flag of every installation and plugin repository')
+@click.option('-j', '--jobs', type=click.IntRange(min=1), default=1, show_default=True,
+              help='Number of processes parsing installations in parallel')
+@click.option('--parse-cache', 'use_parse_cache', is_flag=True,
+              help='Reuse the results of files that did not change since an earlier run')
+@click.option('--level', type=click.IntRange(0, 9), default=6, show_default=True,
+              help='zlib compression level of the records')
+@click.option('--with-passwords', is_flag=True,
+              help="Send the passwords of the clients' databases too, the records are not encrypted")
+@click.pass_obj
+def agent(obj, start_path, connect, exclude_mode, walk_workers, git_state, jobs, use_parse_cache, level,
+          with_passwords):
+    """Analyzes START_PATH and streams each installation to ilinfo collect as soon as it is parsed
+
+    The records are neither encrypted nor authenticated. Run the agent through ssh with ilinfo collect --spawn, or
+    --connect to a collector on another host through an ssh tunnel.
+    """
+    from ilinfo.analyzers import Analyzer, IliasFileParser, IliasPathFinder
+    from ilinfo.output_processors import AgentOutput
+
+    if connect:
+        processor = AgentOutput(address=_address(connect), level=level, with_passwords=with_passwords)
+    else:
+        processor = AgentOutput(sys.stdout.buffer, level=level, with_passwords=with_passwords)
+    parse_cache = None
+    if use_parse_cache:
+        from ilinfo.cache import ParseCache
+        parse_cache = ParseCache(ParseCache.default_path())
+    fileparser = IliasFileParser(git_state=git_state, jobs=jobs, parse_cache=parse_cache)
+    analyzer = Analyzer(fileparser, IliasPathFinder(exclude_mode=exclude_mode, walk_workers=walk_workers),
+                        output_processor=processor, excluded_folders=EXCLUDED_FOLDERS)
+    try:
+        summary = analyzer.analyze_path(start_path)
+    finally:
+        if parse_cache is not None:
+            parse_cache.close()
+    click.echo(f"{summary['installations']} installations sent, {summary['errors']} with errors", err=True)
+
+
+@main.command()
+@click.option('-o', '--output-path', type=str)
+@click.option('--listen', type=str, help='HOST:PORT agents connect to with --connect, HOST defaults to 127.0.0.1')
+@click.option('--allow-remote', is_flag=True,
+              help='Allow --listen on an address other hosts can reach, the records arrive unencrypted and '
+                   'unauthenticated')
+@click.option('--expect', type=click.IntRange(min=1),
+              help='Number of agents connecting to --listen, collecting ends once they are done. Without it, '
+                   'collecting ends with Ctrl+C')
+@click.option('--spawn', 'commands', type=str, multiple=True,
+              help='Command writing the records of an agent to stdout, e.g. "ssh web01 ilinfo agent /". Repeatable')
+@click.option('--max-agents', type=click.IntRange(min=1), default=64, show_default=True,
+              help='Number of agents read at the same time, further ones wait')
 @click.pass_obj
-def analyze(obj, start_path, output_path):
-    # TODO analyze obj to set log level etc.
-    if output_path:
+def collect(obj, output_path, listen, allow_remote, expect, commands, max_agents):
+    """Merges the records of many agents into one ilinfo.ndjson, as they arrive
+
+    The records are neither encrypted nor authenticated, so --listen accepts local connections only. Agents on other
+    hosts are run through ssh with --spawn, e.g. --spawn "ssh web01 ilinfo agent /", or connect through an ssh tunnel
+    to the collector, e.g. "ssh -R 9000:127.0.0.1:9000 web01 ilinfo agent / --connect 127.0.0.1:9000" next to
+    --listen :9000.
+    """
+    import socket
+    from ilinfo.collect import Collector
+    from ilinfo.output_processors import StreamingJSONOutput
+
+    if not listen and not commands:
+        raise click.UsageError("Nothing to collect from, use --listen or --spawn")
+    sock = None
+    if listen:
+        address = _address(listen)
+        if not allow_remote and not _is_loopback(address[0]):
+            raise click.UsageError(f"{listen} can be reached from other hosts, use an ssh tunnel to 127.0.0.1 or give "
+                                   f"--allow-remote")
+        sock = socket.create_server(address)
+        click.secho(f"Listening on {listen}", fg='green')
+    processor = StreamingJSONOutput(output_path=output_path, fmt='ndjson')
+    collector = Collector(processor, max_agents)
+    try:
+        collector.run(sock, commands, expect)
+    except KeyboardInterrupt:
+        # the inventory got its summary when collecting was cancelled
+        pass
+    finally:
+        if sock is not None:
+            sock.close()
+    counts = collector.counts
+    click.secho(f"NDJSON inventory was created at: {processor.file_path}", fg='green')
+    click.echo(f"{counts['agents']} agents, {counts['agents'] - counts['complete']} incomplete, "
+               f"{processor.summary['installations']} installations")
+
+
+@main.command()
+@click.argument('result-files', type=str, nargs=-1, required=True)
+@click.option('-o', '--output-path', type=str)
+@click.option('-f', '--format', 'output_format', type=click.Choice(['ndjson', 'json', 'sqlite']), default='ndjson',
+              show_default=True, help="'sqlite' adds the combined inventory to ilinfo.sqlite3 as a snapshot, 'json' "
+                                      "writes ilinfo.json keyed by HOST:PATH and needs the host of every file")
+def combine(result_files, output_path, output_format):
+    """Merges RESULT_FILES, ilinfo.json or ilinfo.ndjson of many runs, into one inventory
+
+    Installations are deduplicated by host and path, the one of the latest scan wins. An ilinfo.json does not know its
+    host, give it as HOST=FILE, otherwise its installations are only deduplicated within the file.
+    """
+    from ilinfo.output_processors import JSONOutput, StreamingJSONOutput, SQLiteOutput
+
+    files = []
+    for result_file in result_files:
+        host, sep, path = result_file.partition('=')
+        if not sep or osp.exists(result_file):
+            host, path = None, result_file
+        if not osp.isfile(path):
+            raise click.BadParameter(f"{path} is not a file", param_hint='RESULT_FILES')
+        files.append((host, path))
+    if output_format == 'sqlite':
+        processor = SQLiteOutput(output_path=output_path)
+    elif output_format == 'json':
         processor = JSONOutput(output_path=output_path)
-        analyzer = Analyzer(output_processor=processor, excluded_folders=EXCLUDED_FOLDERS)
     else:
-        analyzer = Analyzer(excluded_folders=EXCLUDED_FOLDERS)
+        processor = StreamingJSONOutput(output_path=output_path, fmt='ndjson')
+    try:
+        path = processor.combine_data(files)
+    except ValueError as err:
+        raise click.ClickException(str(err))
+    summary = processor.summary
+    click.secho(f"Combined inventory was created at: {path}", fg='green')
+    click.echo(f"{summary['installations']} installations from {summary['combined']['files']} files, "
+               f"{summary['combined']['duplicates']} duplicates left out")
+
+
+@main.command()
+@click.argument('db-file', type=click.Path(exists=True, dir_okay=False))
+@click.argument('sql', type=str)
+@click.option('-p', '--param', 'params', type=str, multiple=True, help='NAME=VALUE of the parameter :NAME in SQL')
+@click.option('--json', 'as_json', is_flag=True, help='Print one JSON object per row instead of tab separated values')
+def query(db_file, sql, params, as_json):
+    """Runs SQL against DB_FILE, written by analyze -f sqlite, read-only
+
+    SQL is a statement or one of the canned queries
+
+    \b
+        snapshots
+        plugins-older-than  -p plugin=ID -p version=VERSION
+        clients-on-db-host  -p db_host=HOST
+        plugin-versions
+    """
+    import sqlite3
+    from ilinfo.output_processors import SQLiteOutput
+
+    values = {}
+    for param in params:
+        name, sep, value = param.partition('=')
+        if not sep:
+            raise click.BadParameter(f"{param} is not NAME=VALUE", param_hint='--param')
+        values[name] = value
+    try:
+        columns, rows = SQLiteOutput.query(db_file, sql, values)
+    except sqlite3.Error as err:
+        raise click.ClickException(str(err))
+    if as_json:
+        for row in rows:
+            click.echo(json.dumps(dict(zip(columns, row))))
+    else:
+        click.echo('\t'.join(columns))
+        for row in rows:
+            click.echo('\t'.join('' if value is None else str(value) for value in row))
+
+
+@main.command()
+@click.argument('old', type=click.Path(exists=True, dir_okay=False))
+@click.argument('new', type=click.Path(exists=True, dir_okay=False))
+@click.option('-o', '--output', type=click.File('w', encoding='utf-8'), default='-',
+              help='File the change set is written to, stdout by default')
+@click.option('--exit-code', is_flag=True, help='Exit with 1 if there are changes, like diff does')
+def diff(old, new, output, exit_code):
+    """Writes what changed from inventory OLD to NEW, ilinfo.json or ilinfo.ndjson files, one change per line"""
+    from ilinfo.diff import InventoryDiff
+
+    inventory_diff = InventoryDiff(old, new)
+    changes = inventory_diff.write(output)
+    counts = inventory_diff.counts
+    click.echo(f"{changes} changes: {counts['added']} installations added, {counts['removed']} removed, "
+               f"{counts['changed']} changed, {counts['unchanged']} unchanged", err=True)
+    if exit_code and changes:
+        sys.exit(1)
+
+
+@main.command()
+@click.argument('start-path', type=str, default='/')
+@click.option('-o', '--output-path', type=str)
+@click.option('--exclude-mode', type=click.Choice(EXCLUDE_MODES), default='path', show_default=True,
+              help="'substring' skips every path that contains one of the excluded folders")
+@click.option('--debounce', type=float, default=2.0, show_default=True,
+              help='Seconds without further changes, before the output is rewritten')
+@click.option('--max-watches', type=click.IntRange(min=1), default=8192, show_default=True,
+              help='Upper limit of watched directories, plugins beyond it are polled')
+@click.pass_obj
+def watch(obj, start_path, output_path, exclude_mode, debounce, max_watches):
+    """Analyzes START_PATH once and keeps the result file up to date as ILIAS files change"""
+    from ilinfo.analyzers import IliasFileParser, IliasPathFinder
+    from ilinfo.output_processors import JSONOutput
+    from ilinfo.watch import InventoryWatcher
 
-    json_path = analyzer.analyze_path(start_path)
-    click.secho(f"JSON result file was created at: {json_path}", fg='green')
+    processor = JSONOutput(output_path=output_path) if output_path else JSONOutput()
+    watcher = InventoryWatcher(
+        IliasPathFinder(exclude_mode=exclude_mode), IliasFileParser(), processor, debounce, max_watches
+    )
+    json_path = watcher.start(start_path, EXCLUDED_FOLDERS)
+    click.secho(f"JSON result file was created at: {json_path}, watching {watcher.watch_count} directories", fg='green')
+    try:
+        while True:
+            if watcher.poll():
+                click.secho(f"JSON result file was updated at: {watcher.output_path}", fg='green')
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.close()
 
 
 if __name__ == '__main__':
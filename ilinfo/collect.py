@@ -0,0 +1,147 @@
+# Created by Andre Machon 18/10/2026
+import asyncio
+import time
+
+from ilinfo.output_processors import StreamingJSONOutput
+from ilinfo.wire import MAX_RECORD_SIZE, ProtocolError, read_records_async
+
+__all__ = ['Collector']
+
+
+class Collector:
+    """Merges the streams of many ilinfo agents into one NDJSON inventory, as their records arrive
+
+    Agents connect over TCP or are spawned as commands whose stdout is read, e.g. "ssh web01 ilinfo agent /". Every
+    installation is written to the inventory as soon as it is received, with the host and the start of the scan it
+    came from, nothing is kept. Memory is bounded by max_agents streams being read at the same time, each holding at
+    most one record of max_record_size. Further agents wait until a stream is done, commands are not started before.
+
+    After the installations of an agent, a record of type 'agent' tells how its stream ended:
+
+        {"type": "agent", "host": "web01", "peer": "10.0.0.5:53122", "installations": 12, "errors": 0,
+         "complete": true}
+
+    An agent whose stream broke off, or whose command failed, has complete false and an 'error'.
+    """
+
+    def __init__(self, output, max_agents=64, max_record_size=MAX_RECORD_SIZE):
+        """
+        :param output: output the inventory is written to, needs the 'ndjson' format
+        :type output: StreamingJSONOutput
+        :param max_agents: number of agent streams read at the same time
+        :type max_agents: int
+        :param max_record_size: bytes a single record of an agent may have
+        :type max_record_size: int
+        """
+        if not isinstance(output, StreamingJSONOutput):
+            raise TypeError("Param output needs to be of type StreamingJSONOutput")
+        if output.fmt != 'ndjson':
+            raise ValueError("The inventory of a collector needs the 'ndjson' format")
+        self._output = output
+        self._max_agents = max_agents
+        self._max_record_size = max_record_size
+        self._slots = None
+        self._counts = None
+
+    @property
+    def counts(self):
+        """Number of agents whose streams ended, complete or not, and of the complete ones"""
+        return dict(self._counts) if self._counts else None
+
+    def run(self, sock=None, commands=(), expect=None):
+        """Collects the streams of agents connecting to sock and of commands, see run_async
+
+        :return: path of the inventory
+        :rtype: Path
+        """
+        return asyncio.run(self.run_async(sock, commands, expect))
+
+    async def run_async(self, sock=None, commands=(), expect=None):
+        """Collects until every command is done and, if sock is given, expect agents connected to it
+
+        Without expect, agents are accepted until the collector is cancelled, e.g. with Ctrl+C. The inventory gets its
+        summary in any case.
+
+        :param sock: listening socket agents connect to
+        :type sock: socket.socket
+        :param commands: shell commands, each writing the stream of an agent to stdout
+        :type commands: collections.abc.Iterable
+        :param expect: number of agents connecting to sock, after which no further ones are accepted
+        :type expect: int
+        :return: path of the inventory
+        :rtype: Path
+        """
+        self._slots = asyncio.Semaphore(self._max_agents)
+        self._counts = {'agents': 0, 'complete': 0}
+        connected = asyncio.Queue()
+        server = None
+        self._output.begin()
+        try:
+            tasks = [asyncio.ensure_future(self._collect_command(command)) for command in commands]
+            if sock is not None:
+                server = await asyncio.start_server(
+                    lambda reader, writer: connected.put_nowait(self._collect_peer(reader, writer)), sock=sock
+                )
+                accepted = 0
+                while expect is None or accepted < expect:
+                    tasks.append(asyncio.ensure_future(await connected.get()))
+                    accepted += 1
+                server.close()
+            await asyncio.gather(*tasks)
+        finally:
+            if server is not None:
+                server.close()
+            self._output.finish(self._counts)
+        return self._output.file_path
+
+    async def _collect_peer(self, reader, writer):
+        peer = writer.get_extra_info('peername')
+        agent = {'type': 'agent', 'host': None, 'peer': f'{peer[0]}:{peer[1]}' if peer else None}
+        try:
+            async with self._slots:
+                await self._collect(reader, agent)
+        finally:
+            writer.close()
+        self._agent_done(agent)
+
+    async def _collect_command(self, command):
+        agent = {'type': 'agent', 'host': None, 'command': command}
+        async with self._slots:
+            process = await asyncio.create_subprocess_shell(command, stdout=asyncio.subprocess.PIPE)
+            try:
+                await self._collect(process.stdout, agent)
+            finally:
+                # a broken stream leaves the agent writing into a pipe nobody reads
+                if process.returncode is None and not agent['complete']:
+                    process.kill()
+                returncode = await process.wait()
+        if returncode:
+            agent['complete'] = False
+            agent.setdefault('error', f"command exited with {returncode}")
+        self._agent_done(agent)
+
+    def _agent_done(self, agent):
+        self._counts['agents'] += 1
+        self._counts['complete'] += agent['complete']
+        self._output.write_record(agent)
+
+    async def _collect(self, reader, agent):
+        agent.update(installations=0, errors=0, complete=False)
+        envelope = {}
+        start = time.perf_counter()
+        try:
+            async for record in read_records_async(reader, self._max_record_size):
+                if record['type'] == 'header':
+                    agent['host'] = record.get('host')
+                    envelope = {'host': record.get('host'), 'started_at': record.get('started_at')}
+                elif record['type'] == 'installation':
+                    self._output.write_installation(record['data'], **envelope)
+                    agent['installations'] += 1
+                    agent['errors'] += 'error' in record['data']
+                elif record['type'] == 'summary':
+                    agent['complete'] = True
+            if not agent['complete']:
+                agent['error'] = "stream ended without a summary"
+        except (ProtocolError, OSError) as err:
+            agent['error'] = f"{type(err).__name__}: {err}"
+        agent['seconds'] = round(time.perf_counter() - start, 3)
@@ -0,0 +1,298 @@
+# Created by Andre Machon 18/10/2026
+import heapq
+import itertools
+import json
+import os
+import re
+import tempfile
+from collections import OrderedDict
+from datetime import datetime, timezone
+from pathlib import Path
+
+from ilinfo.records import to_json
+
+__all__ = ['ResultMerger']
+
+
+class ResultMerger:
+    """Merges result files of many runs, ilinfo.json or ilinfo.ndjson, into one stream of installations
+
+    Installations are deduplicated by host and path. Of the same installation in several files, the one of the latest
+    scan wins, ties go to the file given last and then to the later record. The scan time is the 'started_at' of an
+    installation record, or of the header before it. An ilinfo.json has neither host nor scan time, its installations
+    have the host it is given with, if any, and the time the file was written. A key 'host:path' of an ilinfo.json, as
+    written by JSONOutput.combine_data, gives the host of its installation. Installations of an unknown host are only
+    deduplicated within their file, the same path in two files without hosts may be two machines.
+
+    Each file is indexed first: the host, path, scan time and offset of every installation. The entries are sorted in
+    runs of run_size, each written to a temporary file, and the runs are merged k-way, max_open_files at a time, until
+    no more than that are left. Those are merged k-way while iterating, and only the installations that win are read
+    again, one at a time. An ilinfo.json is parsed one installation at a time and spooled to a temporary NDJSON file
+    while it is indexed. So memory depends neither on the number nor on the size of the files.
+    """
+
+    def __init__(self, result_files, max_open_files=64, run_size=50000):
+        """
+        :param result_files: paths of the result files, or (host, path) tuples for files without hosts of their own,
+            the later ones win ties
+        :type result_files: collections.abc.Iterable
+        :param max_open_files: number of result files kept open while the installations are read, and of index runs
+            merged at once
+        :type max_open_files: int
+        :param run_size: number of index entries sorted in memory at a time
+        :type run_size: int
+        """
+        self._files = [(host, Path(path)) for host, path in
+                       (f if isinstance(f, tuple) else (None, f) for f in result_files)]
+        self._max_open_files = max_open_files
+        self._run_size = run_size
+        self._runs = None
+        self._run_count = 0
+        self._spool = None
+        self._counts = None
+        self._without_host = None
+
+    __slots__ = ('_files', '_max_open_files', '_run_size', '_runs', '_run_count', '_spool', '_counts',
+                 '_without_host')
+
+    @property
+    def files(self):
+        """Paths of the result files"""
+        return [path for _, path in self._files]
+
+    @property
+    def counts(self):
+        """Number of files, of installations read from them and of the duplicates left out, once merged
+
+        :rtype: dict
+        """
+        return dict(self._counts) if self._counts else None
+
+    @property
+    def files_without_host(self):
+        """Paths of the result files with installations of an unknown host, once indexed
+
+        :rtype: list
+        """
+        return [self._files[n][1] for n in sorted(self._without_host)] if self._without_host is not None else None
+
+    def index(self):
+        """Indexes the result files, done by iterating if it was not done before"""
+        if self._runs is not None:
+            return
+        self._spool = tempfile.TemporaryDirectory(prefix='ilinfo-combine-')
+        self._runs = []
+        self._counts = {'files': len(self._files), 'installations': 0, 'duplicates': 0}
+        self._without_host = set()
+        for n, (host, path) in enumerate(self._files):
+            if path.suffix == '.ndjson':
+                entries = self._index_ndjson(path, n, host)
+            else:
+                entries = self._index_json(path, n, host)
+            run = []
+            for entry in entries:
+                run.append(entry)
+                self._counts['installations'] += 1
+                if not entry[0][0]:
+                    self._without_host.add(n)
+                if len(run) >= self._run_size:
+                    self._write_run(run)
+                    run = []
+            self._write_run(run)
+        # at least two runs are merged at a time, or there would be no end to it
+        width = max(2, self._max_open_files)
+        while len(self._runs) > width:
+            self._runs = [self._merge_runs(self._runs[i:i + width]) for i in range(0, len(self._runs), width)]
+
+    def __iter__(self):
+        """Yields the installations sorted by host and path, each with an envelope of its host and scan time
+
+        :return: generator of (envelope, installation dict) tuples
+        :rtype: generator
+        """
+        self.index()
+        files = OrderedDict()
+        runs = [_read_run(run_path) for run_path in self._runs]
+        try:
+            for _, group in itertools.groupby(heapq.merge(*runs), key=lambda entry: entry[:2]):
+                group = list(group)
+                self._counts['duplicates'] += len(group) - 1
+                (host, _), ilias_path, started_at, n, path, offset, ndjson = max(
+                    group, key=lambda entry: (entry[2], entry[3], entry[5])
+                )
+                record = json.loads(self._readline(files, path, offset))
+                # an unknown host is kept as null, so the header of the output does not stand in for it
+                yield {'host': host or None, 'started_at': started_at or None}, record['data'] if ndjson else record
+        finally:
+            for run in runs:
+                run.close()
+            for f in files.values():
+                f.close()
+            self.close()
+
+    def close(self):
+        """Removes the spooled ilinfo.json files and the index"""
+        if self._spool is not None:
+            self._spool.cleanup()
+            self._spool = None
+        self._runs = None
+
+    def _index_ndjson(self, path, n, host):
+        header = {'host': host}
+        offset = 0
+        with open(path, 'rb') as f:
+            for line in f:
+                record = json.loads(line)
+                if record.get('type') == 'header':
+                    header = {'host': host, **record}
+                elif record.get('type') == 'installation':
+                    # the installation records of ilinfo collect and combine carry their own host
+                    record_host = record['host'] if 'host' in record else header['host']
+                    started_at = record.get('started_at') or header.get('started_at')
+                    yield _host_key(record_host, n), record['ilias_path'], started_at or '', n, str(path), offset, True
+                offset += len(line)
+
+    def _index_json(self, path, n, host):
+        started_at = datetime.fromtimestamp(os.stat(path).st_mtime, timezone.utc).isoformat(timespec='seconds')
+        spool_path = os.path.join(self._spool.name, f'{n}.ndjson')
+        offset = 0
+        with open(path, encoding='utf-8') as f, open(spool_path, 'wb') as spool:
+            for key, installation in _json_members(f):
+                ilias_path = installation.get('ilias_path') or key
+                line = (json.dumps(installation, default=to_json) + '\n').encode('utf-8')
+                spool.write(line)
+                yield _host_key(_key_host(key, ilias_path) or host, n), ilias_path, started_at, n, spool_path, offset, \
+                    False
+                offset += len(line)
+
+    def _write_run(self, entries):
+        if not entries:
+            return
+        entries.sort()
+        self._runs.append(self._run_file(entries))
+
+    def _merge_runs(self, run_paths):
+        runs = [_read_run(run_path) for run_path in run_paths]
+        try:
+            merged = self._run_file(heapq.merge(*runs))
+        finally:
+            for run in runs:
+                run.close()
+        for run_path in run_paths:
+            os.remove(run_path)
+        return merged
+
+    def _run_file(self, entries):
+        self._run_count += 1
+        run_path = os.path.join(self._spool.name, f'{self._run_count}.run')
+        with open(run_path, 'w', encoding='utf-8') as f:
+            for entry in entries:
+                f.write(json.dumps(entry) + '\n')
+        return run_path
+
+    def _readline(self, files, path, offset):
+        f = files.pop(path, None)
+        if f is None:
+            if len(files) >= self._max_open_files:
+                files.popitem(last=False)[1].close()
+            f = open(path, 'rb')
+        # the most recently used file goes last
+        files[path] = f
+        f.seek(offset)
+        return f.readline()
+
+
+class _JSONReader:
+    """Reads the values of a JSON document from a text file one by one, only the value being parsed and the rest of
+    the current chunk are kept in memory"""
+
+    def __init__(self, f, chunk_size=2 ** 16):
+        self._f = f
+        self._chunk_size = chunk_size
+        self._buffer = ''
+        self._pos = 0
+        self._decoder = json.JSONDecoder()
+
+    __slots__ = ('_f', '_chunk_size', '_buffer', '_pos', '_decoder')
+
+    def peek(self):
+        """Returns the next character that is not whitespace, without consuming it"""
+        while True:
+            self._pos = _WHITESPACE.match(self._buffer, self._pos).end()
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._read():
+                raise ValueError("JSON document ended early")
+
+    def expect(self, chars):
+        """Consumes the next character that is not whitespace, which needs to be one of chars
+
+        :rtype: str
+        """
+        char = self.peek()
+        if char not in chars:
+            raise ValueError(f"expected one of {chars!r} in JSON document, got {char!r}")
+        self._pos += 1
+        return char
+
+    def value(self):
+        """Parses and consumes the next value"""
+        self.peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError:
+                if self._read():
+                    continue
+                raise
+            # a number at the end of the buffer may go on in the next chunk
+            if end < len(self._buffer) or not self._read():
+                self._pos = end
+                return value
+
+    def _read(self):
+        # drops what was consumed, at least as much as is left is read, so a large value is not parsed over and over
+        chunk = self._f.read(max(self._chunk_size, len(self._buffer) - self._pos))
+        if not chunk:
+            return False
+        self._buffer = self._buffer[self._pos:] + chunk
+        self._pos = 0
+        return True
+
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+
+def _json_members(f):
+    # the members of the JSON object in f, one at a time
+    reader = _JSONReader(f)
+    reader.expect('{')
+    if reader.peek() == '}':
+        return
+    while True:
+        key = reader.value()
+        if not isinstance(key, str):
+            raise ValueError("JSON document is not an object")
+        reader.expect(':')
+        yield key, reader.value()
+        if reader.expect(',}') == '}':
+            return
+
+
+def _read_run(run_path):
+    with open(run_path, encoding='utf-8') as f:
+        for line in f:
+            host_key, *entry = json.loads(line)
+            yield (tuple(host_key), *entry)
+
+
+def _key_host(key, ilias_path):
+    # the host of a key 'host:path' of an ilinfo.json written by JSONOutput.combine_data
+    if len(key) > len(ilias_path) + 1 and key.endswith(f':{ilias_path}'):
+        return key[:-len(ilias_path) - 1]
+    return None
+
+
+def _host_key(host, n):
+    # installations of an unknown host are told apart by the file they are from, they sort before the known hosts
+    return (host, -1) if host else ('', n)
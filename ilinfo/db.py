@@ -0,0 +1,378 @@
+# Created by Andre Machon 18/10/2026
+import math
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+__all__ = ['DBInspector', 'DBError', 'client_db_login', 'connect', 'HOST_ERROR_CLASSES']
+
+# values of [db] type in client.ini.php that are not served by MySQL or MariaDB
+UNSUPPORTED_DB_TYPES = ('postgres', 'oracle')
+
+# error classes that say nothing about the client but about its server, the first one marks the server as down
+HOST_ERROR_CLASSES = ('connect_timeout', 'connection_refused', 'unknown_host', 'connection_lost', 'query_timeout')
+
+# mysql.connector error numbers, see mysql.connector.errorcode
+_ERROR_CLASSES = {
+    1044: 'access_denied',
+    1045: 'access_denied',
+    1049: 'unknown_database',
+    1142: 'access_denied',
+    1146: 'missing_table',
+    2003: 'connection_refused',
+    2005: 'unknown_host',
+    2006: 'connection_lost',
+    2013: 'connection_lost',
+}
+
+
+class DBError(Exception):
+    """A client's database could not be read, error_class tells why, see DBInspector"""
+
+    def __init__(self, error_class, message):
+        super().__init__(message)
+        self.error_class = error_class
+
+    @property
+    def connectivity(self):
+        """The connectivity of the client the error is of, as in the result of DBInspector.inspect
+
+        :rtype: dict
+        """
+        return {'reachable': _reachable(self.error_class), 'error_class': self.error_class, 'error': str(self)}
+
+
+def client_db_login(client):
+    """Returns the connection parameters of a parsed client.ini.php, like utils.read_client_db_login does for a file
+
+    :param client: result of IliasFileParser.parse_client_ini
+    :type client: dict
+    :return: {'host': ..., 'port': 3306, 'user': ..., 'password': ..., 'database': ...}
+    :rtype: dict
+    """
+    db = client.get('db') or {}
+    port = db.get('port') or ''
+    return {
+        'host': db.get('host') or 'localhost',
+        'port': int(port) if str(port).isdigit() else 3306,
+        'user': db.get('user') or '',
+        'password': db.get('pass') or '',
+        'database': db.get('name') or '',
+    }
+
+
+def connect(login, connect_timeout=5.0, query_timeout=10.0):
+    """Opens a connection with the deadlines of DBInspector, for connecting and for every query on it
+
+    :param login: connection parameters, see client_db_login, 'database' may be left out
+    :type login: dict
+    :param connect_timeout: seconds connecting may take
+    :type connect_timeout: float
+    :param query_timeout: seconds a single query may take, see DBInspector
+    :type query_timeout: float
+    :return: the connection and the seconds connecting took
+    :rtype: tuple
+    :raises DBError: if connecting failed, its error_class tells why
+    """
+    # the driver takes longer to import than a small scan takes, only connecting loads it
+    import mysql.connector
+
+    start = time.perf_counter()
+    try:
+        connection = mysql.connector.connect(**login, **_timeouts(connect_timeout, query_timeout))
+    except Exception as err:
+        raise DBError(*_classify(err, 'connect_timeout', f"connecting timed out after {connect_timeout}s")) \
+            from err
+    return connection, round(time.perf_counter() - start, 6)
+
+
+class _ConnectionPool:
+    """Connections to one database server as one user, opened when needed and reused by every client on it
+
+    At most size connections exist at a time, acquire waits for one to be released beyond that.
+    """
+
+    def __init__(self, login, size, timeouts, check_host):
+        self._login = {key: login[key] for key in ('host', 'port', 'user', 'password')}
+        self._login.update(timeouts)
+        # raises DBError if the server was marked as down while waiting for a slot
+        self._check_host = check_host
+        self._idle = deque()
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self.opened = 0
+
+    def acquire(self):
+        self._slots.acquire()
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+        try:
+            self._check_host()
+            return self._connect()
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def release(self, connection, broken=False):
+        if broken:
+            try:
+                connection.close()
+            except Exception:
+                # a connection that timed out may already be closed
+                pass
+        else:
+            with self._lock:
+                self._idle.append(connection)
+        self._slots.release()
+
+    def close(self):
+        with self._lock:
+            while self._idle:
+                self._idle.pop().close()
+
+    def _connect(self):
+        # only needed by --with-db, the import is left to the first connection
+        import mysql.connector
+
+        connection = mysql.connector.connect(**self._login)
+        cursor = connection.cursor()
+        # GROUP_CONCAT of the active plugins would be cut off at 1024 bytes
+        cursor.execute('SET SESSION group_concat_max_len = 1048576')
+        cursor.close()
+        with self._lock:
+            self.opened += 1
+        return connection
+
+
+class DBInspector:
+    """Reads the schema version, the active plugins and the user counts from the database of each ILIAS client
+
+    Clients are inspected by a bounded number of threads. There is one connection pool per (host, port, user), so
+    clients sharing a database server share its connections, and queries name the database of the client instead of
+    connecting to it. Every fact comes from a single aggregate query, no table is read row by row.
+
+    Connecting and every query have a deadline. The first connection failure or timeout of a server (see
+    HOST_ERROR_CLASSES) marks it as down for the rest of the run, the clients on it fail right away with the error
+    class 'host_down' instead of waiting for their own timeouts.
+
+    The result of a client looks like
+
+        {'connectivity': {'reachable': True, 'latency': 0.0004},
+         'db_version': 5751, 'plugins': {'gp_webshopauth': '1.2.0'}, 'users': {'total': 1204, 'active': 1170},
+         'seconds': 0.012}
+
+    or, if the database could not be read
+
+        {'connectivity': {'reachable': False, 'error_class': 'connect_timeout', 'error': '...'},
+         'error': 'ConnectionTimeoutError: ...', 'seconds': 3.002}
+    """
+
+    def __init__(self, concurrency=8, pool_size=4, connect_timeout=5.0, query_timeout=10.0):
+        """
+        :param concurrency: number of clients inspected at the same time
+        :type concurrency: int
+        :param pool_size: maximum number of connections to a single database server and user
+        :type pool_size: int
+        :param connect_timeout: seconds connecting to a server may take
+        :type connect_timeout: float
+        :param query_timeout: seconds a single query may take, rounded up to whole seconds. Connectors older than
+            9.0 have no read timeout, connect_timeout then applies to queries as well.
+        :type query_timeout: float
+        """
+        self._concurrency = concurrency
+        self._pool_size = pool_size
+        self._connect_timeout = connect_timeout
+        self._query_timeout = query_timeout
+        self._pools = {}
+        # (host, port) -> the result of the client that found the server down
+        self._hosts_down = {}
+        self._lock = threading.Lock()
+
+    __slots__ = ('_concurrency', '_pool_size', '_connect_timeout', '_query_timeout', '_pools', '_hosts_down',
+                 '_lock')
+
+    @property
+    def pool_count(self):
+        """Number of connection pools, one per (host, port, user) inspected so far"""
+        return len(self._pools)
+
+    @property
+    def connections_opened(self):
+        return sum(pool.opened for pool in self._pools.values())
+
+    @property
+    def hosts_down(self):
+        """The servers marked as down, {'host:port': {'error_class': ..., 'error': ...}}
+
+        :rtype: dict
+        """
+        with self._lock:
+            return {f'{host}:{port}': dict(down) for (host, port), down in self._hosts_down.items()}
+
+    def inspect(self, client):
+        """Returns the database facts of a single client, see DBInspector
+
+        :param client: result of IliasFileParser.parse_client_ini
+        :type client: dict
+        :rtype: dict
+        """
+        start = time.perf_counter()
+        try:
+            result = self._inspect(client)
+        except DBError as err:
+            cause = type(err.__cause__ or err).__name__
+            result = {'connectivity': err.connectivity, 'error': f"{cause}: {err}"}
+        result['seconds'] = round(time.perf_counter() - start, 6)
+        return result
+
+    def inspect_clients(self, clients):
+        """Inspects clients in parallel, see inspect
+
+        :param clients: results of IliasFileParser.parse_client_ini
+        :type clients: collections.abc.Iterable
+        :return: the result of each client, in the order of clients
+        :rtype: list
+        """
+        clients = list(clients)
+        if len(clients) < 2 or self._concurrency < 2:
+            return [self.inspect(client) for client in clients]
+        with ThreadPoolExecutor(max_workers=min(self._concurrency, len(clients))) as executor:
+            return list(executor.map(self.inspect, clients))
+
+    def close(self):
+        """Closes the idle connections of all pools"""
+        with self._lock:
+            for pool in self._pools.values():
+                pool.close()
+            self._pools = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _pool(self, login):
+        key = (login['host'], login['port'], login['user'])
+        with self._lock:
+            pool = self._pools.get(key)
+            if pool is None:
+                pool = self._pools[key] = _ConnectionPool(
+                    login, self._pool_size, _timeouts(self._connect_timeout, self._query_timeout),
+                    lambda: self._check_host(login['host'], login['port'])
+                )
+        return pool
+
+    def _check_host(self, host, port):
+        with self._lock:
+            down = self._hosts_down.get((host, port))
+        if down is not None:
+            raise DBError('host_down', f"{host}:{port} is down, {down['error_class']}: {down['error']}")
+
+    def _host_failed(self, host, port, error_class, message):
+        with self._lock:
+            self._hosts_down.setdefault((host, port), {'error_class': error_class, 'error': message})
+
+    def _inspect(self, client):
+        db_type = ((client.get('db') or {}).get('type') or '').lower()
+        if any(unsupported in db_type for unsupported in UNSUPPORTED_DB_TYPES):
+            raise DBError('unsupported', f"database type {db_type} is not supported")
+        login = client_db_login(client)
+        if not login['database']:
+            raise DBError('unsupported', "client.ini.php names no database")
+
+        self._check_host(login['host'], login['port'])
+        try:
+            pool = self._pool(login)
+            connection = pool.acquire()
+        except DBError:
+            raise
+        except Exception as err:
+            raise self._error(login, err, 'connect_timeout', f"connecting timed out after {self._connect_timeout}s") \
+                from err
+
+        broken = True
+        try:
+            result = self._query(connection.cursor(), _quote_name(login['database']))
+            broken = False
+            return result
+        except Exception as err:
+            raise self._error(login, err, 'query_timeout', f"query timed out after {self._query_timeout}s") from err
+        finally:
+            pool.release(connection, broken)
+
+    def _error(self, login, err, timeout_class, timeout_message):
+        error_class, message = _classify(err, timeout_class, timeout_message)
+        if error_class in HOST_ERROR_CLASSES:
+            self._host_failed(login['host'], login['port'], error_class, message)
+        return DBError(error_class, message)
+
+    @staticmethod
+    def _query(cursor, database):
+        try:
+            start = time.perf_counter()
+            cursor.execute(
+                f"SELECT MAX(value) FROM {database}.settings WHERE module = 'common' AND keyword = 'db_version'"
+            )
+            db_version = cursor.fetchone()[0]
+            latency = time.perf_counter() - start
+            cursor.execute(
+                f"SELECT GROUP_CONCAT(CONCAT(plugin_id, ' ', IFNULL(last_update_version, '')) ORDER BY plugin_id "
+                f"SEPARATOR ',') FROM {database}.il_plugin WHERE active = 1"
+            )
+            plugins = cursor.fetchone()[0]
+            cursor.execute(f"SELECT COUNT(*), COALESCE(SUM(active = 1), 0) FROM {database}.usr_data")
+            total, active = cursor.fetchone()
+        finally:
+            cursor.close()
+
+        if isinstance(plugins, (bytes, bytearray)):
+            plugins = plugins.decode('utf-8')
+        return {
+            'connectivity': {'reachable': True, 'latency': round(latency, 6)},
+            'db_version': int(db_version) if db_version is not None and str(db_version).isdigit() else db_version,
+            'plugins': dict(plugin.partition(' ')[::2] for plugin in plugins.split(',')) if plugins else {},
+            'users': {'total': int(total), 'active': int(active)},
+        }
+
+
+# how the resolver failing shows up in the message of error 2003, on Linux and on BSDs
+_UNKNOWN_HOST = ('Name or service not known', 'nodename nor servname')
+
+
+def _timeouts(connect_timeout, query_timeout):
+    from mysql.connector.constants import DEFAULT_CONFIGURATION
+
+    timeouts = {'connection_timeout': connect_timeout}
+    if 'read_timeout' in DEFAULT_CONFIGURATION:
+        timeouts['read_timeout'] = timeouts['write_timeout'] = max(1, math.ceil(query_timeout))
+    return timeouts
+
+
+def _classify(err, timeout_class, timeout_message):
+    # the error class and the message of an exception of the driver
+    message = ' '.join(str(getattr(err, 'msg', None) or err).split())
+    if _is_timeout(err):
+        return timeout_class, timeout_message
+    if getattr(err, 'errno', None) == 2003 and any(text in message for text in _UNKNOWN_HOST):
+        return 'unknown_host', message
+    return _ERROR_CLASSES.get(getattr(err, 'errno', None), 'error'), message
+
+
+def _reachable(error_class):
+    # True if the server answered, None if it was not asked or it is unclear
+    if error_class in HOST_ERROR_CLASSES or error_class == 'host_down':
+        return False
+    if error_class in ('unsupported', 'error'):
+        return None
+    return True
+
+
+def _is_timeout(err):
+    return isinstance(err, TimeoutError) or 'Timeout' in type(err).__name__ or 'timed out' in str(err)
+
+
+def _quote_name(name):
+    return '`' + name.replace('`', '``') + '`'
@@ -0,0 +1,225 @@
+# Created by Andre Machon 18/10/2026
+import hashlib
+import json
+from pathlib import Path
+
+from ilinfo.records import to_json
+
+__all__ = ['InventoryDiff', 'content_hash']
+
+# parts of an installation that are lists of parsed files, their elements are matched by source_file
+KEYED_LISTS = ('client.ini.php', 'plugin.php')
+
+
+def content_hash(value):
+    """Returns a hash of value that is the same for equal values, whatever the order of their keys
+
+    :type value: dict
+    :rtype: str
+    """
+    data = json.dumps(value, default=to_json, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    return hashlib.blake2b(data.encode('utf-8'), digest_size=16).hexdigest()
+
+
+class InventoryDiff:
+    """Keyed structural diff between two inventories, ilinfo.json or ilinfo.ndjson files of two runs
+
+    Installations are matched by host and path, the host is only known in NDJSON inventories of ilinfo collect.
+    Installations with the same content hash are skipped, so is every client, plugin and other part of a changed
+    installation whose hash is the same in both. Only what is left is compared.
+
+    Each change is a dict:
+
+        {"op": "add", "ilias_path": "/srv/www/ilias"}
+        {"op": "change", "ilias_path": "/srv/www/ilias", "path": ["plugin.php", "Customizing/.../plugin.php",
+         "version"], "old": "1.1.0", "new": "1.2.0"}
+        {"op": "remove", "host": "web01", "ilias_path": "/srv/www/ilias", "path": ["submodules", "LPOverview"],
+         "old": {...}}
+
+    op is 'add', 'remove' or 'change'. path leads to the part that changed, an installation that was added or removed
+    as a whole has none. Clients and plugins are keyed by their source file, relative to the installation. 'old' and
+    'new' are the values before and after, whole installations are left out to keep the change set small.
+
+    OLD is indexed first, an NDJSON inventory by the hash and file offset of each installation only. NEW is then read
+    one installation at a time, the installations of OLD are only read again if they changed. An ilinfo.json is a
+    single JSON document and is loaded as a whole.
+    """
+
+    def __init__(self, old_file, new_file):
+        """
+        :param old_file: path of the inventory of the earlier run
+        :param new_file: path of the inventory of the later run
+        """
+        self._old_file = Path(old_file)
+        self._new_file = Path(new_file)
+        self._counts = None
+
+    __slots__ = ('_old_file', '_new_file', '_counts')
+
+    @property
+    def counts(self):
+        """Number of installations added, removed, changed and unchanged, once changes was consumed"""
+        return dict(self._counts) if self._counts else None
+
+    def changes(self):
+        """Yields the changes from OLD to NEW, those of NEW's installations in its order, then the removed ones
+
+        :return: generator of change dicts, see InventoryDiff
+        :rtype: generator
+        """
+        counts = {'added': 0, 'removed': 0, 'changed': 0, 'unchanged': 0}
+        old = _Inventory(self._old_file)
+        with old:
+            index = old.index()
+            for key, installation in _Inventory(self._new_file):
+                entry = index.pop(key, None)
+                if entry is None:
+                    counts['added'] += 1
+                    yield _change('add', key)
+                    continue
+                digest, location = entry
+                if digest == content_hash(installation):
+                    counts['unchanged'] += 1
+                    continue
+                counts['changed'] += 1
+                yield from _diff_installation(key, old.load(location), installation)
+            for key in index:
+                counts['removed'] += 1
+                yield _change('remove', key)
+        self._counts = counts
+
+    def write(self, f):
+        """Writes the changes to f, one JSON object per line
+
+        :param f: text file object
+        :return: number of changes
+        :rtype: int
+        """
+        written = 0
+        for change in self.changes():
+            f.write(json.dumps(change, default=to_json, ensure_ascii=False) + '\n')
+            written += 1
+        return written
+
+
+class _Inventory:
+    """The installations of an ilinfo.json or ilinfo.ndjson, (host, ilias_path) -> installation dict"""
+
+    def __init__(self, path):
+        self._path = path
+        self._ndjson = path.suffix == '.ndjson'
+        self._file = None
+        self._data = None
+
+    def __enter__(self):
+        if self._ndjson:
+            self._file = open(self._path, 'rb')
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __iter__(self):
+        if not self._ndjson:
+            for ilias_path, installation in self._json().items():
+                yield (None, ilias_path), installation
+            return
+        with open(self._path, 'rb') as f:
+            for line in f:
+                record = json.loads(line)
+                if record.get('type') == 'installation':
+                    yield (record.get('host'), record['ilias_path']), record['data']
+
+    def index(self):
+        """Returns {key: (content hash, location)}, location is what load needs to read the installation again
+
+        :rtype: dict
+        """
+        if not self._ndjson:
+            return {(None, ilias_path): (content_hash(installation), ilias_path)
+                    for ilias_path, installation in self._json().items()}
+        index = {}
+        offset = 0
+        for line in self._file:
+            record = json.loads(line)
+            if record.get('type') == 'installation':
+                index[(record.get('host'), record['ilias_path'])] = (content_hash(record['data']), offset)
+            offset += len(line)
+        return index
+
+    def load(self, location):
+        if not self._ndjson:
+            return self._json()[location]
+        self._file.seek(location)
+        return json.loads(self._file.readline())['data']
+
+    def _json(self):
+        if self._data is None:
+            with open(self._path, encoding='utf-8') as f:
+                self._data = json.load(f)
+        return self._data
+
+
+def _change(op, key, path=None, **values):
+    host, ilias_path = key
+    change = {'op': op}
+    if host is not None:
+        change['host'] = host
+    change['ilias_path'] = ilias_path
+    if path is not None:
+        change['path'] = path
+        change.update(values)
+    return change
+
+
+def _diff_installation(key, old, new):
+    for name in _keys(old, new):
+        if name not in new:
+            yield _change('remove', key, [name], old=old[name])
+        elif name not in old:
+            yield _change('add', key, [name], new=new[name])
+        elif name in KEYED_LISTS and isinstance(old[name], list) and isinstance(new[name], list):
+            yield from _diff_keyed(key, name, old[name], new[name])
+        elif isinstance(old[name], dict) and isinstance(new[name], dict):
+            if content_hash(old[name]) != content_hash(new[name]):
+                yield from _diff_values(key, [name], old[name], new[name])
+        elif old[name] != new[name]:
+            yield _change('change', key, [name], old=old[name], new=new[name])
+
+
+def _diff_keyed(key, name, old, new):
+    ilias_path = key[1]
+    old = {_element_key(element, ilias_path): element for element in old}
+    new = {_element_key(element, ilias_path): element for element in new}
+    for element_key in _keys(old, new):
+        if element_key not in new:
+            yield _change('remove', key, [name, element_key], old=old[element_key])
+        elif element_key not in old:
+            yield _change('add', key, [name, element_key], new=new[element_key])
+        elif content_hash(old[element_key]) != content_hash(new[element_key]):
+            yield from _diff_values(key, [name, element_key], old[element_key], new[element_key])
+
+
+def _diff_values(key, path, old, new):
+    for name in _keys(old, new):
+        if name not in new:
+            yield _change('remove', key, path + [name], old=old[name])
+        elif name not in old:
+            yield _change('add', key, path + [name], new=new[name])
+        elif isinstance(old[name], dict) and isinstance(new[name], dict):
+            yield from _diff_values(key, path + [name], old[name], new[name])
+        elif old[name] != new[name]:
+            yield _change('change', key, path + [name], old=old[name], new=new[name])
+
+
+def _element_key(element, ilias_path):
+    source_file = str(element.get('source_file') or '')
+    prefix = ilias_path.rstrip('/') + '/'
+    return source_file[len(prefix):] if source_file.startswith(prefix) else source_file
+
+
+def _keys(old, new):
+    # the keys of old in their order, then those only new has
+    return list(old) + [k for k in new if k not in old]
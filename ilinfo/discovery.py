@@ -0,0 +1,462 @@
+# Created by Andre Machon 18/10/2026
+import json
+import os
+import re
+import threading
+import time
+from fnmatch import translate
+from os import path as osp
+from pathlib import Path
+from queue import Queue
+try:
+    from os import scandir
+except ImportError:
+    from scandir import scandir
+
+__all__ = ['TreeWalker', 'ExclusionMatcher', 'DirectoryCache', 'PathTrie', 'DISCOVERY_FILES', 'EXCLUDE_MODES']
+
+# every file IliasPathFinder has to locate, ilias.ini.php and .gitmodules sit at fixed places in an installation
+DISCOVERY_FILES = ('ilias.php', 'plugin.php', 'client.ini.php')
+EXCLUDE_MODES = ('path', 'substring')
+
+
+class ExclusionMatcher:
+    """Compiles a list of exclusion patterns once, so excluded directories can be pruned while walking
+
+    In "path" mode (default) a pattern is understood as
+        - an absolute prefix, if it starts with "/": '/opt' excludes /opt and everything below, but not /var/opt
+        - a glob, if it contains one of "*?[": 'ilias*_old' is matched against the directory name,
+          '/home/*/backup' against the full path
+        - a sequence of path components, if it contains "/": 'Customizing/global'
+        - a directory name otherwise: 'Backup' excludes every directory named Backup, but not Backup_2021
+
+    In "substring" mode every path that contains one of the patterns is excluded, which is how exclusions used to work.
+    """
+
+    def __init__(self, patterns=None, mode='path'):
+        """
+        :param patterns: exclusion patterns
+        :type patterns: list
+        :param mode: one of EXCLUDE_MODES
+        :type mode: str
+        """
+        if mode not in EXCLUDE_MODES:
+            raise ValueError(f"Param mode needs to be one of {EXCLUDE_MODES}")
+        self._mode = mode
+        self._names = frozenset()
+        self._path_re = None
+        self._name_re = None
+
+        patterns = [p for p in (patterns or []) if p]
+        if mode == 'substring':
+            self._path_re = self._compile([re.escape(p) for p in patterns])
+            return
+
+        names, name_globs, path_res = set(), [], []
+        for pattern in patterns:
+            pattern = pattern.rstrip('/') or '/'
+            if any(c in pattern for c in '*?['):
+                if '/' in pattern:
+                    path_res.append(translate(pattern))
+                else:
+                    name_globs.append(translate(pattern))
+            elif pattern.startswith('/'):
+                path_res.append(re.escape(pattern) + r'(?:/.*)?\Z')
+            elif '/' in pattern:
+                path_res.append(r'(?:.*/)?' + re.escape(pattern) + r'\Z')
+            else:
+                names.add(pattern)
+
+        self._names = frozenset(names)
+        self._name_re = self._compile(name_globs)
+        self._path_re = self._compile(path_res)
+
+    __slots__ = ('_mode', '_names', '_name_re', '_path_re')
+
+    @property
+    def mode(self):
+        return self._mode
+
+    def __bool__(self):
+        return bool(self._names or self._name_re or self._path_re)
+
+    def excludes(self, dir_path, name=None):
+        """Returns True if dir_path is excluded
+
+        While walking top down the parent directories have already been checked, the caller passes name to say so.
+        Only the directory itself is checked then. Without name every component of dir_path is checked.
+
+        :param dir_path: full path of the directory
+        :type dir_path: str
+        :param name: base name of dir_path, if the parent directories have already been checked
+        :type name: str
+        :rtype: bool
+        """
+        if self._mode == 'substring':
+            return bool(self._path_re and self._path_re.search(dir_path))
+        if name is not None:
+            return self._excludes_dir(dir_path, name)
+        return any(self._excludes_dir(path, name) for path, name in _leading_paths(dir_path))
+
+    def _excludes_dir(self, dir_path, name):
+        return (name in self._names
+                or bool(self._name_re and self._name_re.match(name))
+                or bool(self._path_re and self._path_re.match(dir_path)))
+
+    @staticmethod
+    def _compile(expressions):
+        if not expressions:
+            return None
+        return re.compile('|'.join(f'(?:{e})' for e in expressions), re.DOTALL)
+
+
+class PathTrie:
+    """Trie of path components, which finds the nearest enclosing path of any path in O(depth)
+
+    Unlike a substring or startswith test, /var/www/ilias2/plugin is not considered to be inside of /var/www/ilias.
+    """
+
+    # components are strings, so None can't collide with any of them
+    _PATH = None
+
+    def __init__(self, paths=()):
+        """
+        :param paths: paths to insert
+        :type paths: iterable
+        """
+        self._root = {}
+        for path in paths:
+            self.insert(path)
+
+    __slots__ = ('_root',)
+
+    def insert(self, path):
+        node = self._root
+        for name in _components(path):
+            node = node.setdefault(name, {})
+        node[self._PATH] = path
+
+    def nearest(self, path):
+        """Returns the longest inserted path that path is equal to or located in
+
+        :param path: path to look up
+        :type path: str
+        :return: inserted path, or None if path is outside of all of them
+        :rtype: str
+        """
+        node = self._root
+        nearest = node.get(self._PATH)
+        for name in _components(path):
+            node = node.get(name)
+            if node is None:
+                break
+            nearest = node.get(self._PATH, nearest)
+        return nearest
+
+
+def _components(path):
+    return [name for name in str(path).split('/') if name]
+
+
+def _leading_paths(path):
+    # '/var/www/ilias' -> ('/var', 'var'), ('/var/www', 'www'), ('/var/www/ilias', 'ilias')
+    parts = path.rstrip('/').split('/')
+    for i, name in enumerate(parts):
+        if name:
+            yield '/'.join(parts[:i + 1]), name
+
+
+class TreeWalker:
+    """Walks a directory tree once and collects every file whose name is one of target_names
+
+    Directories are visited top down and in sorted order, so the found files always come out in the same order.
+    Excluded directories are pruned before descending into them, so their content is never listed.
+    Symlinked directories are not followed, unreadable directories are skipped, just like os.walk does it.
+
+    With workers > 1 a pool of threads pulls directories from a shared queue, which keeps several directory listings
+    in flight at once. That pays off on NFS or CIFS mounts, where each listing waits for a network round trip.
+    The found files are sorted afterwards, so they come out in the same order as with a single worker.
+    """
+
+    def __init__(self, target_names, excluded_dirs=None, exclude_mode='path', workers=1, cache=None, metrics=None):
+        """
+        :param target_names: file names to collect
+        :type target_names: iterable
+        :param excluded_dirs: exclusion patterns, see ExclusionMatcher, or an ExclusionMatcher
+        :type excluded_dirs: list
+        :param exclude_mode: how the patterns in excluded_dirs are matched, one of EXCLUDE_MODES
+        :type exclude_mode: str
+        :param workers: number of threads listing directories concurrently
+        :type workers: int
+        :param cache: directories whose mtime did not change since they were cached are not listed again
+        :type cache: DirectoryCache
+        :param metrics: gets the time each directory listing took
+        :type metrics: ilinfo.metrics.RunMetrics
+        """
+        if workers < 1:
+            raise ValueError("Param workers needs to be at least 1")
+        self._target_names = frozenset(target_names)
+        if isinstance(excluded_dirs, ExclusionMatcher):
+            self._excluded = excluded_dirs
+        else:
+            self._excluded = ExclusionMatcher(excluded_dirs, exclude_mode)
+        self._workers = workers
+        self._cache = cache
+        self._metrics = metrics
+        self._lock = threading.Lock()
+        self.dirs_visited = 0
+        self.dirs_pruned = 0
+
+    __slots__ = ('_target_names', '_excluded', '_workers', '_cache', '_metrics', '_lock', 'dirs_visited',
+                 'dirs_pruned')
+
+    def walk(self, start_path):
+        """Walks start_path and yields every found target file
+
+        :param start_path: path to start walking from
+        :type start_path: str
+        :return: generator that yields (directory path, file name) tuples
+        :rtype: object: generator
+        """
+        start_path = str(start_path)
+        if self._excluded and self._excluded.excludes(start_path):
+            self.dirs_pruned += 1
+            return
+
+        if self._workers > 1:
+            yield from self._walk_parallel(start_path)
+            return
+
+        stack = [start_path]
+        while stack:
+            current_path = stack.pop()
+            found, subdirs = self._list_dir(current_path)
+            if found is None:
+                continue
+
+            for name in sorted(found):
+                yield current_path, name
+            # reversed, so the alphabetically first directory is popped first
+            stack.extend(reversed(self._included_subdirs(current_path, sorted(subdirs))))
+
+    def scan(self, start_path):
+        """Walks start_path and returns all found target files grouped by file name
+
+        :param start_path: path to start walking from
+        :type start_path: str
+        :return: {'file_name': ['/full/path/to/file_name', ...]}
+        :rtype: dict
+        """
+        results = {name: [] for name in self._target_names}
+        for dir_path, name in self.walk(start_path):
+            results[name].append(osp.join(dir_path, name))
+        return results
+
+    def _walk_parallel(self, start_path):
+        queue = Queue()
+        results = []
+        errors = []
+
+        def work():
+            while True:
+                dir_path = queue.get()
+                try:
+                    if dir_path is None:
+                        return
+                    found, subdirs = self._list_dir(dir_path)
+                    if found is None:
+                        continue
+                    subdirs = self._included_subdirs(dir_path, subdirs)
+                    with self._lock:
+                        results.extend((dir_path, name) for name in found)
+                    for subdir in subdirs:
+                        queue.put(subdir)
+                except Exception as err:
+                    errors.append(err)
+                finally:
+                    queue.task_done()
+
+        threads = [threading.Thread(target=work, daemon=True) for _ in range(self._workers)]
+        for thread in threads:
+            thread.start()
+        queue.put(start_path)
+        queue.join()
+        for _ in threads:
+            queue.put(None)
+        for thread in threads:
+            thread.join()
+
+        if errors:
+            raise errors[0]
+        # same order as the sequential walk: top down, sorted by path component
+        results.sort(key=lambda result: (result[0].split('/'), result[1]))
+        yield from results
+
+    def _list_dir(self, dir_path):
+        if self._cache is None:
+            return self._scan_dir(dir_path)
+
+        try:
+            stat = os.stat(dir_path)
+        except OSError:
+            return None, None
+        cached = self._cache.lookup(dir_path, stat)
+        if cached is not None:
+            return cached
+
+        found, subdirs = self._scan_dir(dir_path)
+        if found is not None:
+            self._cache.store(dir_path, stat, found, subdirs)
+        return found, subdirs
+
+    def _scan_dir(self, dir_path):
+        start = time.perf_counter() if self._metrics is not None else None
+        try:
+            entries = list(scandir(dir_path))
+        except OSError:
+            return None, None
+        if start is not None:
+            self._metrics.dir_listed(dir_path, time.perf_counter() - start, len(entries))
+        with self._lock:
+            self.dirs_visited += 1
+
+        found, subdirs = [], []
+        for entry in entries:
+            try:
+                is_dir = entry.is_dir()
+            except OSError:
+                is_dir = False
+            if is_dir:
+                if not entry.is_symlink():
+                    subdirs.append(entry.name)
+            elif entry.name in self._target_names:
+                found.append(entry.name)
+        return found, subdirs
+
+    def _included_subdirs(self, dir_path, names):
+        paths = [osp.join(dir_path, name) for name in names]
+        if not self._excluded:
+            return paths
+
+        included = [path for path, name in zip(paths, names) if not self._excluded.excludes(path, name)]
+        if len(included) < len(paths):
+            with self._lock:
+                self.dirs_pruned += len(paths) - len(included)
+        return included
+
+
+class DirectoryCache:
+    """Persistent record of every directory a TreeWalker listed, used for incremental rescans
+
+    For each directory the mtime, inode, its subdirectories and the target files in it are stored. A directory's mtime
+    changes whenever an entry is added, removed or renamed in it, so a directory whose mtime and inode are unchanged
+    does not need to be listed again. Every directory is still stat()ed, because a change deep down in a subtree does
+    not touch the mtime of its parents. For the same reason there is no flag for subtrees that held no targets: an
+    installation created or cloned deep inside such a subtree leaves every directory above it unchanged, skipping
+    the subtree would miss it for good. The per directory stat replaces that flag, it is what tells an unchanged
+    directory apart, and it costs far less than the listing it saves.
+
+    A directory modified shortly before the listing that cached it is not trusted, since a change within the mtime
+    granularity of the file system would otherwise go unnoticed.
+    """
+
+    VERSION = 2
+    RACY_NS = 2 * 10 ** 9
+
+    def __init__(self, cache_file, full_rescan=False):
+        """
+        :param cache_file: path of the JSON file the cache is stored in
+        :type cache_file: str
+        :param full_rescan: ignore the stored entries, every directory is listed and the cache is rebuilt
+        :type full_rescan: bool
+        """
+        self._cache_file = Path(cache_file)
+        self._full_rescan = full_rescan
+        self._target_names = []
+        self._entries = {}
+        self._previous = {}
+        self._trusted_before_ns = 0
+        self._started_ns = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    __slots__ = ('_cache_file', '_full_rescan', '_target_names', '_entries', '_previous', '_trusted_before_ns',
+                 '_started_ns', '_lock', 'hits', 'misses')
+
+    @staticmethod
+    def default_path(start_path):
+        """Returns the default cache file for start_path, every start path gets a cache of its own
+
+        :param start_path: path a scan starts from
+        :type start_path: str
+        :rtype: Path
+        """
+        import hashlib
+        cache_home = os.environ.get('XDG_CACHE_HOME') or osp.join(osp.expanduser('~'), '.cache')
+        digest = hashlib.sha1(osp.abspath(str(start_path)).encode('utf-8', 'surrogateescape')).hexdigest()[:16]
+        return Path(cache_home) / 'ilinfo' / f'dircache-{digest}.json'
+
+    @property
+    def cache_file(self):
+        return self._cache_file
+
+    def load(self, target_names):
+        """Reads the stored entries, they are only used if they were collected for the same target names
+
+        :param target_names: file names the walker collects
+        :type target_names: iterable
+        """
+        self._target_names = sorted(target_names)
+        self._started_ns = time.time_ns()
+        self._entries = {}
+        self._previous = {}
+        if self._full_rescan:
+            return
+
+        try:
+            with open(self._cache_file, 'r') as cache_file:
+                stored = json.load(cache_file)
+        except (OSError, ValueError):
+            return
+        if stored.get('version') != self.VERSION or stored.get('targets') != self._target_names:
+            return
+        self._previous = stored.get('dirs', {})
+        self._trusted_before_ns = stored.get('started_ns', 0) - self.RACY_NS
+
+    def lookup(self, dir_path, stat):
+        """Returns the cached (found, subdirs) of dir_path, or None if it has to be listed again
+
+        :param dir_path: full path of the directory
+        :type dir_path: str
+        :param stat: current os.stat() result of dir_path
+        :type stat: os.stat_result
+        :rtype: tuple
+        """
+        entry = self._previous.get(dir_path)
+        if entry is None or entry[0] != stat.st_mtime_ns or entry[1] != stat.st_ino \
+                or entry[0] >= self._trusted_before_ns:
+            with self._lock:
+                self.misses += 1
+            return None
+
+        self._entries[dir_path] = entry
+        with self._lock:
+            self.hits += 1
+        return list(entry[3]), list(entry[2])
+
+    def store(self, dir_path, stat, found, subdirs):
+        self._entries[dir_path] = [stat.st_mtime_ns, stat.st_ino, sorted(subdirs), sorted(found)]
+
+    def save(self):
+        """Writes every directory seen during the last walk to the cache file, directories not seen are dropped"""
+        self._cache_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp_file = self._cache_file.with_name(self._cache_file.name + '.tmp')
+        with open(tmp_file, 'w') as cache_file:
+            json.dump({
+                'version': self.VERSION,
+                'targets': self._target_names,
+                'started_ns': self._started_ns,
+                'dirs': self._entries
+            }, cache_file)
+        os.replace(tmp_file, self._cache_file)
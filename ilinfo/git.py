@@ -0,0 +1,357 @@
+# Created by Andre Machon 18/10/2026
+import os
+from collections import namedtuple
+from os import path as osp
+
+__all__ = ['Repository', 'GitConfig', 'GitConfigError', 'find_repository', 'user_config_files', 'read_head',
+           'resolve_ref']
+
+Repository = namedtuple('Repository', ['work_tree', 'git_dir', 'common_dir'])
+Repository.__doc__ = """Location of a git repository
+
+work_tree: directory containing .git, git_dir: the repository's git dir, for submodules and worktrees the one
+.git points to, common_dir: holds config and refs, differs from git_dir for worktrees only
+"""
+
+
+class GitConfigError(Exception):
+    """Raised for config files the reader does not understand, callers fall back to the git executable then"""
+
+
+def find_repository(path):
+    """Finds the repository path belongs to, the same way git does, by looking for .git in path and its parents
+
+    .git may be a directory or a file with a "gitdir: <path>" line, as used by submodules and worktrees.
+
+    :param path: path inside of a work tree
+    :type path: str
+    :return: the repository or None if path is not inside of one
+    :rtype: Repository
+    """
+    current = osp.abspath(str(path))
+    while True:
+        dot_git = osp.join(current, '.git')
+        if osp.isdir(dot_git):
+            return Repository(current, dot_git, _common_dir(dot_git))
+        if osp.isfile(dot_git):
+            git_dir = _read_gitdir_file(dot_git)
+            if git_dir is not None:
+                return Repository(current, git_dir, _common_dir(git_dir))
+        parent = osp.dirname(current)
+        if parent == current:
+            return None
+        current = parent
+
+
+def _read_gitdir_file(dot_git):
+    try:
+        with open(dot_git, 'r', encoding='utf-8') as f:
+            line = f.readline().strip()
+    except (OSError, UnicodeDecodeError):
+        return None
+    if not line.startswith('gitdir:'):
+        return None
+    git_dir = line[len('gitdir:'):].strip()
+    return osp.normpath(osp.join(osp.dirname(dot_git), git_dir))
+
+
+def _common_dir(git_dir):
+    # worktrees keep a commondir file pointing to the main repository's git dir, which holds config and refs
+    try:
+        with open(osp.join(git_dir, 'commondir'), 'r', encoding='utf-8') as f:
+            common_dir = f.readline().strip()
+    except OSError:
+        return git_dir
+    return osp.normpath(osp.join(git_dir, common_dir))
+
+
+def read_head(repo):
+    """Reads HEAD from disk
+
+    :param repo: repository to read HEAD of
+    :type repo: Repository
+    :return: (commit, branch), branch is None for a detached HEAD, commit is None for a branch without commits yet
+    :rtype: tuple
+    """
+    head = _read_first_line(osp.join(repo.git_dir, 'HEAD'))
+    if head is None:
+        return None, None
+    if not head.startswith('ref:'):
+        return head, None
+
+    ref = head[len('ref:'):].strip()
+    branch = ref[len('refs/heads/'):] if ref.startswith('refs/heads/') else ref
+    return resolve_ref(repo, ref), branch
+
+
+def resolve_ref(repo, ref):
+    """Resolves a ref like refs/heads/main to a commit, from loose ref files or packed-refs
+
+    :type repo: Repository
+    :param ref: full name of the ref
+    :type ref: str
+    :return: commit or None if the ref does not exist on disk
+    :rtype: str
+    """
+    for _ in range(5):
+        # HEAD and refs/worktree live in the worktree's git dir, everything else in the common dir
+        value = _read_first_line(osp.join(repo.git_dir, ref))
+        if value is None and repo.common_dir != repo.git_dir:
+            value = _read_first_line(osp.join(repo.common_dir, ref))
+        if value is None:
+            return _packed_refs(repo.common_dir).get(ref)
+        if not value.startswith('ref:'):
+            return value
+        ref = value[len('ref:'):].strip()
+    return None
+
+
+def _packed_refs(common_dir):
+    refs = {}
+    try:
+        with open(osp.join(common_dir, 'packed-refs'), 'r', encoding='utf-8', errors='surrogateescape') as f:
+            for line in f:
+                # "#" starts the header, "^" the peeled commit of the tag above
+                if line.startswith(('#', '^')):
+                    continue
+                commit, _, ref = line.strip().partition(' ')
+                if ref:
+                    refs[ref] = commit
+    except OSError:
+        pass
+    return refs
+
+
+def _read_first_line(file_path):
+    try:
+        with open(file_path, 'r', encoding='utf-8', errors='surrogateescape') as f:
+            return f.readline().strip()
+    except (OSError, ValueError):
+        return None
+
+
+def user_config_files():
+    """Returns the system and global config files, in the order git reads them
+
+    :rtype: list
+    """
+    files = []
+    if not os.environ.get('GIT_CONFIG_NOSYSTEM'):
+        files.append('/etc/gitconfig')
+    xdg_config_home = os.environ.get('XDG_CONFIG_HOME') or osp.join(osp.expanduser('~'), '.config')
+    files.append(osp.join(xdg_config_home, 'git', 'config'))
+    files.append(osp.join(osp.expanduser('~'), '.gitconfig'))
+    return files
+
+
+class GitConfig:
+    """Reader for git config files
+
+    Understands sections with and without subsections, quoting, escapes, comments, line continuations and
+    [include] directives. Conditional [includeIf] directives raise a GitConfigError, as their conditions would
+    have to be evaluated like git does.
+    """
+
+    MAX_INCLUDE_DEPTH = 10
+
+    def __init__(self, entries=None):
+        # list of ((section, subsection, key), value), in the order git reads them
+        self._entries = entries or []
+
+    __slots__ = ('_entries',)
+
+    @classmethod
+    def read(cls, file_path, missing_ok=False):
+        """Reads file_path and every file it includes
+
+        :param file_path: path to the config file
+        :type file_path: str
+        :param missing_ok: return an empty config instead of raising, if the file does not exist
+        :type missing_ok: bool
+        :rtype: GitConfig
+        :raises GitConfigError: if the file can't be read or contains something the reader does not understand
+        """
+        config = cls()
+        config._read(file_path, missing_ok, 0)
+        return config
+
+    def extend(self, other):
+        """Returns a new config holding the entries of self followed by those of other
+
+        :type other: GitConfig
+        :rtype: GitConfig
+        """
+        return GitConfig(self._entries + other._entries)
+
+    def get_all(self, section, subsection, key):
+        """Returns all values of a key, e.g. get_all('remote', 'origin', 'url')
+
+        :rtype: list
+        """
+        lookup = (section.lower(), subsection, key.lower())
+        return [value for entry, value in self._entries if entry == lookup]
+
+    def subsections(self, section):
+        """Returns the subsections of section in the order they first appear
+
+        :rtype: list
+        """
+        section = section.lower()
+        seen = {}
+        for (sec, subsection, _), _ in self._entries:
+            if sec == section and subsection is not None:
+                seen.setdefault(subsection, None)
+        return list(seen)
+
+    def remotes(self):
+        """Returns {'remote_name': 'url'} like the last line per remote of "git remote -v" shows it
+
+        That is the push URL: the last pushurl, or the last url if the remote has no pushurl, with url.<base>.insteadOf
+        and pushInsteadOf rewrites applied.
+
+        :rtype: dict
+        """
+        remotes = {}
+        for name in self.subsections('remote'):
+            push_urls = self.get_all('remote', name, 'pushurl')
+            if push_urls:
+                remotes[name] = self._rewrite_url(push_urls[-1], 'insteadof')
+                continue
+            urls = self.get_all('remote', name, 'url')
+            if urls:
+                push_rewritten = self._rewrite_url(urls[-1], 'pushinsteadof')
+                if push_rewritten != urls[-1]:
+                    remotes[name] = push_rewritten
+                else:
+                    remotes[name] = self._rewrite_url(urls[-1], 'insteadof')
+        return remotes
+
+    def _rewrite_url(self, url, key):
+        # the longest matching prefix wins, as in git
+        best_base, best_prefix = None, ''
+        for base in self.subsections('url'):
+            for prefix in self.get_all('url', base, key):
+                if url.startswith(prefix) and len(prefix) > len(best_prefix):
+                    best_base, best_prefix = base, prefix
+        if best_base is None:
+            return url
+        return best_base + url[len(best_prefix):]
+
+    def _read(self, file_path, missing_ok, depth):
+        if depth > self.MAX_INCLUDE_DEPTH:
+            raise GitConfigError(f"Include depth exceeded while reading {file_path}")
+        try:
+            with open(file_path, 'r', encoding='utf-8', errors='surrogateescape') as f:
+                text = f.read()
+        except FileNotFoundError:
+            if missing_ok:
+                return
+            raise GitConfigError(f"{file_path} does not exist")
+        except OSError as err:
+            raise GitConfigError(str(err))
+
+        for section, subsection, key, value in _parse_config(text, file_path):
+            if section == 'includeif':
+                raise GitConfigError(f"Conditional includes are not supported: {file_path}")
+            if section == 'include' and subsection is None and key == 'path':
+                self._entries.append(((section, subsection, key), value))
+                include = osp.expanduser(value)
+                if not osp.isabs(include):
+                    include = osp.join(osp.dirname(file_path), include)
+                # like git, include files that don't exist are ignored
+                self._read(include, True, depth + 1)
+                continue
+            self._entries.append(((section, subsection, key), value))
+
+
+def _parse_config(text, file_path):
+    section, subsection = None, None
+    lines = text.splitlines()
+    i = 0
+    while i < len(lines):
+        line = lines[i].strip()
+        i += 1
+        if not line or line[0] in '#;':
+            continue
+
+        if line.startswith('['):
+            section, subsection, rest = _parse_section_header(line, file_path)
+            line = rest.strip()
+            if not line or line[0] in '#;':
+                continue
+
+        if section is None:
+            raise GitConfigError(f"Key outside of a section in {file_path}")
+        key, sep, raw_value = line.partition('=')
+        key = key.strip().lower()
+        if not sep:
+            # a key without value means true, e.g. "bare"
+            key = key.split()[0] if key.split() else key
+            yield section, subsection, key, 'true'
+            continue
+
+        # a backslash at the end of a line continues the value on the next one
+        while _continues(raw_value) and i < len(lines):
+            raw_value = raw_value[:-1] + lines[i]
+            i += 1
+        yield section, subsection, key, _parse_value(raw_value, file_path)
+
+
+def _continues(raw_value):
+    # an odd number of trailing backslashes, an even number are escaped backslashes
+    return (len(raw_value) - len(raw_value.rstrip('\\'))) % 2 == 1
+
+
+def _parse_section_header(line, file_path):
+    end = line.find(']')
+    if end < 0:
+        raise GitConfigError(f"Invalid section header in {file_path}: {line}")
+    header, rest = line[1:end], line[end + 1:]
+
+    if '"' in header:
+        name, _, quoted = header.partition('"')
+        if not quoted.endswith('"'):
+            # the subsection itself contains a "]", find the real end of the header
+            end = line.find('"]')
+            if end < 0:
+                raise GitConfigError(f"Invalid section header in {file_path}: {line}")
+            quoted, rest = line[len(name) + 2:end + 1], line[end + 2:]
+        subsection = quoted[:-1].replace('\\"', '"').replace('\\\\', '\\')
+        return name.strip().lower(), subsection, rest
+
+    # deprecated [section.subsection] syntax, the subsection is lower cased there
+    name, _, subsection = header.partition('.')
+    return name.strip().lower(), subsection.lower() if subsection else None, rest
+
+
+_ESCAPES = {'n': '\n', 't': '\t', 'b': '\b', '"': '"', '\\': '\\'}
+
+
+def _parse_value(raw_value, file_path):
+    value = []
+    in_quotes = False
+    pending_space = ''
+    i = 0
+    while i < len(raw_value):
+        c = raw_value[i]
+        i += 1
+        if c == '\\':
+            if i >= len(raw_value) or raw_value[i] not in _ESCAPES:
+                raise GitConfigError(f"Invalid escape sequence in {file_path}")
+            c = _ESCAPES[raw_value[i]]
+            i += 1
+        elif c == '"':
+            in_quotes = not in_quotes
+            continue
+        elif not in_quotes and c in '#;':
+            break
+        elif not in_quotes and c.isspace():
+            # whitespace inside of a value is kept, around it is dropped
+            pending_space += c if value else ''
+            continue
+
+        value.append(pending_space + c)
+        pending_space = ''
+    if in_quotes:
+        raise GitConfigError(f"Unterminated quote in {file_path}")
+    return ''.join(value)
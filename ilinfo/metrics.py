@@ -0,0 +1,238 @@
+# Created by Andre Machon 18/10/2026
+import heapq
+import json
+import os
+import socket
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+
+__all__ = ['RunMetrics', 'COUNTERS']
+
+# counters of a run, every one of them is in the report even if it stayed 0
+COUNTERS = ('dirs_visited', 'dirs_pruned', 'dir_cache_hits', 'dir_cache_misses', 'files_opened', 'bytes_read',
+            'git_processes', 'parse_cache_hits', 'parse_cache_misses', 'installations', 'errors')
+
+
+class RunMetrics:
+    """Collects what a run cost: wall and CPU time per stage, counters and the slowest files and directories
+
+    The sequential stages of a run are 'discovery', 'parse' and 'output', timed with stage, their CPU time is the one
+    of the whole process. Within 'parse', every file read and every git and database lookup is timed on its own with
+    record, with the CPU time of the thread doing it, and added up per stage: 'parse_ini' (ilias.ini.php,
+    client.ini.php, .gitmodules), 'parse_plugins' (plugin.php), 'git' and 'db'. The installations of --jobs worker
+    processes are not part of those, only of 'parse'.
+
+    All methods can be called from several threads at once.
+    """
+
+    def __init__(self, slowest=10):
+        """
+        :param slowest: number of the slowest files and directories kept for the report
+        :type slowest: int
+        """
+        self._slowest = slowest
+        self._lock = threading.Lock()
+        self._stages = {}
+        self._counters = dict.fromkeys(COUNTERS, 0)
+        # min-heaps of (seconds, n, entry), the fastest of the kept ones is dropped first
+        self._files = []
+        self._dirs = []
+        self._n = 0
+        self._started_at = datetime.now(timezone.utc)
+        self._started = time.perf_counter()
+        self._started_cpu = time.process_time()
+
+    __slots__ = ('_slowest', '_lock', '_stages', '_counters', '_files', '_dirs', '_n', '_started_at', '_started',
+                 '_started_cpu')
+
+    @contextmanager
+    def stage(self, name, exclude=()):
+        """Times the block as stage name, with the CPU time of the process
+
+        :param exclude: stages recorded while the block runs whose time is not part of it, e.g. 'parse' if output
+            pulls the installations from a generator that parses them
+        :type exclude: tuple
+        """
+        excluded = [self._stage_time(other) for other in exclude]
+        start, start_cpu = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            wall, cpu = time.perf_counter() - start, time.process_time() - start_cpu
+            for other, (wall_before, cpu_before) in zip(exclude, excluded):
+                wall_now, cpu_now = self._stage_time(other)
+                wall -= wall_now - wall_before
+                cpu -= cpu_now - cpu_before
+            self._add_stage(name, wall, cpu)
+
+    @contextmanager
+    def record(self, name, file_path=None):
+        """Times the block as part of stage name, with the CPU time of the current thread
+
+        :param file_path: the file read in the block, it is counted as opened and may become one of the slowest files
+        :type file_path: str
+        """
+        start, start_cpu = time.perf_counter(), time.thread_time()
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - start
+            self._add_stage(name, wall, time.thread_time() - start_cpu)
+            if file_path is not None:
+                try:
+                    size = os.path.getsize(file_path)
+                except OSError:
+                    # the file does not exist, e.g. an installation without .gitmodules
+                    return
+                self.add('files_opened')
+                self.add('bytes_read', size)
+                self._keep(self._files, wall, {'path': str(file_path), 'seconds': round(wall, 6), 'bytes': size,
+                                               'stage': name})
+
+    def iterate(self, name, iterable):
+        """Yields the items of iterable, the time spent producing them is recorded as stage name
+
+        :return: generator
+        """
+        iterator = iter(iterable)
+        while True:
+            with self.record(name):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
+
+    def dir_listed(self, dir_path, seconds, entries):
+        """Called by TreeWalker for every directory it listed
+
+        :type dir_path: str
+        :type seconds: float
+        :param entries: number of entries of the directory
+        :type entries: int
+        """
+        self._keep(self._dirs, seconds, {'path': dir_path, 'seconds': round(seconds, 6), 'entries': entries})
+
+    def add(self, counter, n=1):
+        with self._lock:
+            self._counters[counter] = self._counters.get(counter, 0) + n
+
+    def report(self, **fields):
+        """Returns the report of the run so far
+
+        :param fields: further top level fields, e.g. the start path
+        :return: {'host': ..., 'started_at': ..., 'finished_at': ..., 'wall_seconds': ..., 'cpu_seconds': ...,
+            'max_rss_kib': ..., 'stages': {'discovery': {'wall_seconds': ..., 'cpu_seconds': ..., 'calls': ...}},
+            'counters': {...}, 'slowest_files': [...], 'slowest_dirs': [...]}
+        :rtype: dict
+        """
+        with self._lock:
+            stages = {name: {'wall_seconds': round(wall, 6), 'cpu_seconds': round(cpu, 6), 'calls': calls}
+                      for name, (wall, cpu, calls) in self._stages.items()}
+            counters = dict(self._counters)
+            slowest_files = [entry for _, _, entry in sorted(self._files, reverse=True)]
+            slowest_dirs = [entry for _, _, entry in sorted(self._dirs, reverse=True)]
+        return {
+            'host': socket.gethostname(),
+            **fields,
+            'started_at': self._started_at.isoformat(timespec='seconds'),
+            'finished_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'wall_seconds': round(time.perf_counter() - self._started, 6),
+            'cpu_seconds': round(time.process_time() - self._started_cpu, 6),
+            'max_rss_kib': _max_rss_kib(),
+            'stages': stages,
+            'counters': counters,
+            'slowest_files': slowest_files,
+            'slowest_dirs': slowest_dirs,
+        }
+
+    def write_json(self, file_path, report=None):
+        """Writes the report as JSON
+
+        :param report: the report to write, a new one if None
+        :type report: dict
+        :return: file_path
+        :rtype: Path
+        """
+        return _write_atomic(file_path, json.dumps(report or self.report(), indent=2) + '\n')
+
+    def write_prometheus(self, file_path, report=None):
+        """Writes the report in the text format of the node exporter's textfile collector
+
+        The file is replaced atomically, so the collector never reads half of it. Its name needs to end in .prom.
+
+        :param report: the report to write, a new one if None
+        :type report: dict
+        :return: file_path
+        :rtype: Path
+        """
+        report = report or self.report()
+        lines = []
+
+        def metric(name, help_text, samples):
+            lines.append(f'# HELP ilinfo_{name} {help_text}')
+            lines.append(f'# TYPE ilinfo_{name} gauge')
+            for labels, value in samples:
+                label_text = ','.join(f'{key}="{_escape(value)}"' for key, value in labels.items())
+                lines.append(f'ilinfo_{name}{{{label_text}}} {value}' if label_text else f'ilinfo_{name} {value}')
+
+        finished = datetime.fromisoformat(report['finished_at']).timestamp()
+        metric('last_run_timestamp_seconds', 'Time the last run finished', [({}, int(finished))])
+        metric('last_run_wall_seconds', 'Wall time of the last run', [({}, report['wall_seconds'])])
+        metric('last_run_cpu_seconds', 'CPU time of the last run', [({}, report['cpu_seconds'])])
+        metric('last_run_max_rss_bytes', 'Peak resident memory of the last run',
+               [({}, report['max_rss_kib'] * 1024)])
+        metric('last_run_stage_wall_seconds', 'Wall time per stage of the last run',
+               [({'stage': name}, stage['wall_seconds']) for name, stage in sorted(report['stages'].items())])
+        metric('last_run_stage_cpu_seconds', 'CPU time per stage of the last run',
+               [({'stage': name}, stage['cpu_seconds']) for name, stage in sorted(report['stages'].items())])
+        for counter, value in sorted(report['counters'].items()):
+            metric(f'last_run_{counter}', f"{counter.replace('_', ' ').capitalize()} in the last run",
+                   [({}, value)])
+        return _write_atomic(file_path, '\n'.join(lines) + '\n')
+
+    def _add_stage(self, name, wall, cpu):
+        with self._lock:
+            stage = self._stages.get(name, (0.0, 0.0, 0))
+            self._stages[name] = (stage[0] + wall, stage[1] + cpu, stage[2] + 1)
+
+    def _stage_time(self, name):
+        with self._lock:
+            stage = self._stages.get(name, (0.0, 0.0, 0))
+        return stage[0], stage[1]
+
+    def _keep(self, heap, seconds, entry):
+        if not self._slowest:
+            return
+        with self._lock:
+            self._n += 1
+            if len(heap) < self._slowest:
+                heapq.heappush(heap, (seconds, self._n, entry))
+            elif seconds > heap[0][0]:
+                heapq.heapreplace(heap, (seconds, self._n, entry))
+
+
+def _max_rss_kib():
+    try:
+        import resource
+    except ImportError:
+        # not on Windows
+        return 0
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _write_atomic(file_path, text):
+    file_path = Path(file_path)
+    file_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_file = file_path.with_name(f'.{file_path.name}.{os.getpid()}.tmp')
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(tmp_file, file_path)
+    return file_path
@@ -1,19 +1,92 @@
 # Created by Andre Machon 16/02/2021
 import json
+import re
+import socket
+import time
 from abc import ABC, abstractmethod
-from copy import deepcopy
+from datetime import datetime, timezone
 from pathlib import Path
 from ilinfo import analyzers
+from ilinfo.records import to_json
+from ilinfo.utils import FrozenList, freeze, thaw
+from ilinfo.wire import MAGIC, encode_record
 
-__all__ = ['OutputProcessor', 'JSONOutput']
+__all__ = ['OutputProcessor', 'JSONOutput', 'StreamingJSONOutput', 'AgentOutput', 'SQLiteOutput',
+           'NDJSON_FORMAT_VERSION', 'version_key']
+
+# version of the NDJSON record layout, see StreamingJSONOutput
+NDJSON_FORMAT_VERSION = 1
 
 
 class OutputProcessor(ABC):
+    # processors that can output installations while they are parsed set this and implement begin, write_installation
+    # and finish
+    streaming = False
+
     def __init__(self, ilias_dicts=None):
         self._ilias_dicts = ilias_dicts
 
-    @abstractmethod
-    def combine_data(self, ilias_dicts):
+    def stream(self, installations, stats=None):
+        """Outputs installations one by one, as they are yielded
+
+        :param installations: iterable of installation dicts, see IliasFileParser.iter_installations
+        :type installations: collections.abc.Iterable
+        :param stats: called once all installations were output, returns counters for finish, see
+            IliasFileParser.stats
+        :type stats: callable
+        :return: whatever finish returns
+        """
+        self.begin()
+        for installation in installations:
+            self.write_installation(installation)
+        return self.finish(stats() if stats else None)
+
+    def begin(self):
+        raise NotImplementedError(f"{type(self).__name__} does not support streaming")
+
+    def write_installation(self, installation):
+        raise NotImplementedError(f"{type(self).__name__} does not support streaming")
+
+    def finish(self, stats=None):
+        raise NotImplementedError(f"{type(self).__name__} does not support streaming")
+
+    def combine_data(self, result_files):
+        """Merges result files of many runs into one inventory, see combine.ResultMerger
+
+        Installations are deduplicated by host and path, the one of the latest scan wins. They are output through
+        begin, write_installation and finish, with their host and scan time as envelope, so only processors that
+        stream can combine.
+
+        :param result_files: paths of ilinfo.json or ilinfo.ndjson files
+        :type result_files: collections.abc.Iterable
+        :return: whatever finish returns
+        """
+        if not self.streaming:
+            raise NotImplementedError(f"{type(self).__name__} does not support streaming")
+        merger = self._merger(result_files, getattr(self, 'file_path', None))
+        try:
+            self.begin()
+            for envelope, installation in merger:
+                self.write_installation(installation, **envelope)
+            return self.finish({'combined': merger.counts})
+        finally:
+            merger.close()
+            self._close()
+
+    @staticmethod
+    def _merger(result_files, output_file):
+        # lazy import, ilinfo.combine is only needed for combining
+        from ilinfo.combine import ResultMerger
+
+        merger = ResultMerger(result_files)
+        if output_file is not None and any(Path(output_file).resolve() == path.resolve() for path in merger.files):
+            raise ValueError(f"{output_file} is one of the result files, it would be overwritten")
+        # every file is indexed before the output is truncated
+        merger.index()
+        return merger
+
+    def _close(self):
+        # releases what begin acquired, after finish or if the output failed
         pass
 
     @abstractmethod
@@ -24,7 +97,10 @@ class OutputProcessor(ABC):
 class JSONOutput(OutputProcessor):
     def __init__(self, ilias_dicts=None, output_path=None):
         self._combined_dict = {}
-        super().__init__(ilias_dicts)
+        self._summary = None
+        # frozen once here and in the setter, the view handed out is rebuilt only after a dict was added
+        super().__init__([freeze(d) for d in ilias_dicts or []])
+        self._view = None
 
         package_folder = Path(__file__).parents[1]
         self._output_path = Path(output_path) if output_path else package_folder / 'ilinfo-results'
@@ -34,15 +110,27 @@ class JSONOutput(OutputProcessor):
 
     @property
     def ilias_dicts(self):
-        return deepcopy(self._ilias_dicts)
+        """Read-only view of the ilias dicts, see snapshot for a mutable copy"""
+        if self._view is None:
+            self._view = FrozenList(self._ilias_dicts)
+        return self._view
 
     @ilias_dicts.setter
     def ilias_dicts(self, new_dict):
-        self._ilias_dicts.append(new_dict)
+        self._ilias_dicts.append(freeze(new_dict))
+        self._view = None
 
-    def combine_data(self, ilias_dicts):
-        # combine ilias_info_dicts data to single dict
-        pass
+    @property
+    def summary(self):
+        """The summary of the last combine_data, None before"""
+        return dict(self._summary) if self._summary else None
+
+    def snapshot(self):
+        """Returns a mutable deep copy of the ilias dicts
+
+        :rtype: list
+        """
+        return thaw(self._ilias_dicts)
 
     def output_data(self, file_parser):
         """Outputs data analyzed by IliasFileParser instance to JSON file
@@ -53,10 +141,669 @@ class JSONOutput(OutputProcessor):
         """
         if not isinstance(file_parser, analyzers.IliasFileParser):
             raise TypeError("Param file_parser needs to be of type IliasFileParser")
-        if not file_parser.data:
+        data = file_parser.data
+        if not data:
             raise ValueError("IliasFileParser has no data, did you main an Installation with it?")
 
         json_file_path = Path(self._output_path) / 'ilinfo.json'
         with open(json_file_path, 'w') as jsonfile:
-            json.dump(file_parser.data, jsonfile)
+            json.dump(data, jsonfile, default=to_json)
+        return json_file_path
+
+    def combine_data(self, result_files):
+        """Merges result files of many runs into ilinfo.json, see OutputProcessor.combine_data
+
+        The installations are written one by one, keyed by 'host:ilias_path', which combining reads back as their
+        host. Installations of an unknown host would be ambiguous by path, every ilinfo.json needs to be given with
+        its host.
+
+        :param result_files: paths of ilinfo.json or ilinfo.ndjson files, or (host, path) tuples
+        :type result_files: collections.abc.Iterable
+        :return: path of the written file
+        :rtype: Path
+        """
+        if self.streaming:
+            return super().combine_data(result_files)
+        json_file_path = Path(self._output_path) / 'ilinfo.json'
+        started = time.perf_counter()
+        merger = self._merger(result_files, json_file_path)
+        try:
+            if merger.files_without_host:
+                raise ValueError(f"ilinfo.json has no room for installations of unknown hosts, give the host of "
+                                 f"{', '.join(map(str, merger.files_without_host))} as well")
+            counts = {'installations': 0, 'errors': 0}
+            with open(json_file_path, 'w', encoding='utf-8') as jsonfile:
+                jsonfile.write('{')
+                for envelope, installation in merger:
+                    # the separators json.dump uses
+                    separator = ', ' if counts['installations'] else ''
+                    key = f"{envelope['host']}:{installation['ilias_path']}"
+                    jsonfile.write(f"{separator}{json.dumps(key)}: {json.dumps(installation, default=to_json)}")
+                    counts['installations'] += 1
+                    counts['errors'] += 'error' in installation
+                jsonfile.write('}')
+        finally:
+            merger.close()
+        self._summary = dict(type='summary', **counts, combined=merger.counts, finished_at=_utc_now(),
+                             seconds=round(time.perf_counter() - started, 3))
         return json_file_path
+
+
+class StreamingJSONOutput(JSONOutput):
+    """Writes each installation as soon as it is parsed, instead of all of them at the end
+
+    In 'ndjson' format, ilinfo.ndjson gets one JSON record per line:
+
+        {"type": "header", "format": 1, "host": "...", "started_at": "2021-02-16T12:00:00+00:00"}
+        {"type": "installation", "ilias_path": "/srv/www/ilias", "data": {...}}
+        ...
+        {"type": "summary", "installations": 12, "errors": 0, "finished_at": "...", "seconds": 4.2}
+
+    The summary also holds the counters handed to finish, like the hits and misses of the parse cache.
+
+    In 'json' format, ilinfo.json is written incrementally and ends up byte for byte the same as the file JSONOutput
+    writes, so existing consumers keep working.
+    """
+
+    streaming = True
+    FORMATS = ('ndjson', 'json')
+
+    def __init__(self, ilias_dicts=None, output_path=None, fmt='ndjson'):
+        if fmt not in self.FORMATS:
+            raise ValueError(f"fmt needs to be one of {', '.join(self.FORMATS)}")
+        super().__init__(ilias_dicts, output_path)
+        self._fmt = fmt
+        self._file = None
+        self._summary = None
+        self._started = None
+        self._started_at = None
+        self._counts = None
+
+    @property
+    def fmt(self):
+        return self._fmt
+
+    @property
+    def file_path(self):
+        return Path(self._output_path) / f'ilinfo.{self._fmt}'
+
+    @property
+    def summary(self):
+        """The summary record of the last output, None while it is running"""
+        return dict(self._summary) if self._summary else None
+
+    def combine_data(self, result_files):
+        """Merges result files into ilinfo.ndjson, see OutputProcessor.combine_data
+
+        :return: path of the written file
+        :rtype: Path
+        """
+        if self._fmt != 'ndjson':
+            raise ValueError("Combining needs the 'ndjson' format, installations of different hosts can share a path")
+        return super().combine_data(result_files)
+
+    def output_data(self, file_parser):
+        """Outputs data analyzed by IliasFileParser instance, see stream
+
+        :type file_parser: IliasFileParser
+        :return: path of the written file
+        :rtype: Path
+        """
+        if not isinstance(file_parser, analyzers.IliasFileParser):
+            raise TypeError("Param file_parser needs to be of type IliasFileParser")
+        data = file_parser.data
+        if not data:
+            raise ValueError("IliasFileParser has no data, did you main an Installation with it?")
+        return self.stream(data.values(), file_parser.stats)
+
+    def stream(self, installations, stats=None):
+        """Writes installations one by one, each is flushed to the file as soon as it is yielded
+
+        :param installations: iterable of installation dicts, see IliasFileParser.iter_installations
+        :type installations: collections.abc.Iterable
+        :param stats: called once all installations were written, returns counters added to the summary
+        :type stats: callable
+        :return: path of the written file
+        :rtype: Path
+        """
+        try:
+            return super().stream(installations, stats)
+        finally:
+            self._close()
+
+    def begin(self):
+        """Opens the output file and writes the header, write_installation and finish follow"""
+        self._summary = None
+        self._started = time.perf_counter()
+        self._counts = {'installations': 0, 'errors': 0}
+        self._file = open(self.file_path, 'w', encoding='utf-8')
+        if self._fmt == 'ndjson':
+            self._write_record({'type': 'header', 'format': NDJSON_FORMAT_VERSION, 'host': socket.gethostname(),
+                                'started_at': _utc_now()})
+        else:
+            self._file.write('{')
+
+    def write_installation(self, installation, **envelope):
+        """Writes a single installation dict and flushes it to the file
+
+        :type installation: dict
+        :param envelope: further fields of the installation record, e.g. the host an installation was collected from,
+            'ndjson' format only
+        """
+        if self._fmt == 'ndjson':
+            self._write_record({'type': 'installation', **envelope, 'ilias_path': installation['ilias_path'],
+                                'data': installation})
+        else:
+            if envelope:
+                raise ValueError("only the 'ndjson' format has fields besides the installation")
+            # the separators json.dump uses, the file is the same as if the whole dict was dumped at once
+            separator = ', ' if self._counts['installations'] else ''
+            self._file.write(
+                f"{separator}{json.dumps(installation['ilias_path'])}: {json.dumps(installation, default=to_json)}"
+            )
+            self._file.flush()
+        self._counts['installations'] += 1
+        self._counts['errors'] += 'error' in installation
+
+    def finish(self, stats=None):
+        """Writes the summary and closes the file
+
+        :param stats: further counters of the summary, e.g. {'parse_cache': {'hits': 12, 'misses': 3}}
+        :type stats: dict
+        :return: path of the written file
+        :rtype: Path
+        """
+        self._summary = dict(type='summary', **self._counts, **(stats or {}), finished_at=_utc_now(),
+                             seconds=round(time.perf_counter() - self._started, 3))
+        if self._fmt == 'ndjson':
+            self._write_record(self._summary)
+        else:
+            self._file.write('}')
+        self._close()
+        return self.file_path
+
+    def write_record(self, record):
+        """Writes a record of another type between begin and finish, 'ndjson' format only
+
+        :type record: dict
+        """
+        if self._fmt != 'ndjson':
+            raise ValueError("only the 'ndjson' format has records besides the installations")
+        self._write_record(record)
+
+    def _write_record(self, record):
+        self._file.write(json.dumps(record, default=to_json) + '\n')
+        self._file.flush()
+
+    def _close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class AgentOutput(OutputProcessor):
+    """Sends each installation to ilinfo collect as soon as it is parsed, as frames of ilinfo.wire
+
+    The records are the ones of StreamingJSONOutput's 'ndjson' format, compressed and length prefixed. They are
+    written to a binary stream, e.g. stdout, or to the collector listening at address. The frames are neither
+    encrypted nor authenticated, so the passwords of the clients' databases are left out unless with_passwords is
+    given, and a collector on another host is reached through ssh, e.g. with its command or a tunnel.
+    """
+
+    streaming = True
+
+    def __init__(self, stream=None, address=None, level=6, with_passwords=False):
+        """
+        :param stream: binary file object the frames are written to
+        :param address: (host, port) of the collector, used if stream is None
+        :type address: tuple
+        :param level: zlib compression level of the records
+        :type level: int
+        :param with_passwords: whether 'pass' of the clients' 'db' is sent
+        :type with_passwords: bool
+        """
+        if (stream is None) == (address is None):
+            raise ValueError("AgentOutput needs either a stream or an address")
+        super().__init__()
+        self._stream = stream
+        self._address = address
+        self._level = level
+        self._with_passwords = with_passwords
+        self._socket = None
+        self._file = None
+        self._summary = None
+        self._started = None
+        self._started_at = None
+        self._counts = None
+
+    @property
+    def summary(self):
+        """The summary record of the last output, None while it is running"""
+        return dict(self._summary) if self._summary else None
+
+    def output_data(self, file_parser):
+        """Sends the data analyzed by IliasFileParser instance, see stream
+
+        :type file_parser: IliasFileParser
+        """
+        if not isinstance(file_parser, analyzers.IliasFileParser):
+            raise TypeError("Param file_parser needs to be of type IliasFileParser")
+        return self.stream(file_parser.data.values(), file_parser.stats)
+
+    def stream(self, installations, stats=None):
+        try:
+            return super().stream(installations, stats)
+        finally:
+            self._close()
+
+    def begin(self):
+        """Connects to the collector if there is no stream, then sends the header"""
+        self._summary = None
+        self._started = time.perf_counter()
+        self._counts = {'installations': 0, 'errors': 0}
+        if self._stream is not None:
+            self._file = self._stream
+        else:
+            self._socket = socket.create_connection(self._address)
+            self._file = self._socket.makefile('wb')
+        self._file.write(MAGIC)
+        self._send({'type': 'header', 'format': NDJSON_FORMAT_VERSION, 'host': socket.gethostname(),
+                    'started_at': _utc_now()})
+
+    def write_installation(self, installation, **envelope):
+        """Sends a single installation dict
+
+        :type installation: dict
+        :param envelope: further fields of the installation record, see StreamingJSONOutput.write_installation
+        """
+        data = installation if self._with_passwords else _without_passwords(installation)
+        self._send({'type': 'installation', **envelope, 'ilias_path': installation['ilias_path'], 'data': data})
+        self._counts['installations'] += 1
+        self._counts['errors'] += 'error' in installation
+
+    def finish(self, stats=None):
+        """Sends the summary and closes the connection
+
+        :param stats: further counters of the summary, see StreamingJSONOutput.finish
+        :type stats: dict
+        :return: the summary record
+        :rtype: dict
+        """
+        self._summary = dict(type='summary', **self._counts, **(stats or {}), finished_at=_utc_now(),
+                             seconds=round(time.perf_counter() - self._started, 3))
+        self._send(self._summary)
+        self._close()
+        return self.summary
+
+    def _send(self, record):
+        self._file.write(encode_record(record, self._level))
+        self._file.flush()
+
+    def _close(self):
+        # a stream handed in is left open, it belongs to the caller
+        if self._socket is not None:
+            self._file.close()
+            self._socket.close()
+            self._socket = None
+        self._file = None
+
+
+class SQLiteOutput(OutputProcessor):
+    """Writes the installations into normalized, indexed tables of ilinfo.sqlite3, for questions like "which
+    installations run plugin X older than 2.3" or "which clients use database server Y"
+
+    Each run adds a snapshot with the host and the time it started, earlier runs are kept. A run is a single
+    transaction, the rows are inserted in batches of batch_size installations, so a run that fails leaves nothing
+    behind. The tables are
+
+        snapshots       id, host, started_at, finished_at, installations, errors, seconds, stats
+        installations   id, snapshot, host, ilias_path, http_path, absolute_path, default_client, git_head,
+                        git_branch, git_dirty, error, data, started_at
+        clients         id, installation, name, source_file, db_type, db_host, db_port, db_name, db_user,
+                        db_version, language, skin, style
+        plugins         id, installation, plugin_id, version, version_key, ilias_min_version, ilias_max_version,
+                        responsible, responsible_mail, source_file, git_head, git_branch, git_dirty
+        submodules      id, installation, name, path, url, branch
+        remotes         id, plugin, name, url
+
+    started_at of an installation is the start of the scan it is from, the one of the snapshot unless the installation
+    was scanned elsewhere, e.g. by an agent of ilinfo collect. data is the installation as JSON, the passwords of the
+    clients' databases are only in there. Views named current_<table> hold the rows of the latest snapshot of each
+    host. version_key sorts versions numerically, the connections of connect have a SQL function of the same name, e.g.
+
+        SELECT * FROM current_plugins WHERE plugin_id = :plugin AND version_key < version_key(:version)
+    """
+
+    streaming = True
+    SCHEMA_VERSION = 1
+    FILE_NAME = 'ilinfo.sqlite3'
+    # canned queries of "ilinfo query", by name
+    QUERIES = {
+        'snapshots': 'SELECT * FROM snapshots ORDER BY id',
+        'plugins-older-than':
+            'SELECT i.host, i.ilias_path, p.plugin_id, p.version FROM current_plugins p '
+            'JOIN installations i ON i.id = p.installation '
+            'WHERE p.plugin_id = :plugin AND p.version_key < version_key(:version) ORDER BY i.host, i.ilias_path',
+        'clients-on-db-host':
+            'SELECT i.host, i.ilias_path, c.name, c.db_name, c.db_port FROM current_clients c '
+            'JOIN installations i ON i.id = c.installation WHERE c.db_host = :db_host ORDER BY i.host, i.ilias_path',
+        'plugin-versions':
+            'SELECT plugin_id, version, COUNT(*) AS installations FROM current_plugins '
+            'GROUP BY plugin_id, version ORDER BY plugin_id, version_key',
+    }
+
+    def __init__(self, ilias_dicts=None, output_path=None, batch_size=500):
+        """
+        :param output_path: folder of ilinfo.sqlite3
+        :param batch_size: number of installations whose rows are inserted at once
+        :type batch_size: int
+        """
+        super().__init__(ilias_dicts)
+        package_folder = Path(__file__).parents[1]
+        self._output_path = Path(output_path) if output_path else package_folder / 'ilinfo-results'
+        if not self._output_path.exists():
+            self._output_path.mkdir(parents=True, exist_ok=True)
+        self._batch_size = batch_size
+        self._connection = None
+        self._snapshot = None
+        self._host = None
+        self._ids = None
+        self._rows = None
+        self._pending = 0
+        self._summary = None
+        self._started = None
+        self._started_at = None
+        self._counts = None
+
+    @property
+    def file_path(self):
+        return Path(self._output_path) / self.FILE_NAME
+
+    @property
+    def summary(self):
+        """The summary of the last output, None while it is running"""
+        return dict(self._summary) if self._summary else None
+
+    @property
+    def snapshot(self):
+        """Id of the snapshot of the last or the running output"""
+        return self._snapshot
+
+    @classmethod
+    def connect(cls, db_file, read_only=True):
+        """Opens a database written by SQLiteOutput, with the SQL function version_key
+
+        :param db_file: path of the database
+        :param read_only: whether the database is opened read-only
+        :type read_only: bool
+        :rtype: sqlite3.Connection
+        """
+        import sqlite3
+        if read_only:
+            if not Path(db_file).is_file():
+                raise FileNotFoundError(f"{db_file} does not exist")
+            connection = sqlite3.connect(f'{Path(db_file).absolute().as_uri()}?mode=ro', uri=True)
+        else:
+            # transactions are begun and committed explicitly. AsyncAnalyzer calls begin, write_installation and finish
+            # from the threads of its executor, one after another, never at the same time
+            connection = sqlite3.connect(str(db_file), isolation_level=None, check_same_thread=False)
+        connection.create_function('version_key', 1, version_key)
+        return connection
+
+    @classmethod
+    def query(cls, db_file, sql, params=None):
+        """Runs a parameterized, read-only query
+
+        :param db_file: path of the database
+        :param sql: SQL, or the name of one of QUERIES
+        :type sql: str
+        :param params: values of the named parameters, e.g. {'plugin': 'xcron'} for :plugin
+        :type params: dict
+        :return: the column names and the rows
+        :rtype: tuple
+        """
+        connection = cls.connect(db_file)
+        try:
+            cursor = connection.execute(cls.QUERIES.get(sql, sql), params or {})
+            return [column[0] for column in cursor.description or ()], cursor.fetchall()
+        finally:
+            connection.close()
+
+    def output_data(self, file_parser):
+        """Writes the data analyzed by IliasFileParser instance, see stream
+
+        :type file_parser: IliasFileParser
+        :return: path of the database
+        :rtype: Path
+        """
+        if not isinstance(file_parser, analyzers.IliasFileParser):
+            raise TypeError("Param file_parser needs to be of type IliasFileParser")
+        data = file_parser.data
+        if not data:
+            raise ValueError("IliasFileParser has no data, did you main an Installation with it?")
+        return self.stream(data.values(), file_parser.stats)
+
+    def stream(self, installations, stats=None):
+        """Writes installations in batches, the snapshot is committed once all of them were written
+
+        :return: path of the database
+        :rtype: Path
+        """
+        try:
+            return super().stream(installations, stats)
+        finally:
+            self._close()
+
+    def begin(self):
+        """Opens the database, begins the transaction of the run and adds its snapshot"""
+        self._summary = None
+        self._started = time.perf_counter()
+        self._counts = {'installations': 0, 'errors': 0}
+        self._rows = {table: [] for table in _SQLITE_INSERTS}
+        self._pending = 0
+        self._host = socket.gethostname()
+        self._connection = self.connect(self.file_path, read_only=False)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.execute('BEGIN IMMEDIATE')
+        self._create_schema()
+        self._started_at = _utc_now()
+        self._snapshot = self._connection.execute(
+            'INSERT INTO snapshots (host, started_at) VALUES (?, ?)', (self._host, self._started_at)
+        ).lastrowid
+        # the ids of installations and plugins are handed out here, so the rows referring to them can be batched too
+        self._ids = {table: self._connection.execute(f'SELECT COALESCE(MAX(id), 0) FROM {table}').fetchone()[0]
+                     for table in ('installations', 'plugins')}
+
+    def write_installation(self, installation, host=None, started_at=None):
+        """Adds the rows of a single installation to the batch, which is inserted once it is full
+
+        :type installation: dict
+        :param host: the host the installation was found on, if not the one of the snapshot
+        :type host: str
+        :param started_at: start of the scan the installation is from, if not the one of the snapshot
+        :type started_at: str
+        """
+        self._ids['installations'] += 1
+        installation_id = self._ids['installations']
+        ilias_ini = installation.get('ilias.ini.php') or {}
+        server = ilias_ini.get('server') or {}
+        git = installation.get('git') or {}
+        self._rows['installations'].append((
+            installation_id, self._snapshot, host or self._host, installation['ilias_path'], server.get('http_path'),
+            server.get('absolute_path'), (ilias_ini.get('clients') or {}).get('default'), git.get('head'),
+            git.get('branch'), git.get('dirty'), installation.get('error'), json.dumps(installation, default=to_json),
+            started_at or self._started_at
+        ))
+        for client in installation.get('client.ini.php') or ():
+            db = client.get('db') or {}
+            port = str(db.get('port') or '')
+            self._rows['clients'].append((
+                installation_id, (client.get('client') or {}).get('name'), client.get('source_file'), db.get('type'),
+                db.get('host'), int(port) if port.isdigit() else None, db.get('name'), db.get('user'),
+                (client.get('db_info') or {}).get('db_version'), (client.get('language') or {}).get('default'),
+                (client.get('layout') or {}).get('skin'), (client.get('layout') or {}).get('style')
+            ))
+        for plugin in installation.get('plugin.php') or ():
+            self._ids['plugins'] += 1
+            git = plugin.get('git') or {}
+            self._rows['plugins'].append((
+                self._ids['plugins'], installation_id, plugin.get('id'), plugin.get('version'),
+                version_key(plugin.get('version')), plugin.get('ilias_min_version'), plugin.get('ilias_max_version'),
+                plugin.get('responsible'), plugin.get('responsible_mail'), plugin.get('source_file'), git.get('head'),
+                git.get('branch'), git.get('dirty')
+            ))
+            self._rows['remotes'].extend(
+                (self._ids['plugins'], name, url) for name, url in (plugin.get('remotes') or {}).items()
+            )
+        self._rows['submodules'].extend(
+            (installation_id, name, submodule.get('path'), submodule.get('url'), submodule.get('branch'))
+            for name, submodule in (installation.get('submodules') or {}).items()
+        )
+        self._counts['installations'] += 1
+        self._counts['errors'] += 'error' in installation
+        self._pending += 1
+        if self._pending >= self._batch_size:
+            self._insert_rows()
+
+    def finish(self, stats=None):
+        """Inserts the last batch, completes the snapshot and commits the run
+
+        :param stats: further counters of the run, kept as JSON in snapshots.stats, see StreamingJSONOutput.finish
+        :type stats: dict
+        :return: path of the database
+        :rtype: Path
+        """
+        self._insert_rows()
+        self._summary = dict(type='summary', snapshot=self._snapshot, **self._counts, **(stats or {}),
+                             finished_at=_utc_now(), seconds=round(time.perf_counter() - self._started, 3))
+        self._connection.execute(
+            'UPDATE snapshots SET finished_at = ?, installations = ?, errors = ?, seconds = ?, stats = ? WHERE id = ?',
+            (self._summary['finished_at'], self._counts['installations'], self._counts['errors'],
+             self._summary['seconds'], json.dumps(stats or {}, default=to_json), self._snapshot)
+        )
+        self._connection.execute('COMMIT')
+        self._close()
+        return self.file_path
+
+    def _create_schema(self):
+        if self._connection.execute('PRAGMA user_version').fetchone()[0] == self.SCHEMA_VERSION:
+            return
+        if self._connection.execute("SELECT COUNT(*) FROM sqlite_master WHERE name = 'snapshots'").fetchone()[0]:
+            raise ValueError(f"{self.file_path} was written by another version of ilinfo")
+        # executescript would commit the transaction of the run
+        for statement in _SQLITE_SCHEMA.split(';'):
+            if statement.strip():
+                self._connection.execute(statement)
+        self._connection.execute(f'PRAGMA user_version = {self.SCHEMA_VERSION}')
+
+    def _insert_rows(self):
+        for table, sql in _SQLITE_INSERTS.items():
+            if self._rows[table]:
+                self._connection.executemany(sql, self._rows[table])
+                self._rows[table] = []
+        self._pending = 0
+
+    def _close(self):
+        if self._connection is not None:
+            # a run that did not finish is rolled back as a whole
+            if self._connection.in_transaction:
+                self._connection.execute('ROLLBACK')
+            self._connection.close()
+            self._connection = None
+
+
+_SQLITE_SCHEMA = """
+CREATE TABLE snapshots (
+    id INTEGER PRIMARY KEY, host TEXT NOT NULL, started_at TEXT NOT NULL, finished_at TEXT, installations INTEGER,
+    errors INTEGER, seconds REAL, stats TEXT
+);
+CREATE TABLE installations (
+    id INTEGER PRIMARY KEY, snapshot INTEGER NOT NULL REFERENCES snapshots (id), host TEXT NOT NULL,
+    ilias_path TEXT NOT NULL, http_path TEXT, absolute_path TEXT, default_client TEXT, git_head TEXT,
+    git_branch TEXT, git_dirty INTEGER, error TEXT, data TEXT NOT NULL, started_at TEXT
+);
+CREATE TABLE clients (
+    id INTEGER PRIMARY KEY, installation INTEGER NOT NULL REFERENCES installations (id), name TEXT,
+    source_file TEXT, db_type TEXT, db_host TEXT, db_port INTEGER, db_name TEXT, db_user TEXT, db_version INTEGER,
+    language TEXT, skin TEXT, style TEXT
+);
+CREATE TABLE plugins (
+    id INTEGER PRIMARY KEY, installation INTEGER NOT NULL REFERENCES installations (id), plugin_id TEXT,
+    version TEXT, version_key TEXT, ilias_min_version TEXT, ilias_max_version TEXT, responsible TEXT,
+    responsible_mail TEXT, source_file TEXT, git_head TEXT, git_branch TEXT, git_dirty INTEGER
+);
+CREATE TABLE submodules (
+    id INTEGER PRIMARY KEY, installation INTEGER NOT NULL REFERENCES installations (id), name TEXT, path TEXT,
+    url TEXT, branch TEXT
+);
+CREATE TABLE remotes (
+    id INTEGER PRIMARY KEY, plugin INTEGER NOT NULL REFERENCES plugins (id), name TEXT, url TEXT
+);
+CREATE INDEX snapshots_host ON snapshots (host, id);
+CREATE INDEX installations_snapshot ON installations (snapshot, ilias_path);
+CREATE INDEX installations_path ON installations (ilias_path);
+CREATE INDEX clients_installation ON clients (installation);
+CREATE INDEX clients_db ON clients (db_host, db_name);
+CREATE INDEX plugins_installation ON plugins (installation);
+CREATE INDEX plugins_version ON plugins (plugin_id, version_key);
+CREATE INDEX submodules_installation ON submodules (installation);
+CREATE INDEX submodules_url ON submodules (url);
+CREATE INDEX remotes_plugin ON remotes (plugin);
+CREATE INDEX remotes_url ON remotes (url);
+CREATE VIEW current_snapshots AS
+    SELECT * FROM snapshots WHERE id IN (SELECT MAX(id) FROM snapshots GROUP BY host);
+CREATE VIEW current_installations AS
+    SELECT * FROM installations WHERE snapshot IN (SELECT id FROM current_snapshots);
+CREATE VIEW current_clients AS
+    SELECT * FROM clients WHERE installation IN (SELECT id FROM current_installations);
+CREATE VIEW current_plugins AS
+    SELECT * FROM plugins WHERE installation IN (SELECT id FROM current_installations);
+CREATE VIEW current_submodules AS
+    SELECT * FROM submodules WHERE installation IN (SELECT id FROM current_installations);
+CREATE VIEW current_remotes AS
+    SELECT * FROM remotes WHERE plugin IN (SELECT id FROM current_plugins)
+"""
+
+_SQLITE_INSERTS = {
+    'installations': 'INSERT INTO installations (id, snapshot, host, ilias_path, http_path, absolute_path, '
+                     'default_client, git_head, git_branch, git_dirty, error, data, started_at) '
+                     'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+    'clients': 'INSERT INTO clients (installation, name, source_file, db_type, db_host, db_port, db_name, db_user, '
+               'db_version, language, skin, style) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+    'plugins': 'INSERT INTO plugins (id, installation, plugin_id, version, version_key, ilias_min_version, '
+               'ilias_max_version, responsible, responsible_mail, source_file, git_head, git_branch, git_dirty) '
+               'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+    'submodules': 'INSERT INTO submodules (installation, name, path, url, branch) VALUES (?, ?, ?, ?, ?)',
+    'remotes': 'INSERT INTO remotes (plugin, name, url) VALUES (?, ?, ?)',
+}
+
+
+def version_key(version):
+    """Returns a string that sorts like the version, numerically, e.g. '2.10.0' after '2.3'
+
+    Each number is padded to 10 digits, anything that is no number is kept as it is.
+
+    :type version: str
+    :rtype: str
+    """
+    if version is None:
+        return None
+    return '.'.join(part.zfill(10) if part.isdigit() else part for part in _VERSION_PARTS.findall(str(version)))
+
+
+_VERSION_PARTS = re.compile(r'\d+|[^\d.\-_]+')
+
+
+def _without_passwords(installation):
+    # copies only what changes, the installation may be a frozen view of the parser's data
+    clients = installation.get('client.ini.php')
+    if not clients:
+        return installation
+    return {**installation, 'client.ini.php': [
+        {**client, 'db': {key: value for key, value in client['db'].items() if key != 'pass'}}
+        if isinstance(client.get('db'), dict) else client for client in clients
+    ]}
+
+
+def _utc_now():
+    return datetime.now(timezone.utc).isoformat(timespec='seconds')
@@ -0,0 +1,177 @@
+# Created by Andre Machon 18/10/2026
+import sys
+from collections.abc import Mapping
+
+from ilinfo.utils import FrozenList
+
+__all__ = ['Record', 'Installation', 'Client', 'Plugin', 'Submodule', 'to_json']
+
+
+class _Shape:
+    """The keys of a record and their positions, shared by all records with the same keys in the same order"""
+
+    __slots__ = ('keys', 'index')
+
+    def __init__(self, keys):
+        self.keys = keys
+        self.index = {key: i for i, key in enumerate(keys)}
+
+
+# keys tuple -> _Shape, every plugin.php of a fleet has one of a handful of shapes
+_SHAPES = {}
+
+
+def _shape(keys):
+    shape = _SHAPES.get(keys)
+    if shape is None:
+        keys = tuple(sys.intern(key) if type(key) is str else key for key in keys)
+        shape = _SHAPES.setdefault(keys, _Shape(keys))
+    return shape
+
+
+def _compact(value):
+    if type(value) is str:
+        # paths, versions and remote URLs repeat across plugins and installations
+        return sys.intern(value)
+    if isinstance(value, Record):
+        return value
+    if isinstance(value, dict):
+        return Record.from_dict(value)
+    if isinstance(value, list):
+        return FrozenList(_compact(v) for v in value)
+    return value
+
+
+def _field(key, doc=None):
+    return property(lambda self: self.get(key), doc=doc or f"The value of '{key}', None if it is missing")
+
+
+class Record(Mapping):
+    """Compact read-only mapping, used for parse results instead of dicts
+
+    The keys live in a shape shared by all records with the same keys, each record only holds a tuple of values.
+    Records compare equal to dicts with the same items and keep the order of the dict they were made from, so
+    serializing them with to_json gives the same JSON as the dict would.
+    """
+
+    __slots__ = ('_shape', '_values')
+
+    def __init__(self, shape, values):
+        self._shape = shape
+        self._values = values
+
+    @classmethod
+    def from_dict(cls, d):
+        """Makes a record of d, nested dicts become records and lists become FrozenLists, strings are interned
+
+        :type d: dict
+        """
+        if isinstance(d, cls):
+            return d
+        return cls(_shape(tuple(d)), tuple(cls._compact_value(key, value) for key, value in d.items()))
+
+    @classmethod
+    def _compact_value(cls, key, value):
+        return _compact(value)
+
+    def __getitem__(self, key):
+        return self._values[self._shape.index[key]]
+
+    def __contains__(self, key):
+        return key in self._shape.index
+
+    def __iter__(self):
+        return iter(self._shape.keys)
+
+    def __len__(self):
+        return len(self._values)
+
+    def __eq__(self, other):
+        if isinstance(other, Record) and self._shape is other._shape:
+            return self._values == other._values
+        return super().__eq__(other)
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"{type(self).__name__}({dict(zip(self._shape.keys, self._values))!r})"
+
+    def __reduce__(self):
+        return _from_items, (type(self), self._shape.keys, self._values)
+
+    def to_dict(self):
+        """Returns the record as a dict, nested records stay records"""
+        return dict(zip(self._shape.keys, self._values))
+
+
+def _from_items(cls, keys, values):
+    return cls(_shape(keys), values)
+
+
+class Submodule(Record):
+    """A submodule of an installation's .gitmodules"""
+
+    __slots__ = ()
+
+    path = _field('path')
+    url = _field('url')
+    branch = _field('branch')
+
+
+class Client(Record):
+    """A parsed client.ini.php, the ini sections are records"""
+
+    __slots__ = ()
+
+    source_file = _field('source_file')
+    db = _field('db')
+
+    @property
+    def name(self):
+        return (self.get('client') or {}).get('name')
+
+
+class Plugin(Record):
+    """A parsed plugin.php with its remotes, plus its git state if that was collected"""
+
+    __slots__ = ()
+
+    source_file = _field('source_file')
+    id = _field('id')
+    version = _field('version')
+    ilias_min_version = _field('ilias_min_version')
+    ilias_max_version = _field('ilias_max_version')
+    responsible = _field('responsible')
+    remotes = _field('remotes')
+    git = _field('git')
+
+
+class Installation(Record):
+    """An ILIAS installation with its parsed files, clients, plugins and submodules"""
+
+    __slots__ = ()
+
+    ilias_path = _field('ilias_path')
+    ilias_ini = _field('ilias.ini.php')
+    clients = _field('client.ini.php')
+    plugins = _field('plugin.php')
+    submodules = _field('submodules')
+    git = _field('git')
+    error = _field('error')
+
+    @classmethod
+    def _compact_value(cls, key, value):
+        if key == 'client.ini.php' and isinstance(value, list):
+            return FrozenList(Client.from_dict(d) for d in value)
+        if key == 'plugin.php' and isinstance(value, list):
+            return FrozenList(Plugin.from_dict(d) for d in value)
+        if key == 'submodules' and isinstance(value, dict):
+            return Record(_shape(tuple(value)), tuple(Submodule.from_dict(d) for d in value.values()))
+        return _compact(value)
+
+
+def to_json(obj):
+    """default for json.dump and json.dumps, serializes records like the dicts they were made from"""
+    if isinstance(obj, Record):
+        return obj.to_dict()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
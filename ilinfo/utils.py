@@ -1,26 +1,32 @@
 # Created by Andre Machon 07/02/2021
-import mysql.connector as db_con
-import configparser
-from mysql.connector import errorcode
+import re
+from collections.abc import Mapping
 from os import path as osp
-try:
-    from os import scandir, walk
-except ImportError:
-    from scandir import scandir, walk
 
+from ilinfo.discovery import TreeWalker
 
-def mysql_safe_connect(con_dict):
+
+def mysql_safe_connect(con_dict, connect_timeout=5.0, query_timeout=10.0):
+    """Connects to the database of con_dict with deadlines for connecting and for every query, see ilinfo.db.connect
+
+    :param con_dict: connection dict, see read_client_db_login
+    :type con_dict: dict
+    :param connect_timeout: seconds connecting may take
+    :type connect_timeout: float
+    :param query_timeout: seconds a single query may take
+    :type query_timeout: float
+    :return: the connection, None if connecting failed, and the connectivity like in the results of
+        ilinfo.db.DBInspector, {'reachable': True, 'latency': 0.0004} or
+        {'reachable': False, 'error_class': 'connection_refused', 'error': '...'}
+    :rtype: tuple
+    """
+    # ilinfo.db loads the MySQL driver, which takes longer to import than a small scan takes
+    from ilinfo.db import DBError, connect
     try:
-        con = db_con.connect(**con_dict)
-        return con
-    except db_con.Error as err:
-        if err.errno == errorcode.ER_ACCESS_DENIED_ERROR:
-            print("Something is wrong with your user name or password", err)
-            # print("Connection Dict", con_dict)
-        elif err.errno == errorcode.ER_BAD_DB_ERROR:
-            print("Database does not exist")
-        else:
-            print(err)
+        connection, latency = connect(con_dict, connect_timeout, query_timeout)
+    except DBError as err:
+        return None, err.connectivity
+    return connection, {'reachable': True, 'latency': latency}
 
 
 def read_client_db_login(file_name):
@@ -40,29 +46,31 @@ def read_client_db_login(file_name):
     return con_dict
 
 
-def connect_with_client_ini(ini_file):
-    return mysql_safe_connect(read_client_db_login(ini_file))
+def connect_with_client_ini(ini_file, connect_timeout=5.0, query_timeout=10.0):
+    """Connects to the database of a client.ini.php, see mysql_safe_connect
+
+    :rtype: tuple
+    """
+    return mysql_safe_connect(read_client_db_login(ini_file), connect_timeout, query_timeout)
 
 
-def find_files_recursive(startpath, filename, excluded_dirs=None):
+def find_files_recursive(startpath, filename, excluded_dirs=None, exclude_mode='path'):
     """Recursively finds all files that match the given filename and yields the full path
 
+    Excluded directories are not descended into.
+
     :param startpath: Path to start recursive search from
     :type startpath: str
     :param filename: Filename to search for
     :type filename: str
-    :param excluded_dirs: strings that will lead to path being ignored, if path contains one of them
+    :param excluded_dirs: exclusion patterns, see ilinfo.discovery.ExclusionMatcher
     :type excluded_dirs: list
+    :param exclude_mode: 'path' or 'substring', the latter ignores every path that contains one of excluded_dirs
+    :type exclude_mode: str
     :rtype: object: generator, that iterates over found file paths (str)
     """
-    if excluded_dirs is None:
-        excluded_dirs = []
-    for current_path, dirnames, filenames in walk(startpath):
-        # skip processing files in dirs, that have exclude_dir values in their path
-        if True in map(lambda excluded: excluded in current_path, excluded_dirs):
-            continue
-        if filename in filenames:
-            yield osp.join(current_path, filename)
+    for current_path, name in TreeWalker((filename,), excluded_dirs, exclude_mode).walk(startpath):
+        yield osp.join(current_path, name)
 
 
 def parse_ini_to_dict(file_path, parse_config=None):
@@ -75,13 +83,12 @@ def parse_ini_to_dict(file_path, parse_config=None):
     :return: dict
     :rtype: dict
     """
+    return IniReader(parse_config).read(file_path)
 
-    if not file_path:
-        return
-    if parse_config is not None:
-        if not isinstance(parse_config, dict):
-            raise TypeError("parse_config needs to be a dictionary")
 
+def _parse_ini_configparser(file_path, parse_config=None):
+    # the full ConfigParser, IniReader falls back to it for files it does not read the same way
+    import configparser
     parser = configparser.ConfigParser()
     parser.read(file_path)
     data = {"source_file": file_path}
@@ -100,3 +107,244 @@ def parse_ini_to_dict(file_path, parse_config=None):
 
     return data
 
+
+# the patterns and the default section of configparser.ConfigParser, which is only imported for the fallback
+_INI_DEFAULT_SECTION = 'DEFAULT'
+_INI_SECTION = re.compile(r"\[(?P<header>.+)\]")
+_INI_OPTION = re.compile(r"(?P<option>.*?)\s*[=:]\s*(?P<value>.*)$")
+
+
+class _IniFallback(Exception):
+    """The file uses something IniReader leaves to configparser"""
+
+
+class IniReader:
+    """Reads the requested sections and options of ini files, with the same results as a ConfigParser
+
+    Only lines of requested sections are tokenized, after the last requested option was found only section headers
+    are looked at. Files using continuation lines, interpolation (%), a DEFAULT section, duplicate sections or
+    options, or lines configparser can't parse, are handed to configparser, so they come out exactly as before,
+    errors included. Errors in sections that are not requested go unnoticed.
+    """
+
+    def __init__(self, parse_config=None):
+        """
+        :param parse_config: {'section': ['option', ...]}, sections and options to include in the result, all of
+            them if None
+        :type parse_config: dict
+        """
+        if parse_config is not None:
+            if not isinstance(parse_config, dict):
+                raise TypeError("parse_config needs to be a dictionary")
+        self._parse_config = parse_config
+        # an empty parse_config reads everything, like parse_ini_to_dict always did
+        self._wanted = {section: set(options) for section, options in parse_config.items()} if parse_config else None
+        self._wanted_count = sum(len(options) for options in self._wanted.values()) if self._wanted else 0
+
+    def read(self, file_path):
+        """Reads a single file
+
+        :param file_path: path to ini file
+        :type file_path: str
+        :return: {'source_file': file_path, 'section': {'option': 'value'}}, None if file_path is empty
+        :rtype: dict
+        """
+        if not file_path:
+            return
+        try:
+            with open(file_path) as f:
+                text = f.read()
+        except OSError:
+            # like ConfigParser.read, files that can't be opened give no sections
+            return {"source_file": file_path}
+
+        try:
+            sections = self._scan(text)
+        except _IniFallback:
+            return _parse_ini_configparser(file_path, self._parse_config)
+        data = {"source_file": file_path}
+        data.update(sections)
+        return data
+
+    def read_many(self, file_paths):
+        """Reads several files with the same parse_config
+
+        :param file_paths: paths to ini files
+        :type file_paths: collections.abc.Iterable
+        :return: the result of read for each file, in the order of file_paths
+        :rtype: list
+        """
+        return [self.read(file_path) for file_path in file_paths]
+
+    def _scan(self, text):
+        wanted = self._wanted
+        missing = self._wanted_count
+        sections = {}
+        section, options, seen = None, None, None
+        skip, done = False, False
+
+        # text mode already turned \r\n and \r into \n, splitlines would also split at characters configparser keeps
+        for line in text.split('\n'):
+            stripped = line.strip()
+            if not stripped or stripped[0] in '#;':
+                continue
+            if line[0].isspace():
+                # a continuation line, or one that configparser only takes as a key depending on the one before
+                raise _IniFallback
+
+            if stripped[0] == '[':
+                match = _INI_SECTION.match(stripped)
+                if match is None:
+                    raise _IniFallback
+                name = match.group('header')
+                if name in sections or name == _INI_DEFAULT_SECTION:
+                    raise _IniFallback
+                section = sections[name] = {}
+                options = wanted.get(name) if wanted is not None else None
+                skip = wanted is not None and not options
+                seen = set()
+                continue
+            if done or skip:
+                continue
+
+            if section is None:
+                raise _IniFallback
+            match = _INI_OPTION.match(stripped)
+            if match is None:
+                raise _IniFallback
+            option = match.group('option').rstrip().lower()
+            if not option or option in seen:
+                raise _IniFallback
+            seen.add(option)
+            if options is not None and option not in options:
+                continue
+
+            value = match.group('value').strip()
+            if '%' in value:
+                raise _IniFallback
+            section[option] = value.strip('"')
+            if options is not None:
+                missing -= 1
+                done = missing == 0
+        return sections
+
+
+# comments come first in the alternation, so assignments inside of them are consumed and skipped
+_PHP_ASSIGNMENT = re.compile(
+    rb"""
+    (?P<comment>//[^\n]*|\#[^\n]*|/\*.*?(?:\*/|\Z))
+    | \$(?P<var>\w+)\s*=\s*(?P<var_value>'(?:[^'\\]|\\.)*'|"(?:[^"\\]|\\.)*")\s*;
+    | \bdefine\s*\(\s*(?P<const>'[^']*'|"[^"]*")\s*,\s*(?P<const_value>'(?:[^'\\]|\\.)*'|"(?:[^"\\]|\\.)*")\s*\)
+    """,
+    re.VERBOSE | re.DOTALL
+)
+_PHP_SINGLE_QUOTE_ESCAPE = re.compile(rb"\\([\\'])")
+_PHP_DOUBLE_QUOTE_ESCAPE = re.compile(rb'\\([\\"$nrt])')
+_PHP_ESCAPES = {b'n': b'\n', b'r': b'\r', b't': b'\t'}
+
+
+def parse_php_assignments(data, encoding='utf-8', until=None):
+    """Extracts string assignments ($var = '...';) and constants (define('NAME', '...')) from php source in one pass
+
+    Assignments may span several lines, commented out ones are skipped. Bytes that are invalid in encoding are
+    replaced instead of raising.
+
+    :param data: php source, anything supporting the buffer protocol like bytes or an mmap
+    :type data: bytes
+    :param encoding: encoding of the source
+    :type encoding: str
+    :param until: stop scanning once all of these names were found
+    :type until: collections.abc.Iterable
+    :return: {'name': 'value'}, later assignments to the same name win
+    :rtype: dict
+    """
+    found = {}
+    missing = set(until) if until else None
+    for match in _PHP_ASSIGNMENT.finditer(data):
+        if match.lastgroup == 'comment':
+            continue
+        if match.group('var') is not None:
+            name, value = match.group('var'), match.group('var_value')
+        else:
+            name, value = match.group('const')[1:-1], match.group('const_value')
+        name = name.decode(encoding, 'replace')
+        found[name] = _php_string(value).decode(encoding, 'replace')
+        if missing is not None:
+            missing.discard(name)
+            if not missing:
+                break
+    return found
+
+
+def _php_string(literal):
+    if literal[:1] == b"'":
+        return _PHP_SINGLE_QUOTE_ESCAPE.sub(rb'\1', literal[1:-1])
+    return _PHP_DOUBLE_QUOTE_ESCAPE.sub(lambda m: _PHP_ESCAPES.get(m.group(1), m.group(1)), literal[1:-1])
+
+
+class FrozenDict(dict):
+    """Read-only dict, the data accessors return these instead of deep copies
+
+    Equal to and usable like a plain dict, json.dump included, but every method that would change it raises a
+    TypeError. Copying one returns the same object, thaw returns a mutable copy.
+    """
+
+    __slots__ = ()
+
+    def _read_only(self, *args, **kwargs):
+        raise TypeError(f"{type(self).__name__} is read-only, use snapshot() for a mutable copy")
+
+    __setitem__ = __delitem__ = __ior__ = clear = pop = popitem = setdefault = update = _read_only
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __reduce__(self):
+        return type(self), (dict(self),)
+
+
+class FrozenList(list):
+    """Read-only list, see FrozenDict"""
+
+    __slots__ = ()
+
+    def _read_only(self, *args, **kwargs):
+        raise TypeError(f"{type(self).__name__} is read-only, use snapshot() for a mutable copy")
+
+    __setitem__ = __delitem__ = __iadd__ = __imul__ = _read_only
+    append = extend = insert = pop = remove = clear = sort = reverse = _read_only
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __reduce__(self):
+        return type(self), (list(self),)
+
+
+def freeze(obj):
+    """Returns obj with all dicts and lists in it turned into FrozenDict and FrozenList
+
+    Parts that are frozen already are reused instead of copied.
+    """
+    if isinstance(obj, (FrozenDict, FrozenList)):
+        return obj
+    if isinstance(obj, dict):
+        return FrozenDict((key, freeze(value)) for key, value in obj.items())
+    if isinstance(obj, list):
+        return FrozenList(freeze(value) for value in obj)
+    return obj
+
+
+def thaw(obj):
+    """Returns a mutable deep copy of obj, the counterpart of freeze, read-only mappings like records become dicts"""
+    if isinstance(obj, Mapping):
+        return {key: thaw(value) for key, value in obj.items()}
+    if isinstance(obj, list):
+        return [thaw(value) for value in obj]
+    return obj
@@ -0,0 +1,417 @@
+# Created by Andre Machon 18/10/2026
+import ctypes
+import ctypes.util
+import errno
+import logging
+import os
+import select
+import struct
+import time
+from glob import glob, escape
+from os import path as osp
+
+__all__ = ['InventoryWatcher', 'InotifyBackend', 'PollingBackend']
+
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+
+WATCH_MASK = (IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF
+              | IN_ONLYDIR)
+
+_EVENT_HEADER = struct.Struct('iIII')
+
+
+class InotifyBackend:
+    """Minimal inotify binding through ctypes, only available on Linux"""
+
+    def __init__(self):
+        libc_name = ctypes.util.find_library('c') or 'libc.so.6'
+        self._libc = ctypes.CDLL(libc_name, use_errno=True)
+        self._fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+
+    __slots__ = ('_libc', '_fd')
+
+    def add_watch(self, dir_path):
+        """Watches dir_path for created, deleted, moved and written entries
+
+        :return: watch descriptor
+        :rtype: int
+        :raises OSError: if the directory can't be watched, ENOSPC if the kernel limit of watches is reached
+        """
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(dir_path), WATCH_MASK)
+        if wd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err), dir_path)
+        return wd
+
+    def remove_watch(self, wd):
+        self._libc.inotify_rm_watch(self._fd, wd)
+
+    def read_events(self, timeout):
+        """Waits up to timeout seconds for events
+
+        :return: list of (watch descriptor, mask, name) tuples
+        :rtype: list
+        """
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        if not readable:
+            return []
+
+        events = []
+        try:
+            buffer = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return events
+        offset = 0
+        while offset < len(buffer):
+            wd, mask, _cookie, length = _EVENT_HEADER.unpack_from(buffer, offset)
+            offset += _EVENT_HEADER.size
+            name = os.fsdecode(buffer[offset:offset + length].rstrip(b'\0'))
+            offset += length
+            events.append((wd, mask, name))
+        return events
+
+    def close(self):
+        os.close(self._fd)
+
+
+class PollingBackend:
+    """Stands in for InotifyBackend where inotify is not available, by comparing directory listings"""
+
+    def __init__(self, interval=1.0):
+        self._interval = interval
+        self._watches = {}
+        self._next_wd = 1
+
+    __slots__ = ('_interval', '_watches', '_next_wd')
+
+    def add_watch(self, dir_path):
+        wd = self._next_wd
+        self._next_wd += 1
+        self._watches[wd] = (dir_path, self._snapshot(dir_path))
+        return wd
+
+    def remove_watch(self, wd):
+        self._watches.pop(wd, None)
+
+    def read_events(self, timeout):
+        time.sleep(min(timeout, self._interval))
+        events = []
+        for wd, (dir_path, before) in list(self._watches.items()):
+            after = self._snapshot(dir_path)
+            self._watches[wd] = (dir_path, after)
+            for name in before.keys() - after.keys():
+                events.append((wd, IN_DELETE | (IN_ISDIR if before[name][0] else 0), name))
+            for name, (is_dir, mtime_ns) in after.items():
+                if name not in before:
+                    events.append((wd, IN_CREATE | (IN_ISDIR if is_dir else 0), name))
+                elif not is_dir and before[name][1] != mtime_ns:
+                    events.append((wd, IN_CLOSE_WRITE, name))
+        return events
+
+    def close(self):
+        self._watches.clear()
+
+    @staticmethod
+    def _snapshot(dir_path):
+        snapshot = {}
+        try:
+            for entry in os.scandir(dir_path):
+                try:
+                    snapshot[entry.name] = (entry.is_dir(), entry.stat().st_mtime_ns)
+                except OSError:
+                    continue
+        except OSError:
+            pass
+        return snapshot
+
+
+class InventoryWatcher:
+    """Keeps the output of an analysis up to date, by watching only the directories that matter for it
+
+    After an initial discovery and parse, watches are placed on
+        - the scan root and the directories containing installations, for installations created or moved in later
+        - installation roots, for ilias.ini.php and .gitmodules
+        - the client data dir and every client dir in it, for client.ini.php
+        - plugin slot directories (Customizing/global/plugins/*/*/*), for plugins that are added or removed
+        - plugin directories, for plugin.php
+
+    Plugin directories are the only ones that grow with the number of plugins. Once max_watches is reached their
+    plugin.php files are polled with stat() instead. Watches of directories that are deleted or moved away are removed
+    along with their entries. Events are collected until nothing happened for debounce seconds,
+    so a git pull touching hundreds of files results in a single update of the output.
+    """
+
+    ROOT, CLIENTS, CLIENT, SLOT, PLUGIN, SCAN = range(6)
+    ROOT_FILES = ('ilias.ini.php', '.gitmodules')
+
+    def __init__(self, pathfinder, file_parser, output_processor, debounce=2.0, max_watches=8192, backend=None):
+        """
+        :param pathfinder: used for the initial discovery
+        :type pathfinder: ilinfo.analyzers.IliasPathFinder
+        :param file_parser: parses the installations and afterwards every changed file
+        :type file_parser: ilinfo.analyzers.IliasFileParser
+        :param output_processor: writes the output whenever something changed
+        :type output_processor: ilinfo.output_processors.OutputProcessor
+        :param debounce: seconds without further events, before changes are processed
+        :type debounce: float
+        :param max_watches: upper limit of watched directories
+        :type max_watches: int
+        :param backend: InotifyBackend or PollingBackend, picked automatically by default
+        """
+        self._pathfinder = pathfinder
+        self._file_parser = file_parser
+        self._output_processor = output_processor
+        self._debounce = debounce
+        self._max_watches = max_watches
+        self._backend = backend or self._default_backend()
+        self._watches = {}
+        self._watched_dirs = {}
+        self._polled = {}
+        self._dirty = set()
+        self._new_dirs = set()
+        self._rediscover = False
+        self._start_path = None
+        self._excluded_folders = None
+        self.output_path = None
+
+    @staticmethod
+    def _default_backend():
+        try:
+            return InotifyBackend()
+        except (OSError, AttributeError):
+            return PollingBackend()
+
+    @property
+    def watch_count(self):
+        return len(self._watches)
+
+    @property
+    def polled_count(self):
+        return len(self._polled)
+
+    def start(self, start_path, excluded_folders=None):
+        """Discovers and parses start_path, writes the output and places the watches
+
+        :return: path of the written output
+        """
+        self._start_path = start_path
+        self._excluded_folders = excluded_folders
+        self._pathfinder.discover(start_path, excluded_folders)
+        ilias_paths = self._pathfinder.ilias_paths
+        self._file_parser.parse_from_pathfinder(self._pathfinder)
+        self.output_path = self._output_processor.output_data(self._file_parser)
+
+        # the few scan directories go first, so reaching max_watches does not hide new installations
+        self._add_watch(str(start_path), self.SCAN, None)
+        for ilias_path in sorted(ilias_paths):
+            self._watch_scan_dir(osp.dirname(ilias_path))
+        for ilias_path, ilias_dict in ilias_paths.items():
+            self._watch_installation(ilias_path, ilias_dict)
+        return self.output_path
+
+    def run(self, stop=None):
+        """Processes events until stop() returns True, or forever
+
+        :param stop: callable, checked after every round of events
+        """
+        while not (stop and stop()):
+            self.poll()
+
+    def poll(self, timeout=None):
+        """Waits for events, processes them once they settled and rewrites the output if anything changed
+
+        :param timeout: seconds to wait for the first event, defaults to debounce
+        :return: True if the output was rewritten
+        :rtype: bool
+        """
+        timeout = self._debounce if timeout is None else timeout
+        events = self._backend.read_events(timeout)
+        self._check_polled()
+        if not events and not self._dirty and not self._rediscover:
+            return False
+
+        # coalesce: keep collecting until the file system has been quiet for self._debounce seconds
+        deadline = time.monotonic() + self._debounce * 10
+        while events:
+            for event in events:
+                self._handle_event(*event)
+            if time.monotonic() > deadline:
+                break
+            events = self._backend.read_events(self._debounce)
+        return self._apply_changes()
+
+    def close(self):
+        self._backend.close()
+
+    def _apply_changes(self):
+        if self._rediscover:
+            self._rediscover = False
+            self._dirty.clear()
+            self._new_dirs.clear()
+            self._reset_watches()
+            self._file_parser.clear()
+            self.start(self._start_path, self._excluded_folders)
+            return True
+
+        new_dirs, self._new_dirs = self._new_dirs, set()
+        found = False
+        for dir_path in sorted(new_dirs):
+            try:
+                found = self._discover(dir_path) or found
+            except Exception as err:
+                logging.getLogger('ilinfo').warning("Could not discover %s: %s", dir_path, err)
+        if not self._dirty and not found:
+            return False
+
+        for ilias_path, file_path in sorted(self._dirty):
+            try:
+                self._file_parser.update_file(ilias_path, file_path)
+            except Exception as err:
+                # a single broken file must not end the watch
+                logging.getLogger('ilinfo').warning("Could not parse %s: %s", file_path, err)
+        self._dirty.clear()
+        self.output_path = self._output_processor.output_data(self._file_parser)
+        return True
+
+    def _discover(self, dir_path):
+        # a directory created or moved into a scan directory, returns whether it held new installations
+        if not osp.isdir(dir_path):
+            return False
+        known = self._file_parser.data
+        new_paths = [p for p in self._pathfinder.discover(dir_path, self._excluded_folders) if p not in known]
+        if not new_paths:
+            # an installation that is still being copied or cloned, its ilias.php shows up later
+            self._watch_scan_dir(dir_path)
+            return False
+
+        ilias_paths = self._pathfinder.ilias_paths
+        for ilias_path in new_paths:
+            self._file_parser.add_installation(ilias_path, ilias_paths[ilias_path])
+            self._watch_scan_dir(osp.dirname(ilias_path))
+            self._watch_installation(ilias_path, ilias_paths[ilias_path])
+        return True
+
+    def _watch_scan_dir(self, dir_path):
+        start_path = osp.abspath(self._start_path)
+        if osp.commonpath([osp.abspath(dir_path), start_path]) == start_path:
+            self._add_watch(dir_path, self.SCAN, None)
+
+    def _watch_installation(self, ilias_path, ilias_dict):
+        files = ilias_dict.get('files', {})
+        client_dirs = {osp.dirname(client_ini) for client_ini in files.get('client.ini.php', [])}
+
+        self._add_watch(ilias_path, self.ROOT, ilias_path)
+        for clients_dir in sorted({osp.dirname(d) for d in client_dirs}):
+            self._add_watch(clients_dir, self.CLIENTS, ilias_path)
+        for client_dir in sorted(client_dirs):
+            self._add_watch(client_dir, self.CLIENT, ilias_path)
+        for slot_dir in sorted(glob(osp.join(escape(ilias_path), 'Customizing/global/plugins/*/*/*/'))):
+            self._add_watch(slot_dir.rstrip('/'), self.SLOT, ilias_path)
+        for plugin_php in sorted(ilias_dict.get('plugins', {}).values()):
+            self._watch_plugin(osp.dirname(plugin_php), ilias_path)
+
+    def _watch_plugin(self, plugin_dir, ilias_path):
+        if self._add_watch(plugin_dir, self.PLUGIN, ilias_path) is None:
+            self._polled[osp.join(plugin_dir, 'plugin.php')] = (ilias_path, self._stat_key(plugin_dir, 'plugin.php'))
+
+    def _add_watch(self, dir_path, kind, ilias_path):
+        if dir_path in self._watched_dirs:
+            return self._watched_dirs[dir_path]
+        if len(self._watches) >= self._max_watches:
+            return None
+        try:
+            wd = self._backend.add_watch(dir_path)
+        except OSError as err:
+            if err.errno == errno.ENOSPC:
+                # the kernel limit is lower than max_watches, stick to what we got
+                self._max_watches = len(self._watches)
+            return None
+        self._watches[wd] = (dir_path, kind, ilias_path)
+        self._watched_dirs[dir_path] = wd
+        return wd
+
+    def _remove_watch(self, dir_path):
+        wd = self._watched_dirs.pop(dir_path, None)
+        if wd is not None:
+            del self._watches[wd]
+            self._backend.remove_watch(wd)
+
+    def _reset_watches(self):
+        for wd in list(self._watches):
+            self._backend.remove_watch(wd)
+        self._watches.clear()
+        self._watched_dirs.clear()
+        self._polled.clear()
+
+    def _handle_event(self, wd, mask, name):
+        if mask & IN_Q_OVERFLOW:
+            # events were lost, only a new discovery brings us back in sync
+            self._rediscover = True
+            return
+        if wd not in self._watches:
+            return
+        dir_path, kind, ilias_path = self._watches[wd]
+        if mask & IN_IGNORED:
+            del self._watches[wd]
+            self._watched_dirs.pop(dir_path, None)
+            return
+        if mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+            # the watch would stay on the directory wherever it was moved to
+            self._remove_watch(dir_path)
+            if kind == self.PLUGIN:
+                self._polled.pop(osp.join(dir_path, 'plugin.php'), None)
+                self._dirty.add((ilias_path, osp.join(dir_path, 'plugin.php')))
+            return
+
+        path = osp.join(dir_path, name)
+        is_dir = bool(mask & IN_ISDIR)
+        appeared = bool(mask & (IN_CREATE | IN_MOVED_TO))
+        if is_dir and not appeared:
+            self._remove_watch(path)
+        if kind == self.SCAN:
+            if appeared and (is_dir or name == 'ilias.php'):
+                self._new_dirs.add(path if is_dir else dir_path)
+        elif kind == self.ROOT and name in self.ROOT_FILES:
+            self._dirty.add((ilias_path, path))
+        elif kind == self.CLIENTS and is_dir:
+            if appeared:
+                self._add_watch(path, self.CLIENT, ilias_path)
+            self._dirty.add((ilias_path, osp.join(path, 'client.ini.php')))
+        elif kind == self.CLIENT and name == 'client.ini.php':
+            self._dirty.add((ilias_path, path))
+        elif kind == self.SLOT and is_dir:
+            if appeared:
+                self._watch_plugin(path, ilias_path)
+            else:
+                self._polled.pop(osp.join(path, 'plugin.php'), None)
+            # the plugin.php may have been created before the watch on the new directory was in place
+            self._dirty.add((ilias_path, osp.join(path, 'plugin.php')))
+        elif kind == self.PLUGIN and name == 'plugin.php':
+            self._dirty.add((ilias_path, path))
+
+    def _check_polled(self):
+        for plugin_php, (ilias_path, key) in list(self._polled.items()):
+            new_key = self._stat_key(osp.dirname(plugin_php), 'plugin.php')
+            if new_key != key:
+                self._polled[plugin_php] = (ilias_path, new_key)
+                self._dirty.add((ilias_path, plugin_php))
+
+    @staticmethod
+    def _stat_key(dir_path, name):
+        try:
+            stat = os.stat(osp.join(dir_path, name))
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size, stat.st_ino
@@ -0,0 +1,132 @@
+# Created by Andre Machon 18/10/2026
+"""Framing of the records ilinfo agent sends to ilinfo collect
+
+A stream starts with MAGIC, followed by one frame per record. A frame is the length of its payload as 4 byte big
+endian unsigned integer and the payload, the record as zlib compressed UTF-8 JSON. The records are the ones of the
+NDJSON format, see output_processors.StreamingJSONOutput: a header, one record per installation and a summary.
+"""
+import json
+import struct
+import zlib
+
+from ilinfo.records import to_json
+
+__all__ = ['MAGIC', 'MAX_RECORD_SIZE', 'ProtocolError', 'encode_record', 'decode_record', 'read_records',
+           'read_records_async']
+
+# the trailing byte is the version of the framing
+MAGIC = b'ILINFO\x01'
+# upper limit of a record, compressed and decompressed, so a broken or hostile stream can't exhaust the memory
+MAX_RECORD_SIZE = 64 * 2 ** 20
+
+_LENGTH = struct.Struct('>I')
+
+
+class ProtocolError(Exception):
+    """The stream is not one of ilinfo agent, or it is broken"""
+
+
+def encode_record(record, level=6):
+    """Returns the frame of record
+
+    :type record: dict
+    :param level: zlib compression level
+    :type level: int
+    :rtype: bytes
+    """
+    payload = zlib.compress(json.dumps(record, default=to_json, separators=(',', ':')).encode('utf-8'), level)
+    return _LENGTH.pack(len(payload)) + payload
+
+
+def decode_record(payload, max_size=MAX_RECORD_SIZE):
+    """Returns the record of a frame's payload
+
+    :type payload: bytes
+    :param max_size: bytes the decompressed record may have
+    :type max_size: int
+    :rtype: dict
+    """
+    decompressor = zlib.decompressobj()
+    try:
+        data = decompressor.decompress(payload, max_size)
+    except zlib.error as err:
+        raise ProtocolError(f"broken record: {err}") from err
+    if decompressor.unconsumed_tail:
+        raise ProtocolError(f"record is larger than {max_size} bytes")
+    try:
+        record = json.loads(data)
+    except ValueError as err:
+        raise ProtocolError(f"broken record: {err}") from err
+    if not isinstance(record, dict) or 'type' not in record:
+        raise ProtocolError("record has no type")
+    if record['type'] == 'installation':
+        data = record.get('data')
+        # the collector writes data as the installation, a record without one must not reach it
+        if not isinstance(data, dict) or not isinstance(data.get('ilias_path'), str):
+            raise ProtocolError("installation record has no data with an ilias_path")
+    return record
+
+
+def read_records(f, max_size=MAX_RECORD_SIZE):
+    """Reads the records of a stream one by one
+
+    :param f: binary file object, positioned at the start of the stream
+    :param max_size: bytes a record may have
+    :type max_size: int
+    :return: generator of records
+    :rtype: generator
+    """
+    if f.read(len(MAGIC)) != MAGIC:
+        raise ProtocolError("not a stream of ilinfo agent")
+    while True:
+        head = f.read(_LENGTH.size)
+        if not head:
+            return
+        if len(head) < _LENGTH.size:
+            raise ProtocolError("stream ended within a frame")
+        yield decode_record(_read_exactly(f, _checked_length(head, max_size)), max_size)
+
+
+async def read_records_async(reader, max_size=MAX_RECORD_SIZE):
+    """Like read_records, for an asyncio.StreamReader
+
+    :type reader: asyncio.StreamReader
+    :return: async generator of records
+    """
+    # only ilinfo collect reads asynchronously, ilinfo agent sends with encode_record and does not need asyncio
+    import asyncio
+    try:
+        magic = await reader.readexactly(len(MAGIC))
+    except asyncio.IncompleteReadError as err:
+        magic = err.partial
+    if magic != MAGIC:
+        raise ProtocolError("not a stream of ilinfo agent")
+    while True:
+        try:
+            head = await reader.readexactly(_LENGTH.size)
+        except asyncio.IncompleteReadError as err:
+            if not err.partial:
+                return
+            raise ProtocolError("stream ended within a frame") from err
+        try:
+            payload = await reader.readexactly(_checked_length(head, max_size))
+        except asyncio.IncompleteReadError as err:
+            raise ProtocolError("stream ended within a frame") from err
+        yield decode_record(payload, max_size)
+
+
+def _checked_length(head, max_size):
+    length = _LENGTH.unpack(head)[0]
+    if length > max_size:
+        raise ProtocolError(f"record is larger than {max_size} bytes")
+    return length
+
+
+def _read_exactly(f, size):
+    data = f.read(size)
+    while len(data) < size:
+        chunk = f.read(size - len(data))
+        if not chunk:
+            raise ProtocolError("stream ended within a frame")
+        data += chunk
+    return data
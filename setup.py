@@ -19,7 +19,7 @@ setuptools.setup(
         "License :: OSI Approved :: MIT License",
         "Operating System :: OS Independent",
     ],
-    python_requires='>=3.6',
+    python_requires='>=3.7',
     install_requires=['click', 'scandir', 'mysql-connector-python'],
     extras_require={
         'test': ['coverage', 'pytest', 'pytest-cov'],
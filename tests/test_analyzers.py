@@ -3,7 +3,9 @@ import pytest as pt
 import json
 from pathlib import Path
 from os import path as osp
-from ilinfo import IliasFileParser, IliasPathFinder, GitHelper, Analyzer
+import socket
+from ilinfo import (IliasFileParser, IliasPathFinder, GitHelper, Analyzer, AsyncAnalyzer, JSONOutput,
+                    StreamingJSONOutput)
 
 
 class TestAnalyzer:
@@ -26,6 +28,74 @@ class TestAnalyzer:
         assert Path.is_file(json_file_path)
 
 
+class TestAsyncAnalyzer:
+    def test_analyze_path(self, tmp_path, setup_fake_plugin, setup_git_plugin_repo):
+        setup_fake_plugin('TestPlugin1')
+        il_path = setup_git_plugin_repo.parents[6]
+
+        def analyze(analyzer_class, output_dir):
+            analyzer = analyzer_class(IliasFileParser(git_state=True), output_processor=JSONOutput(
+                output_path=tmp_path / output_dir
+            ))
+            with open(analyzer.analyze_path(il_path)) as f:
+                return json.load(f)
+
+        result = analyze(AsyncAnalyzer, 'async')
+        assert result == analyze(Analyzer, 'sync')
+        plugins = result[str(il_path)]['plugin.php']
+        assert [osp.basename(osp.dirname(d['source_file'])) for d in plugins] == ['TestPlugin1', 'UserTakeOver']
+        assert plugins[0]['git'] is None
+        assert plugins[1]['git']['work_tree'] == str(setup_git_plugin_repo)
+
+    def test_db_probe(self, tmp_path, setup_fake_ilias):
+        il_path = setup_fake_ilias()
+        client_ini = il_path / 'data/example_client/client.ini.php'
+        with socket.socket() as server, socket.socket() as closed:
+            server.bind(('127.0.0.1', 0))
+            server.listen()
+            closed.bind(('127.0.0.1', 0))
+            client_ini.write_text(client_ini.read_text().replace(
+                'port = ""', f'port = "{server.getsockname()[1]}"'
+            ).replace('host = "localhost"', 'host = "127.0.0.1"'))
+            second_client = il_path / 'data/second_client/client.ini.php'
+            second_client.parent.mkdir()
+            second_client.write_text(client_ini.read_text().replace(
+                str(server.getsockname()[1]), str(closed.getsockname()[1])
+            ))
+
+            analyzer = AsyncAnalyzer(output_processor=JSONOutput(output_path=tmp_path / 'out'), db_probe=True)
+            with open(analyzer.analyze_path(il_path)) as f:
+                clients = json.load(f)[str(il_path)]['client.ini.php']
+
+        probes = {osp.basename(osp.dirname(client['source_file'])): client['db_probe'] for client in clients}
+        assert probes['example_client']['reachable'] is True
+        assert probes['second_client']['reachable'] is False
+        assert probes['second_client']['error']
+
+    def test_pending_installations_are_bounded(self, tmp_path, setup_fake_ilias, monkeypatch):
+        for n in range(8):
+            setup_fake_ilias(f'customer_{n}')
+        started, pending = [], []
+        original = AsyncAnalyzer._analyze_installation
+
+        async def analyze_installation(self, *args):
+            started.append(args[-2])
+            return await original(self, *args)
+
+        class Processor(StreamingJSONOutput):
+            def write_installation(self, installation, **envelope):
+                pending.append(len(started) - len(pending))
+                return super().write_installation(installation, **envelope)
+
+        monkeypatch.setattr(AsyncAnalyzer, '_analyze_installation', analyze_installation)
+        analyzer = AsyncAnalyzer(output_processor=Processor(output_path=tmp_path / 'out', fmt='ndjson'),
+                                 io_concurrency=1)
+        analyzer.analyze_path(tmp_path)
+        assert len(started) == 8
+        # the installation being written and at most 2 * io_concurrency analyzed ahead of it
+        assert max(pending) <= 2
+
+
 class TestIliasFileParser:
     def setup(self):
         self.file_parser = IliasFileParser()
@@ -60,12 +130,10 @@ class TestIliasFileParser:
                     'setup': {},
                     'source_file': result.get('ilias.ini.php', {}).get('source_file'),
                     'suse': {}, 'tools': {}},
-                'plugin.php': ['source_file',
-                               'version',
-                               'ilias_min_version',
-                               'ilias_max_version',
-                               'responsible',
-                               'remotes'],
+                'plugin.php': [{'source_file': str(plugin_path / 'plugin.php'), 'id': 'gp_webshopauth',
+                                'version': '1.1.0', 'ilias_min_version': '5.3.0', 'ilias_max_version': '5.4.999',
+                                'responsible': 'Andre Machon', 'responsible_mail': '<machon@qualitus.de>',
+                                'remotes': {}}],
                 'submodules': {
                     'CountryLicenseTypes': {
                         'branch': 'r6',
@@ -88,6 +156,79 @@ class TestIliasFileParser:
         with pt.raises(TypeError):
             self.file_parser.parse_from_pathfinder("/tmp/exmaple/path")
 
+    def test_parse_from_pathfinder_jobs(self, tmp_path, setup_fake_ilias, plugin_php_path):
+        for i in range(4):
+            ilias_path = setup_fake_ilias(f'customer_{i}')
+            plugin_path = ilias_path / 'Customizing/global/plugins/Services/Cron/CronHook/Cron'
+            plugin_path.mkdir(parents=True)
+            plugin_php_path.copy(plugin_path / 'plugin.php')
+            if i == 2:
+                (ilias_path / 'data/example_client/client.ini.php').write_text('no section header')
+
+        def parse(jobs):
+            pathfinder = IliasPathFinder()
+            pathfinder.discover(tmp_path)
+            return IliasFileParser(jobs=jobs).parse_from_pathfinder(pathfinder)
+
+        serial, parallel = parse(1), parse(3)
+        assert list(parallel) == list(serial)
+        assert parallel == serial
+        assert len(parallel) == 4
+
+        broken = parallel[str(tmp_path / 'customer_2/ILIAS')]
+        assert broken['error'].startswith('MissingSectionHeaderError')
+        assert broken['ilias.ini.php']['clients']['default'] == 'CLIENT_NAME'
+        assert all('error' not in installation for path, installation in parallel.items() if installation != broken)
+
+    def test_data_is_read_only(self, setup_fake_plugin):
+        pathfinder = IliasPathFinder()
+        pathfinder.discover(setup_fake_plugin().parents[6])
+        assert pathfinder.ilias_paths is pathfinder.ilias_paths
+        self.file_parser.parse_from_pathfinder(pathfinder)
+
+        data = self.file_parser.data
+        assert data is self.file_parser.data
+        installation = next(iter(data.values()))
+        with pt.raises(TypeError):
+            installation['plugin.php'].append({})
+        with pt.raises(TypeError):
+            installation['client.ini.php'][0]['db']['pass'] = ''
+        with pt.raises(TypeError):
+            data.clear()
+
+        snapshot = self.file_parser.snapshot()
+        assert snapshot == data
+        snapshot[installation['ilias_path']]['plugin.php'].append({})
+        assert len(self.file_parser.data[installation['ilias_path']]['plugin.php']) == 1
+
+    def test_update_file(self, setup_fake_plugin):
+        plugin_path = setup_fake_plugin("Customer_1")
+        il_path = plugin_path.parents[6]
+        pathfinder = IliasPathFinder()
+        pathfinder.discover(il_path)
+        self.file_parser.parse_from_pathfinder(pathfinder)
+        plugin_php = plugin_path / 'plugin.php'
+
+        before = self.file_parser.data
+        plugin_php.write_text('<?php\n$version = "1.2.0";\n')
+        assert self.file_parser.update_file(str(il_path), str(plugin_php))['version'] == '1.2.0'
+        assert [d['version'] for d in self.file_parser.data[str(il_path)]['plugin.php']] == ['1.2.0']
+        # views handed out before the update are not changed by it
+        assert [d['version'] for d in before[str(il_path)]['plugin.php']] == ['1.1.0']
+
+        plugin_php.unlink()
+        assert self.file_parser.update_file(str(il_path), str(plugin_php)) is None
+        assert self.file_parser.data[str(il_path)]['plugin.php'] == []
+
+        (il_path / '.gitmodules').unlink()
+        assert self.file_parser.update_file(str(il_path), str(il_path / '.gitmodules')) is None
+        assert self.file_parser.data[str(il_path)]['submodules'] == {}
+
+        with pt.raises(ValueError):
+            self.file_parser.update_file(str(il_path), str(il_path / 'ilias.php'))
+        with pt.raises(ValueError):
+            self.file_parser.update_file('/no/installation', str(plugin_php))
+
     def test_parse_ilias_ini(self, ilias_ini_path):
         ini_dict = self.file_parser.parse_ilias_ini(ilias_ini_path)
         assert isinstance(ini_dict, dict)
@@ -113,6 +254,7 @@ class TestIliasFileParser:
         plugin_info_dict = self.file_parser.parse_plugin(setup_git_plugin_repo)
         assert plugin_info_dict == {'source_file': setup_git_plugin_repo / 'plugin.php', 'ilias_max_version': '5.4.999',
                                     'ilias_min_version': '5.3.0', 'responsible': 'Andre Machon', 'version': '1.1.0',
+                                    'id': 'gp_webshopauth', 'responsible_mail': '<machon@qualitus.de>',
                                     'remotes': {
                                         'alternate': 'https://github.com/Amstutz/ILIAS.git/ILIAS-eLearning/ILIAS.git',
                                         'origin': 'https://github.com/ILIAS-eLearning/ILIAS.git'
@@ -121,7 +263,28 @@ class TestIliasFileParser:
     def test_parse_plugin_php(self, plugin_php_path):
         plugin_info_dict = self.file_parser.parse_plugin_php(plugin_php_path)
         assert plugin_info_dict == {'source_file': plugin_php_path, 'ilias_max_version': '5.4.999',
-                                    'ilias_min_version': '5.3.0', 'responsible': 'Andre Machon', 'version': '1.1.0'}
+                                    'ilias_min_version': '5.3.0', 'responsible': 'Andre Machon', 'version': '1.1.0',
+                                    'id': 'gp_webshopauth', 'responsible_mail': '<machon@qualitus.de>'}
+
+    def test_parse_plugin_php_formatting(self, tmp_path):
+        plugin_php_path = tmp_path / 'plugin.php'
+        plugin_php_path.write_bytes(
+            b"<?php\r\n"
+            b"/* $version = '0.0.1'; */\r\n"
+            b"// $id = 'old';\r\n"
+            b"$id = 'xtst';\r\n"
+            b"$version =\r\n    '2.0.1-rc.1';\r\n"
+            b"$ilias_min_version = \"5.4.0\"; $ilias_max_version = \"7.999\";\r\n"
+            b"define('IL_TEST_CONST', \"don't \\\"stop\\\"\");\r\n"
+            b"$responsible = 'J\xfcrgen O\\'Neill';\r\n"
+            b"$responsible_mail = 'j@example.com';\r\n"
+            b"$supports_export = 'not scanned';\r\n"
+        )
+        plugin_info_dict = self.file_parser.parse_plugin_php(plugin_php_path)
+        assert plugin_info_dict == {'source_file': plugin_php_path, 'id': 'xtst', 'version': '2.0.1-rc.1',
+                                    'ilias_min_version': '5.4.0', 'ilias_max_version': '7.999',
+                                    'IL_TEST_CONST': 'don\'t "stop"', 'responsible': 'J\ufffdrgen O\'Neill',
+                                    'responsible_mail': 'j@example.com'}
 
     def test_parse_ilias_version(self, inc_ilias_version_php_path):
         version = self.file_parser.parse_version(inc_ilias_version_php_path)
@@ -178,6 +341,50 @@ class TestIliasPathFinder:
         assert 'inc.ilias_version.php' in files
         assert 'client.ini.php' in files
 
+    def test_discover(self, setup_fake_plugin):
+        plugin_path_1 = setup_fake_plugin("FakePlugin1")
+        plugin_path_2 = setup_fake_plugin("FakePlugin2")
+        il_path = plugin_path_1.parents[6]
+
+        ilias_paths = self.pathfinder.discover(il_path.parent)
+        assert ilias_paths == [str(il_path)]
+
+        il_dict = self.pathfinder.ilias_paths[str(il_path)]
+        assert il_dict['plugins'] == {
+            'FakePlugin1': str(plugin_path_1 / 'plugin.php'),
+            'FakePlugin2': str(plugin_path_2 / 'plugin.php')
+        }
+        assert il_dict['files']['client.ini.php'] == [str(il_path / 'data/example_client/client.ini.php')]
+
+    def test_discover_skips_excluded(self, setup_fake_ilias):
+        ilias_path = setup_fake_ilias('Customer_1')
+        setup_fake_ilias('Backup/Customer_1')
+        setup_fake_ilias('Customer_1_Backup')
+        start_path = ilias_path.parents[1]
+
+        assert self.pathfinder.discover(start_path, ['Backup']) == [
+            str(ilias_path), str(start_path / 'Customer_1_Backup/ILIAS')
+        ]
+        assert IliasPathFinder(exclude_mode='substring').discover(start_path, ['Backup']) == [str(ilias_path)]
+
+    def test_discover_assigns_nearest_installation(self, setup_fake_ilias, plugin_php_path):
+        ilias_path = setup_fake_ilias('ilias')
+        sibling_path = setup_fake_ilias('ilias2')
+        nested_path = setup_fake_ilias('ilias/ILIAS/nested')
+        for path in (sibling_path, nested_path):
+            plugin_path = path / 'Customizing/global/plugins/Services/Cron/CronHook/Test'
+            plugin_path.mkdir(parents=True)
+            plugin_php_path.copy(plugin_path / 'plugin.php')
+
+        self.pathfinder.discover(ilias_path.parents[1])
+        ilias_paths = self.pathfinder.ilias_paths
+        assert ilias_paths[str(ilias_path)]['plugins'] == {}
+        assert list(ilias_paths[str(sibling_path)]['plugins']) == ['Test']
+        assert list(ilias_paths[str(nested_path)]['plugins']) == ['Test']
+        assert ilias_paths[str(ilias_path)]['files']['client.ini.php'] == [
+            str(ilias_path / 'data/example_client/client.ini.php')
+        ]
+
     def test_find_plugins(self, tmp_path, setup_fake_plugin):
         plugin_path_1 = setup_fake_plugin("FakePlugin1")
         plugin_path_2 = setup_fake_plugin("FakePlugin2")
@@ -0,0 +1,146 @@
+# Created by Andre Machon 18/10/2026
+import json
+import os
+import sqlite3
+import pytest as pt
+
+from ilinfo import IliasFileParser, IliasPathFinder, StreamingJSONOutput, Analyzer
+from ilinfo.cache import ParseCache
+
+
+def _age(path, seconds=3600):
+    # files written by the test are too new for their stat() to be trusted, see ParseCache
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns - seconds * 10 ** 9))
+
+
+def _parse_lines(path):
+    return {'source_file': path, 'lines': open(path).read().splitlines()}
+
+
+class TestParseCache:
+    def test_stat_and_content_hits(self, tmp_path):
+        cache_file = tmp_path / 'parsecache.sqlite3'
+        first, copy = tmp_path / 'first.txt', tmp_path / 'copy.txt'
+        first.write_text('a\nb\n')
+        copy.write_text('a\nb\n')
+        _age(first)
+        calls = []
+
+        def parse(path):
+            calls.append(path)
+            return _parse_lines(path)
+
+        cache = ParseCache(cache_file)
+        expected = cache.get('lines', str(first), parse)
+        cache.close()
+
+        cache = ParseCache(cache_file)
+        assert cache.get('lines', str(first), parse) == expected
+        # same content at another path, found by its hash
+        assert cache.get('lines', str(copy), parse) == {'source_file': str(copy), 'lines': ['a', 'b']}
+        assert (cache.hits, cache.misses) == (2, 0)
+        assert calls == [str(first)]
+
+        first.write_text('c\n')
+        assert cache.get('lines', str(first), parse)['lines'] == ['c']
+        # kinds do not share results
+        assert cache.get('other', str(copy), parse)['lines'] == ['a', 'b']
+        assert (cache.hits, cache.misses) == (2, 2)
+
+    def test_results_are_not_shared(self, tmp_path):
+        path = tmp_path / 'file.txt'
+        path.write_text('a\n')
+        cache = ParseCache(tmp_path / 'parsecache.sqlite3')
+        cache.get('lines', str(path), _parse_lines)['lines'].append('changed')
+        assert cache.get('lines', str(path), _parse_lines)['lines'] == ['a']
+
+    def test_errors_and_missing_files_are_not_cached(self, tmp_path):
+        cache = ParseCache(tmp_path / 'parsecache.sqlite3')
+        assert cache.get('lines', str(tmp_path / 'missing'), lambda path: {'source_file': path}) == {
+            'source_file': str(tmp_path / 'missing')
+        }
+        path = tmp_path / 'file.txt'
+        path.write_text('a\n')
+        with pt.raises(ValueError):
+            cache.get('lines', str(path), lambda path: int('a'))
+        assert cache.get('lines', str(path), _parse_lines)['lines'] == ['a']
+        assert (cache.hits, cache.misses) == (0, 1)
+
+    def test_least_recently_used_are_dropped(self, tmp_path):
+        cache_file = tmp_path / 'parsecache.sqlite3'
+        paths = []
+        for i in range(3):
+            paths.append(tmp_path / f'{i}.txt')
+            paths[-1].write_text(f'{i}\n')
+            _age(paths[-1])
+
+        cache = ParseCache(cache_file, max_entries=2)
+        for path in paths[:2]:
+            cache.get('lines', str(path), _parse_lines)
+            cache.flush()
+        # the first file is used again, which leaves the second as the least recently used
+        cache.get('lines', str(paths[0]), _parse_lines)
+        cache.flush()
+        cache.get('lines', str(paths[2]), _parse_lines)
+        cache.close()
+        assert cache.hits == 1
+
+        with sqlite3.connect(str(cache_file)) as connection:
+            rows = connection.execute('SELECT path FROM results ORDER BY path').fetchall()
+        assert [row[0] for row in rows] == [str(paths[0]), str(paths[2])]
+
+    def test_version_change_drops_results(self, tmp_path, monkeypatch):
+        cache_file = tmp_path / 'parsecache.sqlite3'
+        path = tmp_path / 'file.txt'
+        path.write_text('a\n')
+        cache = ParseCache(cache_file)
+        cache.get('lines', str(path), _parse_lines)
+        cache.close()
+
+        monkeypatch.setattr(ParseCache, 'VERSION', ParseCache.VERSION + 1)
+        cache = ParseCache(cache_file)
+        cache.get('lines', str(path), _parse_lines)
+        assert cache.misses == 1
+
+    def test_default_path(self, monkeypatch):
+        monkeypatch.setenv('XDG_CACHE_HOME', '/var/cache')
+        assert str(ParseCache.default_path()) == '/var/cache/ilinfo/parsecache.sqlite3'
+
+    @pt.mark.parametrize('jobs', [1, 3])
+    def test_file_parser(self, tmp_path, setup_fake_ilias, plugin_php_path, jobs):
+        for i in range(3):
+            ilias_path = setup_fake_ilias(f'fleet/customer_{i}')
+            plugin_path = ilias_path / 'Customizing/global/plugins/Services/Cron/CronHook/Cron'
+            plugin_path.mkdir(parents=True)
+            plugin_php_path.copy(plugin_path / 'plugin.php')
+        cache_file = tmp_path / 'parsecache.sqlite3'
+
+        def parse(parse_cache):
+            pathfinder = IliasPathFinder()
+            pathfinder.discover(tmp_path / 'fleet')
+            parser = IliasFileParser(jobs=jobs, parse_cache=parse_cache)
+            return parser.parse_from_pathfinder(pathfinder), parser.stats()
+
+        expected, stats = parse(None)
+        assert stats == {}
+        first, stats = parse(ParseCache(cache_file))
+        assert first == expected
+        # the installations are copies of each other, without workers only the first one is parsed
+        assert stats['parse_cache']['hits'] + stats['parse_cache']['misses'] == 12
+        if jobs == 1:
+            assert stats['parse_cache']['misses'] == 4
+
+        second, stats = parse(ParseCache(cache_file))
+        assert second == expected
+        assert stats == {'parse_cache': {'hits': 12, 'misses': 0}}
+
+    def test_summary(self, tmp_path, setup_fake_ilias):
+        setup_fake_ilias('fleet')
+        out = StreamingJSONOutput(output_path=tmp_path / 'out')
+        parse_cache = ParseCache(tmp_path / 'parsecache.sqlite3')
+        Analyzer(IliasFileParser(parse_cache=parse_cache), output_processor=out).analyze_path(tmp_path / 'fleet')
+
+        summary = json.loads(out.file_path.read_text().splitlines()[-1])
+        assert summary['parse_cache'] == {'hits': 0, 'misses': 3}
+        assert out.summary['parse_cache'] == summary['parse_cache']
@@ -0,0 +1,137 @@
+# Created by Andre Machon 18/10/2026
+import io
+import json
+import socket
+import sys
+import pytest as pt
+from pathlib import Path
+
+from ilinfo import Analyzer, StreamingJSONOutput
+from ilinfo.collect import Collector
+from ilinfo.output_processors import AgentOutput
+from ilinfo.wire import MAGIC, ProtocolError, decode_record, encode_record, read_records
+
+PACKAGE_DIR = Path(__file__).parents[1]
+
+
+def _agent_command(start_path, address=None):
+    # the CLI excludes /tmp, where the fake installations are
+    output = f'AgentOutput(address={address!r})' if address else 'AgentOutput(sys.stdout.buffer)'
+    script = (f'import sys; from ilinfo import Analyzer; from ilinfo.output_processors import AgentOutput; '
+              f'Analyzer(output_processor={output}).analyze_path({str(start_path)!r})')
+    return f'cd {PACKAGE_DIR} && {sys.executable} -c "{script}"'
+
+
+def _read_ndjson(path):
+    return [json.loads(line) for line in Path(path).read_text().splitlines()]
+
+
+class TestWire:
+    def test_records(self):
+        records = [{'type': 'header', 'host': 'web01'}, {'type': 'installation',
+                                                       'data': {'ilias_path': '/', 'x': 'ä' * 1000}}]
+        stream = io.BytesIO(MAGIC + b''.join(encode_record(record) for record in records))
+        assert list(read_records(stream)) == records
+        assert len(encode_record(records[1])) < 100
+
+    def test_broken_streams(self):
+        frame = encode_record({'type': 'summary'})
+        with pt.raises(ProtocolError, match='not a stream'):
+            list(read_records(io.BytesIO(b'{"type": "header"}')))
+        with pt.raises(ProtocolError, match='within a frame'):
+            list(read_records(io.BytesIO(MAGIC + frame[:-1])))
+        with pt.raises(ProtocolError, match='larger than'):
+            list(read_records(io.BytesIO(MAGIC + frame), max_size=4))
+        with pt.raises(ProtocolError, match='larger than'):
+            decode_record(encode_record({'type': 'x', 'data': '0' * 10000})[4:], max_size=1000)
+        with pt.raises(ProtocolError, match='no type'):
+            decode_record(encode_record([1, 2])[4:])
+        for data in (None, [1], {'x': 1}):
+            with pt.raises(ProtocolError, match='no data'):
+                decode_record(encode_record({'type': 'installation', 'data': data})[4:])
+
+
+class TestAgentOutput:
+    def test_stream(self, tmp_path, setup_fake_ilias):
+        ilias_path = setup_fake_ilias('fleet')
+        stream = io.BytesIO()
+        summary = Analyzer(output_processor=AgentOutput(stream)).analyze_path(tmp_path / 'fleet')
+        assert summary['installations'] == 1
+
+        stream.seek(0)
+        records = list(read_records(stream))
+        assert [record['type'] for record in records] == ['header', 'installation', 'summary']
+        assert records[0]['host'] == socket.gethostname()
+        assert records[1]['ilias_path'] == str(ilias_path)
+        assert records[2] == summary
+
+    @pt.mark.parametrize('with_passwords', [False, True])
+    def test_passwords(self, tmp_path, setup_fake_ilias, with_passwords):
+        setup_fake_ilias('fleet')
+        stream = io.BytesIO()
+        Analyzer(output_processor=AgentOutput(stream, with_passwords=with_passwords)).analyze_path(tmp_path / 'fleet')
+        stream.seek(0)
+        db = list(read_records(stream))[1]['data']['client.ini.php'][0]['db']
+        assert db['user'] and ('pass' in db) == with_passwords
+
+    def test_needs_stream_or_address(self):
+        with pt.raises(ValueError):
+            AgentOutput()
+        with pt.raises(ValueError):
+            AgentOutput(io.BytesIO(), ('127.0.0.1', 1))
+
+
+class TestCollector:
+    def test_commands_and_socket(self, tmp_path, setup_fake_ilias):
+        for i in range(3):
+            setup_fake_ilias(f'fleet/customer_{i}')
+        out = StreamingJSONOutput(output_path=tmp_path / 'out')
+        sock = socket.create_server(('127.0.0.1', 0))
+        address = sock.getsockname()
+        commands = [_agent_command(tmp_path / 'fleet'), f'{_agent_command(tmp_path / "fleet", address)} && echo x',
+                    'echo broken', 'exit 3']
+
+        path = Collector(out, max_agents=2).run(sock, commands, expect=1)
+        sock.close()
+
+        records = _read_ndjson(path)
+        assert records[0]['type'] == 'header'
+        assert records[-1]['type'] == 'summary'
+        assert records[-1]['installations'] == 6
+        assert (records[-1]['agents'], records[-1]['complete']) == (5, 2)
+
+        installations = [record for record in records if record['type'] == 'installation']
+        assert {record['host'] for record in installations} == {socket.gethostname()}
+        assert all(record['started_at'] and record['data']['ilias_path'] == record['ilias_path']
+                   for record in installations)
+
+        agents = {record.get('command', 'socket'): record for record in records if record['type'] == 'agent'}
+        assert agents['socket']['complete'] and agents['socket']['peer'].startswith('127.0.0.1:')
+        assert agents[commands[0]]['installations'] == 3 and agents[commands[0]]['complete']
+        # the agent connecting to the socket writes nothing to stdout
+        assert agents[commands[1]]['error'].startswith('ProtocolError')
+        assert agents['echo broken']['error'] == 'ProtocolError: not a stream of ilinfo agent'
+        assert agents['exit 3']['complete'] is False
+
+    def test_malformed_record(self, tmp_path, setup_fake_ilias):
+        setup_fake_ilias('fleet')
+        records = [{'type': 'header', 'host': 'web02'}, {'type': 'installation', 'ilias_path': '/srv/ilias'},
+                   {'type': 'summary'}]
+        script = tmp_path / 'malformed.py'
+        script.write_text(f'import sys\nfrom ilinfo.wire import MAGIC, encode_record\n'
+                          f'sys.stdout.buffer.write(MAGIC + b"".join(encode_record(r) for r in {records!r}))\n')
+        malformed = f'cd {PACKAGE_DIR} && {sys.executable} -c "exec(open({str(script)!r}).read())"'
+        commands = [malformed, _agent_command(tmp_path / 'fleet')]
+
+        records = _read_ndjson(Collector(StreamingJSONOutput(output_path=tmp_path / 'out')).run(None, commands))
+        # only the agent that sent the malformed record failed, the other one was collected
+        agents = {record['command']: record for record in records if record['type'] == 'agent'}
+        assert agents[malformed]['error'].startswith('ProtocolError: installation record has no data')
+        assert agents[commands[1]]['complete'] and agents[commands[1]]['installations'] == 1
+        assert records[-1]['installations'] == 1
+
+    def test_output_needs_ndjson(self, tmp_path):
+        with pt.raises(TypeError):
+            Collector(object())
+        with pt.raises(ValueError):
+            Collector(StreamingJSONOutput(output_path=tmp_path, fmt='json'))
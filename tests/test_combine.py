@@ -0,0 +1,159 @@
+# Created by Andre Machon 18/10/2026
+import io
+import json
+import os
+import pytest as pt
+
+from ilinfo import JSONOutput, StreamingJSONOutput, SQLiteOutput
+from ilinfo.combine import ResultMerger, _JSONReader
+
+
+def _write_ndjson(path, installations, host='web01', started_at='2026-10-01T02:00:00+00:00'):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'w') as f:
+        f.write(json.dumps({'type': 'header', 'format': 1, 'host': host, 'started_at': started_at}) + '\n')
+        for ilias_path, version in installations:
+            f.write(json.dumps({'type': 'installation', 'ilias_path': ilias_path,
+                                'data': {'ilias_path': ilias_path, 'version': version}}) + '\n')
+        f.write(json.dumps({'type': 'summary', 'installations': len(installations)}) + '\n')
+    return path
+
+
+def _read_ndjson(path):
+    return [json.loads(line) for line in path.read_text().splitlines()]
+
+
+class TestResultMerger:
+    def test_latest_scan_wins(self, tmp_path):
+        files = [
+            _write_ndjson(tmp_path / 'web01_new/ilinfo.ndjson', [('/srv/b', 2), ('/srv/a', 2)],
+                          started_at='2026-10-02T02:00:00+00:00'),
+            _write_ndjson(tmp_path / 'web01_old/ilinfo.ndjson', [('/srv/a', 1), ('/srv/c', 1)]),
+            _write_ndjson(tmp_path / 'web02/ilinfo.ndjson', [('/srv/a', 1)], host='web02'),
+        ]
+        merger = ResultMerger(files, max_open_files=1)
+        merged = [(envelope['host'], installation['ilias_path'], installation['version'])
+                  for envelope, installation in merger]
+        assert merged == [('web01', '/srv/a', 2), ('web01', '/srv/b', 2), ('web01', '/srv/c', 1),
+                          ('web02', '/srv/a', 1)]
+        assert merger.counts == {'files': 3, 'installations': 5, 'duplicates': 1}
+
+    def test_ties_go_to_the_later_file(self, tmp_path):
+        files = [_write_ndjson(tmp_path / f'{n}/ilinfo.ndjson', [('/srv/a', n)]) for n in range(3)]
+        assert [installation['version'] for _, installation in ResultMerger(files)] == [2]
+        assert [installation['version'] for _, installation in ResultMerger(files[::-1])] == [0]
+
+    def test_json(self, tmp_path):
+        json_file = tmp_path / 'web01/ilinfo.json'
+        json_file.parent.mkdir()
+        json_file.write_text(json.dumps({'/srv/a': {'ilias_path': '/srv/a', 'version': 3}}))
+        os.utime(json_file, (1800000000, 1800000000))
+        ndjson_file = _write_ndjson(tmp_path / 'ilinfo.ndjson', [('/srv/a', 1)])
+
+        merger = ResultMerger([ndjson_file, ('web01', json_file), json_file])
+        merged = list(merger)
+        assert merged == [({'host': None, 'started_at': '2027-01-15T08:00:00+00:00'},
+                           {'ilias_path': '/srv/a', 'version': 3}),
+                          ({'host': 'web01', 'started_at': '2027-01-15T08:00:00+00:00'},
+                           {'ilias_path': '/srv/a', 'version': 3})]
+        assert merger.counts['duplicates'] == 1
+
+
+    def test_unknown_hosts_are_kept_apart(self, tmp_path):
+        files = [_write_ndjson(tmp_path / f'{n}/ilinfo.ndjson', [('/srv/a', n), ('/srv/a', n + 10)], host=None)
+                 for n in range(2)]
+        json_file = tmp_path / 'ilinfo.json'
+        json_file.write_text(json.dumps({'/srv/a': {'ilias_path': '/srv/a', 'version': 3}}))
+
+        merger = ResultMerger([*files, json_file, ('web01', json_file)])
+        merged = [(envelope['host'], installation['version']) for envelope, installation in merger]
+        # within a file the later record wins, files without a host may be different machines
+        assert merged == [(None, 10), (None, 11), (None, 3), ('web01', 3)]
+        assert merger.counts['duplicates'] == 2
+
+
+    def test_index_runs(self, tmp_path):
+        files = [_write_ndjson(tmp_path / f'{n}/ilinfo.ndjson', [(f'/srv/{c}', n) for c in 'cab'], host=f'web0{n % 2}',
+                               started_at=f'2026-10-0{n + 1}T02:00:00+00:00') for n in range(5)]
+        expected = list(ResultMerger(files))
+        # every entry is a run of its own, which are merged two at a time until two are left
+        merger = ResultMerger(files, max_open_files=2, run_size=1)
+        assert list(merger) == expected
+        assert [(envelope['host'], installation['version']) for envelope, installation in expected] == \
+            [('web00', 4)] * 3 + [('web01', 3)] * 3
+        assert merger.counts == {'files': 5, 'installations': 15, 'duplicates': 9}
+
+    def test_json_reader(self):
+        document = {'/srv/a': {'ilias_path': '/srv/a', 'version': 12345, 'plugins': ['ä', {'x': None}]},
+                    '/srv/b': {}, '/srv/c': 1.5e10}
+        text = json.dumps(document, indent=1)
+        reader = _JSONReader(io.StringIO(text), chunk_size=3)
+        reader.expect('{')
+        members = {}
+        while True:
+            key = reader.value()
+            reader.expect(':')
+            members[key] = reader.value()
+            if reader.expect(',}') == '}':
+                break
+        assert members == document
+
+        reader = _JSONReader(io.StringIO('{"/srv/a": {"ilias_path"'), chunk_size=3)
+        reader.expect('{')
+        reader.value()
+        with pt.raises(ValueError):
+            reader.expect(':')
+            reader.value()
+
+
+class TestCombineData:
+    def test_ndjson(self, tmp_path):
+        files = [_write_ndjson(tmp_path / f'{host}/ilinfo.ndjson', [('/srv/a', 1)], host=host)
+                 for host in ('web01', 'web02')]
+        out = StreamingJSONOutput(output_path=tmp_path / 'combined')
+        path = out.combine_data(files)
+
+        records = _read_ndjson(path)
+        assert [(r.get('host'), r.get('ilias_path')) for r in records[1:-1]] == [('web01', '/srv/a'),
+                                                                                 ('web02', '/srv/a')]
+        assert records[-1]['combined'] == {'files': 2, 'installations': 2, 'duplicates': 0}
+        assert out.summary['installations'] == 2
+
+        # the hosts of the installations are kept, the header of the combined file is not theirs
+        again = StreamingJSONOutput(output_path=tmp_path / 'again').combine_data([path, files[0]])
+        assert [r.get('host') for r in _read_ndjson(again)[1:-1]] == ['web01', 'web02']
+
+        with pt.raises(ValueError, match='overwritten'):
+            out.combine_data([path])
+
+    def test_sqlite(self, tmp_path):
+        files = [_write_ndjson(tmp_path / f'{host}/ilinfo.ndjson', [('/srv/a', 1), ('/srv/b', 1)], host=host)
+                 for host in ('web01', 'web02')]
+        db_file = SQLiteOutput(output_path=tmp_path).combine_data(files)
+        _, rows = SQLiteOutput.query(db_file, 'SELECT host, COUNT(*) FROM current_installations GROUP BY host')
+        assert rows == [('web01', 2), ('web02', 2)]
+
+    def test_json(self, tmp_path):
+        files = [_write_ndjson(tmp_path / f'{host}/ilinfo.ndjson', [('/srv/a', 1)], host=host)
+                 for host in ('web01', 'web02')]
+        out = JSONOutput(output_path=tmp_path / 'combined')
+        path = out.combine_data(files)
+        assert json.loads(path.read_text()) == {'web01:/srv/a': {'ilias_path': '/srv/a', 'version': 1},
+                                                'web02:/srv/a': {'ilias_path': '/srv/a', 'version': 1}}
+        assert out.summary['installations'] == 2 and out.summary['combined']['duplicates'] == 0
+
+        # the hosts are read back from the keys
+        again = [(envelope['host'], installation['ilias_path']) for envelope, installation in ResultMerger([path])]
+        assert again == [('web01', '/srv/a'), ('web02', '/srv/a')]
+
+        json_file = tmp_path / 'web03/ilinfo.json'
+        json_file.parent.mkdir()
+        json_file.write_text(json.dumps({'/srv/a': {'ilias_path': '/srv/a', 'version': 2}}))
+        with pt.raises(ValueError, match='unknown hosts'):
+            JSONOutput(output_path=tmp_path / 'unknown').combine_data([json_file])
+        path = JSONOutput(output_path=tmp_path / 'known').combine_data([*files, ('web03', json_file)])
+        assert list(json.loads(path.read_text())) == ['web01:/srv/a', 'web02:/srv/a', 'web03:/srv/a']
+
+    def test_needs_ndjson(self, tmp_path):
+        with pt.raises(ValueError):
+            StreamingJSONOutput(output_path=tmp_path, fmt='json').combine_data([])
@@ -0,0 +1,100 @@
+# Created by Andre Machon 18/10/2026
+import io
+import json
+import pytest as pt
+
+from ilinfo import Analyzer, JSONOutput, StreamingJSONOutput
+from ilinfo.diff import InventoryDiff, content_hash
+
+
+def _installation(ilias_path, plugins=(), db_host='localhost'):
+    return {
+        'ilias_path': ilias_path,
+        'client.ini.php': [{'source_file': f'{ilias_path}/data/client/client.ini.php', 'db': {'host': db_host}}],
+        'plugin.php': [
+            {'source_file': f'{ilias_path}/Customizing/{plugin_id}/plugin.php', 'id': plugin_id, 'version': version,
+             'remotes': dict(remotes)}
+            for plugin_id, version, remotes in plugins
+        ],
+    }
+
+
+def _write_ndjson(path, installations, host='web01'):
+    with open(path, 'w') as f:
+        f.write(json.dumps({'type': 'header', 'format': 1, 'host': host, 'started_at': 'x'}) + '\n')
+        for installation in installations:
+            f.write(json.dumps({'type': 'installation', 'host': host, 'started_at': 'x',
+                                'ilias_path': installation['ilias_path'], 'data': installation}) + '\n')
+        f.write(json.dumps({'type': 'summary'}) + '\n')
+    return path
+
+
+def test_content_hash():
+    assert content_hash({'a': 1, 'b': [1, {'c': 2}]}) == content_hash({'b': [1, {'c': 2}], 'a': 1})
+    assert content_hash({'a': 1}) != content_hash({'a': '1'})
+
+
+class TestInventoryDiff:
+    def test_changes(self, tmp_path):
+        old = _write_ndjson(tmp_path / 'old.ndjson', [
+            _installation('/srv/a', [('xcron', '1.0.0', {}), ('xwebshop', '2.3.0', {})]),
+            _installation('/srv/b'),
+            _installation('/srv/c'),
+        ])
+        new = _write_ndjson(tmp_path / 'new.ndjson', [
+            _installation('/srv/d'),
+            _installation('/srv/a', [('xcron', '1.1.0', {'origin': 'git@example.org:xcron.git'}),
+                                     ('xlti', '1.0.0', {})]),
+            _installation('/srv/b', db_host='db02'),
+        ])
+
+        diff = InventoryDiff(old, new)
+        changes = list(diff.changes())
+        assert diff.counts == {'added': 1, 'removed': 1, 'changed': 2, 'unchanged': 0}
+        assert changes == [
+            {'op': 'add', 'host': 'web01', 'ilias_path': '/srv/d'},
+            {'op': 'change', 'host': 'web01', 'ilias_path': '/srv/a',
+             'path': ['plugin.php', 'Customizing/xcron/plugin.php', 'version'], 'old': '1.0.0', 'new': '1.1.0'},
+            {'op': 'add', 'host': 'web01', 'ilias_path': '/srv/a',
+             'path': ['plugin.php', 'Customizing/xcron/plugin.php', 'remotes', 'origin'],
+             'new': 'git@example.org:xcron.git'},
+            {'op': 'remove', 'host': 'web01', 'ilias_path': '/srv/a',
+             'path': ['plugin.php', 'Customizing/xwebshop/plugin.php'],
+             'old': {'source_file': '/srv/a/Customizing/xwebshop/plugin.php', 'id': 'xwebshop', 'version': '2.3.0',
+                     'remotes': {}}},
+            {'op': 'add', 'host': 'web01', 'ilias_path': '/srv/a',
+             'path': ['plugin.php', 'Customizing/xlti/plugin.php'],
+             'new': {'source_file': '/srv/a/Customizing/xlti/plugin.php', 'id': 'xlti', 'version': '1.0.0',
+                     'remotes': {}}},
+            {'op': 'change', 'host': 'web01', 'ilias_path': '/srv/b',
+             'path': ['client.ini.php', 'data/client/client.ini.php', 'db', 'host'], 'old': 'localhost',
+             'new': 'db02'},
+            {'op': 'remove', 'host': 'web01', 'ilias_path': '/srv/c'},
+        ]
+
+    def test_hosts_are_part_of_the_key(self, tmp_path):
+        old = _write_ndjson(tmp_path / 'old.ndjson', [_installation('/srv/a')], host='web01')
+        new = _write_ndjson(tmp_path / 'new.ndjson', [_installation('/srv/a')], host='web02')
+        assert [change['op'] for change in InventoryDiff(old, new).changes()] == ['add', 'remove']
+        diff = InventoryDiff(old, old)
+        assert list(diff.changes()) == []
+        assert diff.counts['unchanged'] == 1
+
+    @pt.mark.parametrize('old_class', [JSONOutput, StreamingJSONOutput])
+    def test_json_and_ndjson(self, tmp_path, setup_fake_plugin, old_class):
+        il_path = setup_fake_plugin('TestPlugin1').parents[6]
+        old = Analyzer(output_processor=old_class(output_path=tmp_path / 'old')).analyze_path(il_path)
+        new = Analyzer(output_processor=JSONOutput(output_path=tmp_path / 'new')).analyze_path(il_path)
+        diff = InventoryDiff(old, new)
+        assert list(diff.changes()) == []
+        assert diff.counts['unchanged'] == 1
+
+        plugin_php = il_path / 'Customizing/global/plugins/Services/UIComponent/UserInterfaceHook/TestPlugin1' \
+            / 'plugin.php'
+        plugin_php.write_text(plugin_php.read_text().replace('1.1.0', '1.2.0'))
+        new = Analyzer(output_processor=JSONOutput(output_path=tmp_path / 'new')).analyze_path(il_path)
+        f = io.StringIO()
+        assert InventoryDiff(old, new).write(f) == 1
+        change = json.loads(f.getvalue())
+        assert (change['path'][-1], change['old'], change['new']) == ('version', '1.1.0', '1.2.0')
+        assert 'host' not in change
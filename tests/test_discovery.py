@@ -0,0 +1,213 @@
+# Created by Andre Machon 18/10/2026
+import json
+import pytest as pt
+from pathlib import Path
+
+from ilinfo.discovery import TreeWalker, ExclusionMatcher, DirectoryCache, PathTrie, DISCOVERY_FILES
+
+
+class TestTreeWalker:
+    def test_scan(self, setup_fake_plugin):
+        plugin_path_1 = setup_fake_plugin('TestPlugin1')
+        plugin_path_2 = setup_fake_plugin('TestPlugin2')
+        il_path = plugin_path_1.parents[6]
+
+        walker = TreeWalker(DISCOVERY_FILES)
+        found = walker.scan(il_path.parent)
+
+        assert found['ilias.php'] == [str(il_path / 'ilias.php')]
+        assert found['client.ini.php'] == [str(il_path / 'data/example_client/client.ini.php')]
+        assert found['plugin.php'] == [str(plugin_path_1 / 'plugin.php'), str(plugin_path_2 / 'plugin.php')]
+        assert walker.dirs_visited == 13
+
+    def test_walk_skips_excluded(self, setup_fake_plugin):
+        plugin_path = setup_fake_plugin('TestPlugin1')
+        il_path = plugin_path.parents[6]
+
+        walker = TreeWalker(DISCOVERY_FILES, ['example_client', 'UserInterfaceHook'])
+        assert list(walker.walk(il_path)) == [(str(il_path), 'ilias.php')]
+
+    def test_walk_prunes_excluded(self, setup_fake_plugin):
+        plugin_path = setup_fake_plugin('TestPlugin1')
+        il_path = plugin_path.parents[6]
+
+        walker = TreeWalker(DISCOVERY_FILES, ['Customizing'])
+        assert list(walker.walk(il_path)) == [
+            (str(il_path), 'ilias.php'), (str(il_path / 'data/example_client'), 'client.ini.php')
+        ]
+        # ILIAS, include, data, example_client, nothing below Customizing is listed
+        assert walker.dirs_visited == 4
+        assert walker.dirs_pruned == 1
+
+    def test_walk_excluded_start_path(self, setup_fake_ilias):
+        il_path = setup_fake_ilias()
+        walker = TreeWalker(DISCOVERY_FILES, [str(il_path.parent)])
+        assert list(walker.walk(il_path)) == []
+        assert walker.dirs_visited == 0
+
+    def test_parallel_walk(self, tmp_path, setup_fake_plugin):
+        for name in ('TestPlugin1', 'TestPlugin2', 'TestPlugin10', 'Test Plugin', 'TestPlugin.old'):
+            setup_fake_plugin(name)
+        setup_fake_plugin('Backup')
+
+        sequential = TreeWalker(DISCOVERY_FILES, ['Backup'])
+        parallel = TreeWalker(DISCOVERY_FILES, ['Backup'], workers=4)
+        assert list(parallel.walk(tmp_path)) == list(sequential.walk(tmp_path))
+        assert parallel.dirs_visited == sequential.dirs_visited
+        assert parallel.dirs_pruned == sequential.dirs_pruned == 1
+
+        with pt.raises(ValueError):
+            TreeWalker(DISCOVERY_FILES, workers=0)
+
+
+class TestExclusionMatcher:
+    def test_names(self):
+        matcher = ExclusionMatcher(['Backup', '_Examples'])
+        assert matcher.excludes('/srv/www/Backup')
+        assert matcher.excludes('/srv/www/Backup/ILIAS')
+        assert matcher.excludes('/srv/www/Backup', 'Backup')
+        assert not matcher.excludes('/srv/www/Backup_2021')
+        assert not matcher.excludes('/srv/www/Backup/ILIAS', 'ILIAS')
+
+    def test_absolute_prefixes(self):
+        matcher = ExclusionMatcher(['/opt', '/tmp/'])
+        assert matcher.excludes('/opt')
+        assert matcher.excludes('/opt/ilias')
+        assert matcher.excludes('/tmp', 'tmp')
+        assert not matcher.excludes('/var/opt')
+        assert not matcher.excludes('/optional')
+
+    def test_component_sequences(self):
+        matcher = ExclusionMatcher(['Customizing/global'])
+        assert matcher.excludes('/srv/ilias/Customizing/global', 'global')
+        assert matcher.excludes('/srv/ilias/Customizing/global/plugins')
+        assert not matcher.excludes('/srv/ilias/Customizing/globals', 'globals')
+
+    def test_globs(self):
+        matcher = ExclusionMatcher(['ilias*old', '/home/*/backup'])
+        assert matcher.excludes('/srv/ilias5old', 'ilias5old')
+        assert matcher.excludes('/srv/ilias_old/ILIAS')
+        assert not matcher.excludes('/srv/ilias5old2', 'ilias5old2')
+        assert matcher.excludes('/home/andre/backup', 'backup')
+        assert not matcher.excludes('/srv/backup', 'backup')
+
+    def test_substring_mode(self):
+        matcher = ExclusionMatcher(['Backup', '/opt'], mode='substring')
+        assert matcher.excludes('/srv/www/Backup_2021', 'Backup_2021')
+        assert matcher.excludes('/var/opt/ilias')
+        assert not matcher.excludes('/srv/www/ilias')
+
+    def test_invalid_mode(self):
+        with pt.raises(ValueError):
+            ExclusionMatcher(['Backup'], mode='regex')
+
+    def test_empty(self):
+        assert not ExclusionMatcher()
+        assert not ExclusionMatcher(['']).excludes('/srv')
+
+
+class TestDirectoryCache:
+    def test_incremental_walk(self, tmp_path, setup_fake_plugin):
+        plugin_path = setup_fake_plugin('TestPlugin1')
+        il_path = plugin_path.parents[6]
+        cache_file = tmp_path / 'cache' / 'dircache.json'
+
+        cache = DirectoryCache(cache_file)
+        cache.load(DISCOVERY_FILES)
+        expected = TreeWalker(DISCOVERY_FILES, cache=cache).scan(il_path)
+        cache.save()
+        assert cache.hits == 0
+        assert cache_file.is_file()
+
+        # pretend the directories were listed long after they were modified, so the cache trusts them
+        stored = json.loads(cache_file.read_text())
+        stored['started_ns'] += 10 * DirectoryCache.RACY_NS
+        cache_file.write_text(json.dumps(stored))
+        assert stored['dirs'][str(il_path)][3] == ['ilias.php']
+        assert stored['dirs'][str(il_path / 'include')][3] == []
+
+        cache = DirectoryCache(cache_file)
+        cache.load(DISCOVERY_FILES)
+        walker = TreeWalker(DISCOVERY_FILES, cache=cache)
+        assert walker.scan(il_path) == expected
+        assert walker.dirs_visited == 0
+        assert cache.misses == 0
+
+        # a new plugin changes the mtime of its slot directory only, which is the one directory listed again
+        new_plugin = plugin_path.parent / 'TestPlugin2'
+        new_plugin.mkdir()
+        (new_plugin / 'plugin.php').touch()
+        cache = DirectoryCache(cache_file)
+        cache.load(DISCOVERY_FILES)
+        walker = TreeWalker(DISCOVERY_FILES, cache=cache)
+        assert walker.scan(il_path)['plugin.php'] == [str(plugin_path / 'plugin.php'), str(new_plugin / 'plugin.php')]
+        assert walker.dirs_visited == 2
+        assert cache.misses == 2
+
+    def test_change_deep_in_a_subtree_without_targets(self, tmp_path):
+        deep = tmp_path / 'srv/empty/a/b'
+        deep.mkdir(parents=True)
+        cache_file = tmp_path / 'dircache.json'
+        cache = DirectoryCache(cache_file)
+        cache.load(DISCOVERY_FILES)
+        assert TreeWalker(DISCOVERY_FILES, cache=cache).scan(tmp_path / 'srv')['ilias.php'] == []
+        cache.save()
+        stored = json.loads(cache_file.read_text())
+        stored['started_ns'] += 10 * DirectoryCache.RACY_NS
+        cache_file.write_text(json.dumps(stored))
+
+        # only the mtime of b changes, the directories above it are unchanged and still not listed again
+        (deep / 'ILIAS').mkdir()
+        (deep / 'ILIAS/ilias.php').touch()
+        cache = DirectoryCache(cache_file)
+        cache.load(DISCOVERY_FILES)
+        walker = TreeWalker(DISCOVERY_FILES, cache=cache)
+        assert walker.scan(tmp_path / 'srv')['ilias.php'] == [str(deep / 'ILIAS/ilias.php')]
+        assert walker.dirs_visited == 2
+        assert cache.hits == 3
+
+    def test_full_rescan(self, tmp_path, setup_fake_ilias):
+        il_path = setup_fake_ilias()
+        cache_file = tmp_path / 'dircache.json'
+        cache = DirectoryCache(cache_file)
+        cache.load(DISCOVERY_FILES)
+        TreeWalker(DISCOVERY_FILES, cache=cache).scan(il_path)
+        cache.save()
+
+        cache = DirectoryCache(cache_file, full_rescan=True)
+        cache.load(DISCOVERY_FILES)
+        walker = TreeWalker(DISCOVERY_FILES, cache=cache)
+        walker.scan(il_path)
+        assert cache.hits == 0
+        assert walker.dirs_visited == 4
+
+    def test_other_targets_are_ignored(self, tmp_path, setup_fake_ilias):
+        il_path = setup_fake_ilias()
+        cache_file = tmp_path / 'dircache.json'
+        cache = DirectoryCache(cache_file)
+        cache.load(['ilias.php'])
+        TreeWalker(['ilias.php'], cache=cache).scan(il_path)
+        cache.save()
+
+        cache = DirectoryCache(cache_file)
+        cache.load(DISCOVERY_FILES)
+        assert TreeWalker(DISCOVERY_FILES, cache=cache).scan(il_path)['client.ini.php']
+        assert cache.hits == 0
+
+    def test_default_path(self, monkeypatch):
+        monkeypatch.setenv('XDG_CACHE_HOME', '/var/cache')
+        path = DirectoryCache.default_path('/')
+        assert path.parent == Path('/var/cache/ilinfo')
+        assert path != DirectoryCache.default_path('/srv')
+
+
+class TestPathTrie:
+    def test_nearest(self):
+        trie = PathTrie(['/var/www/ilias', '/var/www/ilias2', '/var/www/ilias/nested/ILIAS'])
+        assert trie.nearest('/var/www/ilias/Customizing/global/plugins/Test') == '/var/www/ilias'
+        assert trie.nearest('/var/www/ilias2/Customizing/global/plugins/Test') == '/var/www/ilias2'
+        assert trie.nearest('/var/www/ilias/nested/ILIAS/data/client') == '/var/www/ilias/nested/ILIAS'
+        assert trie.nearest('/var/www/ilias/') == '/var/www/ilias'
+        assert trie.nearest('/var/www/ilias_backup/data') is None
+        assert trie.nearest('/srv/var/www/ilias/data') is None
+        assert PathTrie().nearest('/var/www') is None
@@ -0,0 +1,230 @@
+# Created by Andre Machon 18/10/2026
+import subprocess
+import pytest as pt
+
+from ilinfo import GitHelper, IliasFileParser, IliasPathFinder
+from ilinfo.git import GitConfig, GitConfigError, find_repository, read_head
+
+
+def _git(path, *args):
+    return subprocess.run(['git', *args], cwd=path, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+
+
+def _git_remote_v(path):
+    return GitHelper()._run_git_remote(path)
+
+
+@pt.fixture
+def git_repo(tmp_path):
+    repo = tmp_path / 'repo'
+    repo.mkdir()
+    _git(repo, 'init', '-q')
+    _git(repo, 'remote', 'add', 'origin', 'https://github.com/ILIAS-eLearning/ILIAS.git')
+    return repo
+
+
+class TestFindRepository:
+    def test_directory(self, git_repo):
+        (git_repo / 'sub/dir').mkdir(parents=True)
+        repo = find_repository(git_repo / 'sub/dir')
+        assert repo.work_tree == str(git_repo)
+        assert repo.git_dir == repo.common_dir == str(git_repo / '.git')
+
+    def test_gitdir_file(self, git_repo):
+        module_dir = git_repo / '.git/modules/Plugin'
+        module_dir.mkdir(parents=True)
+        submodule = git_repo / 'Customizing/Plugin'
+        submodule.mkdir(parents=True)
+        (submodule / '.git').write_text('gitdir: ../../.git/modules/Plugin\n')
+
+        repo = find_repository(submodule)
+        assert repo.work_tree == str(submodule)
+        assert repo.git_dir == repo.common_dir == str(module_dir)
+
+    def test_worktree(self, git_repo, tmp_path):
+        (git_repo / 'file').touch()
+        _git(git_repo, 'add', '.')
+        _git(git_repo, '-c', 'user.name=test', '-c', 'user.email=test@example.com', 'commit', '-q', '-m', 'init')
+        _git(git_repo, 'worktree', 'add', '-q', str(tmp_path / 'worktree'))
+
+        repo = find_repository(tmp_path / 'worktree')
+        assert repo.common_dir == str(git_repo / '.git')
+        assert repo.git_dir != repo.common_dir
+
+    def test_outside(self, tmp_path):
+        assert find_repository(tmp_path) is None
+
+
+class TestGitConfig:
+    def test_values(self, tmp_path):
+        config_file = tmp_path / 'config'
+        config_file.write_text(
+            '# comment\n'
+            '[core]\n'
+            '\tbare\n'
+            '[remote "my \\"remote\\""]\n'
+            '\turl = "https://example.com/a b.git" ; comment\n'
+            '\tURL = https://example.com/\\\n'
+            'continued.git # comment\n'
+            '[Remote.Legacy] url = https://example.com/legacy.git\n'
+        )
+        config = GitConfig.read(config_file)
+        assert config.get_all('core', None, 'bare') == ['true']
+        assert config.get_all('remote', 'my "remote"', 'url') == [
+            'https://example.com/a b.git', 'https://example.com/continued.git'
+        ]
+        assert config.remotes() == {
+            'my "remote"': 'https://example.com/continued.git', 'legacy': 'https://example.com/legacy.git'
+        }
+
+    def test_invalid(self, tmp_path):
+        config_file = tmp_path / 'config'
+        config_file.write_text('[remote "origin"]\n\turl = "unterminated\n')
+        with pt.raises(GitConfigError):
+            GitConfig.read(config_file)
+        with pt.raises(GitConfigError):
+            GitConfig.read(tmp_path / 'missing')
+        assert GitConfig.read(tmp_path / 'missing', missing_ok=True).remotes() == {}
+
+
+class TestGitHelperRemotes:
+    def test_matches_git(self, git_repo):
+        _git(git_repo, 'remote', 'add', 'fork', 'git@github.com:ajbmachon/ILIAS.git')
+        _git(git_repo, 'remote', 'set-url', '--push', 'fork', 'git@github.com:ajbmachon/ILIAS-push.git')
+        _git(git_repo, 'config', 'url.git@github.com:.pushInsteadOf', 'https://github.com/')
+        _git(git_repo, 'config', 'url.https://mirror.example.com/.insteadOf', 'https://gitlab.com/')
+        _git(git_repo, 'remote', 'add', 'mirror', 'https://gitlab.com/ilias/ILIAS.git')
+
+        remotes = GitHelper().parse_git_remotes(git_repo)
+        assert remotes == {
+            'origin': 'git@github.com:ILIAS-eLearning/ILIAS.git',
+            'fork': 'git@github.com:ajbmachon/ILIAS-push.git',
+            'mirror': 'https://mirror.example.com/ilias/ILIAS.git'
+        }
+        assert remotes == _git_remote_v(git_repo)
+
+    def test_include(self, git_repo):
+        (git_repo / '.git/remotes.inc').write_text('[remote "included"]\n\turl = https://example.com/included.git\n')
+        _git(git_repo, 'config', 'include.path', 'remotes.inc')
+
+        remotes = GitHelper().parse_git_remotes(git_repo)
+        assert remotes['included'] == 'https://example.com/included.git'
+        assert remotes == _git_remote_v(git_repo)
+
+    def test_submodule(self, git_repo, tmp_path):
+        plugin = tmp_path / 'plugin'
+        plugin.mkdir()
+        _git(plugin, 'init', '-q')
+        (plugin / 'plugin.php').touch()
+        _git(plugin, 'add', '.')
+        _git(plugin, '-c', 'user.name=test', '-c', 'user.email=test@example.com', 'commit', '-q', '-m', 'init')
+        _git(git_repo, '-c', 'protocol.file.allow=always', 'submodule', '-q', 'add', str(plugin), 'Plugin')
+        _git(git_repo / 'Plugin', 'remote', 'add', 'github', 'https://github.com/example/Plugin.git')
+
+        remotes = GitHelper().parse_git_remotes(git_repo / 'Plugin')
+        assert remotes == {'origin': str(plugin), 'github': 'https://github.com/example/Plugin.git'}
+        assert remotes == _git_remote_v(git_repo / 'Plugin')
+
+    def test_conditional_include_falls_back_to_git(self, git_repo, monkeypatch):
+        _git(git_repo, 'config', 'includeIf.gitdir:/nowhere/.path', 'other.inc')
+        monkeypatch.setattr(GitHelper, '_run_git_remote', lambda self, path: {'fallback': 'used'})
+        assert GitHelper().parse_git_remotes(git_repo) == {'fallback': 'used'}
+
+    def test_config_is_read_once(self, git_repo, monkeypatch):
+        (git_repo / 'PluginA').mkdir()
+        (git_repo / 'PluginB').mkdir()
+        reads = []
+        original = GitConfig.read.__func__
+        monkeypatch.setattr(GitConfig, 'read', classmethod(lambda cls, path, *a, **kw: reads.append(path) or original(
+            cls, path, *a, **kw)))
+
+        git_helper = GitHelper()
+        assert git_helper.parse_git_remotes(git_repo / 'PluginA') == git_helper.parse_git_remotes(git_repo / 'PluginB')
+        assert [str(path) for path in reads].count(str(git_repo / '.git/config')) == 1
+
+    def test_outside_of_repository(self, tmp_path):
+        assert GitHelper().parse_git_remotes(tmp_path) == {}
+
+    @pt.mark.parametrize('err', [subprocess.CalledProcessError(128, ['git', 'remote', '-v']), OSError('no git')])
+    def test_git_remote_fails(self, git_repo, monkeypatch, caplog, err):
+        def run(*args, **kwargs):
+            raise err
+
+        monkeypatch.setattr(subprocess, 'run', run)
+        assert _git_remote_v(git_repo) == {}
+        assert [record.levelname for record in caplog.records if record.name == 'ilinfo'] == ['WARNING']
+
+
+def _commit(path, message='commit'):
+    (path / message).write_text(message)
+    _git(path, 'add', '.')
+    _git(path, '-c', 'user.name=test', '-c', 'user.email=test@example.com', 'commit', '-q', '-m', message)
+    return _git(path, 'rev-parse', 'HEAD').stdout.decode().strip()
+
+
+@pt.fixture
+def cloned_repo(tmp_path, git_repo):
+    _commit(git_repo, 'initial')
+    _git(tmp_path, 'clone', '-q', str(git_repo), 'clone')
+    return tmp_path / 'clone'
+
+
+class TestReadHead:
+    def test_branch(self, git_repo):
+        commit = _commit(git_repo)
+        branch = _git(git_repo, 'symbolic-ref', '--short', 'HEAD').stdout.decode().strip()
+        assert read_head(find_repository(git_repo)) == (commit, branch)
+
+        _git(git_repo, 'pack-refs', '--all')
+        assert not (git_repo / '.git/refs/heads' / branch).exists()
+        assert read_head(find_repository(git_repo)) == (commit, branch)
+
+    def test_detached(self, git_repo):
+        commit = _commit(git_repo)
+        _git(git_repo, 'checkout', '-q', '--detach')
+        assert read_head(find_repository(git_repo)) == (commit, None)
+
+    def test_unborn_branch(self, git_repo):
+        head, branch = read_head(find_repository(git_repo))
+        assert head is None
+        assert branch
+
+
+class TestGitHelperStates:
+    def test_collect_states(self, tmp_path, cloned_repo):
+        (cloned_repo / 'Plugin').mkdir()
+        states = GitHelper().collect_states([cloned_repo, cloned_repo / 'Plugin', tmp_path])
+        state = states[str(cloned_repo)]
+        assert state == states[str(cloned_repo / 'Plugin')]
+        assert states[str(tmp_path)] is None
+        assert state['work_tree'] == str(cloned_repo)
+        assert state['head'] == _git(cloned_repo, 'rev-parse', 'HEAD').stdout.decode().strip()
+        assert state['upstream'] == f"origin/{state['branch']}"
+        assert (state['ahead'], state['behind'], state['dirty']) == (0, 0, False)
+
+        commit = _commit(cloned_repo, 'ahead')
+        (cloned_repo / 'initial').write_text('changed')
+        state = GitHelper().collect_states([cloned_repo])[str(cloned_repo)]
+        assert state['head'] == commit
+        assert (state['ahead'], state['behind'], state['dirty']) == (1, 0, True)
+        assert 'error' not in state
+
+    def test_timeout(self, cloned_repo):
+        _commit(cloned_repo, 'ahead')
+        state = GitHelper().collect_states([cloned_repo], timeout=0.000001)[str(cloned_repo)]
+        assert state['head']
+        assert state['ahead'] is None
+        assert state['dirty'] is None
+        assert 'timed out' in state['error']
+
+    def test_parser_adds_states(self, setup_git_plugin_repo):
+        il_path = setup_git_plugin_repo.parents[6]
+        pathfinder = IliasPathFinder()
+        pathfinder.discover(il_path)
+        data = IliasFileParser(git_state=True).parse_from_pathfinder(pathfinder)
+
+        assert data[str(il_path)]['git'] is None
+        plugin_state = data[str(il_path)]['plugin.php'][0]['git']
+        assert plugin_state['work_tree'] == str(setup_git_plugin_repo)
+        assert plugin_state['dirty'] in (True, False)
+        assert plugin_state['upstream'] is None
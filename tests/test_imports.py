@@ -0,0 +1,79 @@
+# Created by Andre Machon 18/10/2026
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest as pt
+
+ROOT = Path(__file__).parents[1]
+# packages of optional stages, none of them may be imported by a command that does not use the stage
+OPTIONAL_MODULES = ('mysql', 'asyncio', 'sqlite3', 'configparser', 'concurrent', 'multiprocessing', 'ilinfo.db',
+                    'ilinfo.cache', 'ilinfo.metrics', 'ilinfo.collect', 'ilinfo.watch', 'ilinfo.combine', 'ilinfo.diff')
+# the imports of a command may take this many times as long as "import click", which every command needs, measured
+# in the same run, so the budget does not depend on the speed of the machine. They take about 1.4 and 1.8 times as
+# long, importing mysql.connector alone takes about twice as long as click
+IMPORT_BUDGET_RATIO = {'--help': 2.5, 'analyze': 3.0}
+# runs of which the median counts, a single run that was lucky or disturbed does not
+RUNS = 7
+
+
+def _run(code):
+    """Runs code in a fresh interpreter with -X importtime
+
+    :return: the cumulative import time in microseconds of each top level import, and the names of all modules loaded
+        in the end
+    :rtype: tuple
+    """
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'{code}\nimport sys\nprint(*sys.modules)'], cwd=ROOT,
+        env=dict(os.environ, PYTHONPATH=str(ROOT)), stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+        universal_newlines=True, check=True
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        # nested imports are indented, they are part of the cumulative time of the top level one
+        if name[1] != ' ':
+            times[name.strip()] = int(cumulative)
+    return times, result.stdout.splitlines()[-1].split()
+
+
+def _import_milliseconds(code, startup):
+    """Returns the median of RUNS of the imports of code and of "import click", without the ones at startup, and
+    the modules code loaded
+
+    The runs of both alternate, so a machine that gets busier or calmer meanwhile slows down or speeds up both.
+
+    :rtype: tuple
+    """
+    milliseconds = {code: [], 'import click': []}
+    modules = None
+    for _ in range(RUNS):
+        for run_code, runs in milliseconds.items():
+            times, modules_loaded = _run(run_code)
+            runs.append(sum(t for name, t in times.items() if name not in startup) / 1000)
+            if run_code == code:
+                modules = modules_loaded
+    return statistics.median(milliseconds[code]), statistics.median(milliseconds['import click']), modules
+
+
+@pt.mark.parametrize('command', ['--help', 'analyze'])
+def test_import_budget(tmp_path, setup_fake_plugin, command):
+    setup_fake_plugin()
+    args = ['--help'] if command == '--help' else ['analyze', str(tmp_path), '-o', str(tmp_path / 'out')]
+    # tmp_path is in /tmp, which the CLI excludes
+    code = (f"from ilinfo.cli import main, EXCLUDED_FOLDERS\nEXCLUDED_FOLDERS.remove('/tmp')\n"
+            f"try:\n    main({args!r})\nexcept SystemExit:\n    pass")
+    # modules imported at startup, like site, are not the command's
+    startup, _ = _run('pass')
+
+    milliseconds, baseline, modules = _import_milliseconds(code, startup)
+
+    assert ('ilinfo.analyzers' in modules) == (command == 'analyze')
+    assert [m for m in modules if any(m == name or m.startswith(f'{name}.') for name in OPTIONAL_MODULES)] == []
+    assert milliseconds <= IMPORT_BUDGET_RATIO[command] * baseline, \
+        f"imports of ilinfo {command} took {milliseconds:.1f}ms, import click {baseline:.1f}ms"
@@ -0,0 +1,57 @@
+# Created by Andre Machon 18/10/2026
+import json
+import pytest as pt
+
+from ilinfo import Analyzer, IliasFileParser, IliasPathFinder, JSONOutput, StreamingJSONOutput
+from ilinfo.metrics import RunMetrics, COUNTERS
+
+
+def _analyze(tmp_path, il_path, processor_class, **kwargs):
+    metrics = RunMetrics(slowest=2)
+    analyzer = Analyzer(IliasFileParser(metrics=metrics, **kwargs), IliasPathFinder(metrics=metrics),
+                        output_processor=processor_class(output_path=tmp_path / 'out'), metrics=metrics)
+    analyzer.analyze_path(il_path)
+    return metrics.report(start_path=str(il_path))
+
+
+class TestRunMetrics:
+    @pt.mark.parametrize('processor_class', [JSONOutput, StreamingJSONOutput])
+    def test_report(self, tmp_path, setup_git_plugin_repo, processor_class):
+        il_path = setup_git_plugin_repo.parents[6]
+        report = _analyze(tmp_path, il_path, processor_class, git_state=True)
+
+        assert report['start_path'] == str(il_path)
+        assert {'discovery', 'parse', 'output', 'parse_ini', 'parse_plugins', 'git'} <= set(report['stages'])
+        assert set(report['counters']) == set(COUNTERS)
+        counters = report['counters']
+        assert counters['installations'] == 1 and counters['errors'] == 0
+        assert counters['dirs_visited'] > 0
+        # ilias.ini.php, .gitmodules, client.ini.php and plugin.php
+        assert counters['files_opened'] == 4
+        assert counters['bytes_read'] > 0
+        # git status for the dirty flag of the plugin's repository
+        assert counters['git_processes'] >= 1
+        assert len(report['slowest_files']) == len(report['slowest_dirs']) == 2
+        seconds = [entry['seconds'] for entry in report['slowest_files']]
+        assert seconds == sorted(seconds, reverse=True)
+
+    def test_stage_exclude(self):
+        metrics = RunMetrics()
+        with metrics.stage('output', exclude=('parse',)):
+            for _ in metrics.iterate('parse', range(3)):
+                pass
+        stages = metrics.report()['stages']
+        assert stages['parse']['calls'] == 4
+        assert stages['output']['wall_seconds'] >= 0
+
+    def test_write(self, tmp_path, setup_fake_ilias):
+        report = _analyze(tmp_path, setup_fake_ilias(), JSONOutput)
+        metrics = RunMetrics()
+        json_file = metrics.write_json(tmp_path / 'report/ilinfo-report.json', report)
+        assert json.loads(json_file.read_text()) == report
+
+        lines = metrics.write_prometheus(tmp_path / 'ilinfo.prom', report).read_text().splitlines()
+        assert '# TYPE ilinfo_last_run_files_opened gauge' in lines
+        assert f"ilinfo_last_run_files_opened {report['counters']['files_opened']}" in lines
+        assert any(line.startswith('ilinfo_last_run_stage_wall_seconds{stage="discovery"} ') for line in lines)
+        assert not list(tmp_path.glob('.*.tmp'))
@@ -1,9 +1,11 @@
 # Created by Andre Machon 16/02/2021
 import json
+import socket
+import sqlite3
 import pytest as pt
 from pathlib import Path
-from ilinfo.output_processors import OutputProcessor
-from ilinfo import JSONOutput, IliasFileParser, IliasPathFinder
+from ilinfo.output_processors import OutputProcessor, NDJSON_FORMAT_VERSION, SQLiteOutput, version_key
+from ilinfo import JSONOutput, StreamingJSONOutput, IliasFileParser, IliasPathFinder, Analyzer, AsyncAnalyzer
 
 
 class TestOutputProcessor:
@@ -22,8 +24,13 @@ class TestJsonOutputProcessor:
         # TODO more asserts
 
     def test_ilias_dicts(self):
+        view = self.json_out.ilias_dicts
+        assert self.json_out.ilias_dicts is view
         self.json_out.ilias_dicts = {'test': 'dict'}
         assert self.json_out.ilias_dicts == [{}, {}, {'test': 'dict'}]
+        assert view == [{}, {}]
+        with pt.raises(TypeError):
+            self.json_out.ilias_dicts[2]['test'] = 'changed'
 
     def test_output_data(self, setup_fake_plugin):
         finder = IliasPathFinder()
@@ -54,7 +61,9 @@ class TestJsonOutputProcessor:
                     }
                 ],
                 'plugin.php': [
-                    'source_file', 'version', 'ilias_min_version', 'ilias_max_version', 'responsible', 'remotes'
+                    {'source_file': str(plugin_path / 'plugin.php'), 'id': 'gp_webshopauth', 'version': '1.1.0',
+                     'ilias_min_version': '5.3.0', 'ilias_max_version': '5.4.999', 'responsible': 'Andre Machon',
+                     'responsible_mail': '<machon@qualitus.de>', 'remotes': {}}
                 ],
                 'ilias.ini.php': {
                     'source_file': result.get('ilias.ini.php', {}).get('source_file'),
@@ -86,3 +95,131 @@ class TestJsonOutputProcessor:
             self.json_out.output_data({})
         with pt.raises(ValueError):
             self.json_out.output_data(IliasFileParser())
+
+
+class TestStreamingJSONOutput:
+    def test_ndjson(self, tmp_path, setup_fake_ilias):
+        for name in ('customer_1', 'customer_2'):
+            setup_fake_ilias(name)
+        finder = IliasPathFinder()
+        finder.discover(tmp_path)
+        parser = IliasFileParser()
+        out = StreamingJSONOutput(output_path=tmp_path / 'out')
+
+        installations = parser.iter_installations(finder)
+        assert out.summary is None
+        out.begin()
+        out.write_installation(next(installations))
+        # the first installation is readable before the second one is parsed
+        with open(out.file_path) as f:
+            header, first = [json.loads(line) for line in f]
+        for installation in installations:
+            out.write_installation(installation)
+        file_path = out.finish()
+
+        assert not parser.data
+        with open(file_path) as f:
+            records = [json.loads(line) for line in f]
+        assert records[:2] == [header, first]
+        assert header['type'] == 'header'
+        assert header['format'] == NDJSON_FORMAT_VERSION
+        assert [r['ilias_path'] for r in records[1:3]] == [
+            str(tmp_path / 'customer_1/ILIAS'), str(tmp_path / 'customer_2/ILIAS')
+        ]
+        assert records[1]['data']['ilias.ini.php']['clients']['default'] == 'CLIENT_NAME'
+        assert records[3]['type'] == 'summary'
+        assert records[3] == out.summary
+        assert (out.summary['installations'], out.summary['errors']) == (2, 0)
+
+    @pt.mark.parametrize('analyzer_class', [Analyzer, AsyncAnalyzer])
+    def test_json_same_as_json_output(self, tmp_path, setup_fake_plugin, analyzer_class):
+        il_path = setup_fake_plugin('TestPlugin1').parents[6]
+        setup_fake_plugin('TestPlugin2')
+
+        json_path = Analyzer(output_processor=JSONOutput(output_path=tmp_path / 'json')).analyze_path(il_path)
+        streamed_path = analyzer_class(
+            output_processor=StreamingJSONOutput(output_path=tmp_path / 'stream', fmt='json')
+        ).analyze_path(il_path)
+
+        assert streamed_path.name == 'ilinfo.json'
+        assert streamed_path.read_bytes() == json_path.read_bytes()
+
+    def test_fmt(self, tmp_path):
+        with pt.raises(ValueError):
+            StreamingJSONOutput(output_path=tmp_path, fmt='xml')
+
+
+class TestSQLiteOutput:
+    def test_snapshots(self, tmp_path, setup_fake_plugin):
+        setup_fake_plugin('TestPlugin1')
+        il_path = setup_fake_plugin('TestPlugin2').parents[6]
+        out = SQLiteOutput(output_path=tmp_path / 'out', batch_size=1)
+        db_file = Analyzer(output_processor=out).analyze_path(il_path)
+        assert (out.snapshot, out.summary['installations']) == (1, 1)
+        # begin, write_installation and finish run in different threads of the executor
+        AsyncAnalyzer(output_processor=out).analyze_path(il_path)
+
+        columns, rows = SQLiteOutput.query(db_file, 'snapshots')
+        assert [row[columns.index('installations')] for row in rows] == [1, 1]
+        assert all(row[columns.index('finished_at')] for row in rows)
+
+        columns, rows = SQLiteOutput.query(db_file, 'plugins-older-than', {'plugin': 'gp_webshopauth',
+                                                                           'version': '1.10'})
+        # the two plugins of the latest snapshot, the first one is not current anymore
+        assert rows == [(socket.gethostname(), str(il_path), 'gp_webshopauth', '1.1.0')] * 2
+        assert SQLiteOutput.query(db_file, 'plugins-older-than', {'plugin': 'gp_webshopauth',
+                                                                  'version': '1.1.0'})[1] == []
+
+        _, rows = SQLiteOutput.query(db_file, 'clients-on-db-host', {'db_host': 'localhost'})
+        assert [row[1:4] for row in rows] == [(str(il_path), 'CLIENT_NAME', 'generic_db_name_123')]
+        _, rows = SQLiteOutput.query(db_file, 'SELECT COUNT(*), COUNT(DISTINCT snapshot) FROM plugins p '
+                                              'JOIN installations i ON i.id = p.installation')
+        assert rows == [(4, 2)]
+        _, rows = SQLiteOutput.query(db_file, 'SELECT name, url FROM current_submodules WHERE branch = :branch',
+                                     {'branch': 'r6'})
+        assert sorted(rows) == [('CountryLicenseTypes', '../plugins/CountryLicenseTypes.git'),
+                                ('LPOverview', '../../../iliasplugins/LPOverview.git')]
+        _, rows = SQLiteOutput.query(db_file, 'SELECT data FROM current_installations')
+        assert json.loads(rows[0][0])['ilias_path'] == str(il_path)
+
+    def test_failed_run_leaves_nothing(self, tmp_path, setup_fake_ilias):
+        ilias_path = setup_fake_ilias()
+        finder = IliasPathFinder()
+        finder.discover(tmp_path)
+        out = SQLiteOutput(output_path=tmp_path / 'out', batch_size=1)
+
+        def installations():
+            yield from IliasFileParser().iter_installations(finder)
+            raise RuntimeError('broken')
+
+        out.stream([{'ilias_path': str(ilias_path), 'error': 'unreadable'}])
+        with pt.raises(RuntimeError):
+            out.stream(installations())
+        _, rows = SQLiteOutput.query(out.file_path, 'SELECT id, errors FROM snapshots')
+        assert rows == [(1, 1)]
+        assert SQLiteOutput.query(out.file_path, 'SELECT error FROM installations')[1] == [('unreadable',)]
+
+    def test_started_at(self, tmp_path):
+        out = SQLiteOutput(output_path=tmp_path)
+        out.begin()
+        out.write_installation({'ilias_path': '/srv/a'}, host='web01', started_at='2026-10-01T02:00:00+00:00')
+        out.write_installation({'ilias_path': '/srv/b'})
+        out.finish()
+        _, rows = SQLiteOutput.query(out.file_path, 'SELECT i.started_at, s.started_at FROM installations i '
+                                                    'JOIN snapshots s ON s.id = i.snapshot ORDER BY i.ilias_path')
+        assert rows[0][0] == '2026-10-01T02:00:00+00:00'
+        assert rows[1][0] == rows[1][1]
+
+    def test_query_is_read_only(self, tmp_path):
+        out = SQLiteOutput(output_path=tmp_path)
+        out.stream([])
+        with pt.raises(sqlite3.OperationalError, match='readonly'):
+            SQLiteOutput.query(out.file_path, 'DELETE FROM snapshots')
+        with pt.raises(FileNotFoundError):
+            SQLiteOutput.query(tmp_path / 'missing.sqlite3', 'snapshots')
+
+
+def test_version_key():
+    versions = ['2.10.0', '1.1.0', '2.3', '2.3.1', '10.0']
+    assert sorted(versions, key=version_key) == ['1.1.0', '2.3', '2.3.1', '2.10.0', '10.0']
+    assert version_key(None) is None
@@ -0,0 +1,98 @@
+# Created by Andre Machon 18/10/2026
+import json
+import pickle
+import pytest as pt
+
+from ilinfo import IliasFileParser, IliasPathFinder, Installation, Client, Plugin, Submodule
+from ilinfo.records import Record, to_json
+from ilinfo.utils import thaw
+
+
+def _installation(ilias_path, plugin_version='1.1.0'):
+    # the values are built at runtime, like parse results, so equal strings are distinct objects
+    return {
+        'ilias_path': ilias_path,
+        'client.ini.php': [{'source_file': f'{ilias_path}/data/client/client.ini.php', 'client': {'name': 'client'},
+                            'db': {'host': 'localhost', 'port': ''}}],
+        'plugin.php': [{'source_file': f'{ilias_path}/Plugin/plugin.php',
+                        'version': '.'.join(plugin_version.split('.')),
+                        'remotes': {'origin': ''.join(['https://git.example.com/', 'Plugin.git'])}, 'git': None}],
+        'submodules': {'Plugin': {'path': 'Plugin', 'url': '../Plugin.git', 'branch': 'main'}},
+    }
+
+
+class TestRecords:
+    def test_from_dict(self):
+        d = _installation('/srv/www/ilias')
+        installation = Installation.from_dict(d)
+
+        assert installation == d
+        assert d == installation
+        assert installation != dict(d, ilias_path='/srv/www/other')
+        assert list(installation) == list(d)
+        assert isinstance(installation.clients[0], Client)
+        assert isinstance(installation.plugins[0], Plugin)
+        assert isinstance(installation.plugins[0]['remotes'], Record)
+        assert isinstance(installation.submodules['Plugin'], Submodule)
+        assert Installation.from_dict(installation) is installation
+
+    def test_fields(self):
+        installation = Installation.from_dict(_installation('/srv/www/ilias'))
+
+        assert installation.ilias_path == '/srv/www/ilias'
+        assert installation.error is None
+        assert installation.clients[0].name == 'client'
+        assert installation.clients[0].db == {'host': 'localhost', 'port': ''}
+        assert installation.plugins[0].version == '1.1.0'
+        assert installation.plugins[0].remotes == {'origin': 'https://git.example.com/Plugin.git'}
+        assert installation.submodules['Plugin'].branch == 'main'
+
+    def test_read_only(self):
+        plugin = Installation.from_dict(_installation('/srv/www/ilias')).plugins[0]
+        with pt.raises(TypeError):
+            plugin['version'] = '2.0.0'
+        with pt.raises(AttributeError):
+            plugin.version = '2.0.0'
+        with pt.raises(AttributeError):
+            plugin.other = 1
+        with pt.raises(TypeError):
+            hash(plugin)
+
+    def test_shared_shapes_and_interned_values(self):
+        first = Installation.from_dict(_installation('/srv/www/first')).plugins[0]
+        second = Installation.from_dict(_installation('/srv/www/second')).plugins[0]
+
+        assert first._shape is second._shape
+        assert first.version is second.version
+        assert first.remotes['origin'] is second.remotes['origin']
+
+    def test_json(self):
+        d = _installation('/srv/www/ilias')
+        installation = Installation.from_dict(d)
+
+        assert json.dumps({'/srv/www/ilias': installation}, default=to_json) == json.dumps({'/srv/www/ilias': d})
+        with pt.raises(TypeError):
+            json.dumps(object(), default=to_json)
+
+    def test_pickle_and_thaw(self):
+        installation = Installation.from_dict(_installation('/srv/www/ilias'))
+        restored = pickle.loads(pickle.dumps(installation))
+        assert type(restored) is Installation
+        assert restored == installation
+        assert restored.plugins[0]._shape is installation.plugins[0]._shape
+
+        thawed = thaw(installation)
+        assert type(thawed) is dict
+        assert type(thawed['plugin.php'][0]['remotes']) is dict
+        assert thawed == installation
+
+    def test_parser_returns_records(self, setup_fake_plugin):
+        pathfinder = IliasPathFinder()
+        pathfinder.discover(setup_fake_plugin().parents[6])
+        parser = IliasFileParser()
+        parser.parse_from_pathfinder(pathfinder)
+
+        installation = next(iter(parser.data.values()))
+        assert isinstance(installation, Installation)
+        assert installation.plugins[0].responsible == 'Andre Machon'
+        assert installation.clients[0].name == 'CLIENT_NAME'
@@ -1,7 +1,10 @@
 # Created by Andre Machon 14/02/2021
 import pytest as pt
+import copy
+import json
+import pickle
 
-from ilinfo.utils import parse_ini_to_dict
+from ilinfo.utils import FrozenDict, FrozenList, IniReader, freeze, parse_ini_to_dict, thaw, _parse_ini_configparser
 from tests.conftest import ilias_ini_path
 
 
@@ -41,3 +44,77 @@ def test_ini_parsing(ilias_ini_path):
 
     with pt.raises(TypeError, match=r"parse_config needs to be a dictionary"):
         parse_ini_to_dict(file_path=ilias_ini_path, parse_config='invalid_argument_type')
+
+
+def test_freeze():
+    d = {'plugins': [{'version': '1.0', 'remotes': {}}], 'path': '/srv/www/ilias'}
+    frozen = freeze(d)
+
+    assert frozen == d
+    assert isinstance(frozen['plugins'], FrozenList)
+    assert isinstance(frozen['plugins'][0]['remotes'], FrozenDict)
+    assert freeze(frozen) is frozen
+    assert copy.deepcopy(frozen) is frozen
+    assert json.dumps(frozen) == json.dumps(d)
+    assert pickle.loads(pickle.dumps(frozen)) == d
+    for change in (lambda: frozen.update(path=''), lambda: frozen['plugins'].pop(),
+                   lambda: frozen['plugins'][0].setdefault('id', ''), lambda: frozen['plugins'].__iadd__([])):
+        with pt.raises(TypeError):
+            change()
+
+    thawed = thaw(frozen)
+    thawed['plugins'][0]['remotes']['origin'] = 'url'
+    assert type(thawed['plugins'][0]) is dict
+    assert frozen['plugins'][0]['remotes'] == {}
+
+
+INI_VARIANTS = {
+    'plain': '[server]\nhttp_path = "https://ilias.example.com"\n[clients]\ndefault = "CLIENT"\n',
+    'crlf_and_comments': '; comment\r\n[server]\r\n# comment\r\nHTTP_Path: "https://x"\r\n\r\n[empty]\r\n',
+    'quotes': '[server]\nhttp_path = ""https://x""\nabsolute_path =\n[clients]\ndefault = "a = b"\n',
+    'percent': '[server]\nhttp_path = "https://x/%%20"\n',
+    'bad_percent': '[server]\nhttp_path = "https://x/%20"\n',
+    'continuation': '[server]\nhttp_path = "https://x"\n  continued\n[clients]\ndefault = a\n',
+    'default_section': '[DEFAULT]\nhttp_path = "https://default"\n[server]\nabsolute_path = /srv\n',
+    'duplicate_section': '[server]\nhttp_path = a\n[clients]\n[server]\nabsolute_path = b\n',
+    'duplicate_option': '[server]\nhttp_path = a\nhttp_path = b\n',
+    'no_section_header': 'http_path = a\n[server]\n',
+    'no_value': '[server]\nhttp_path\n',
+    'sections_after_last_option': '[clients]\ndefault = a\npath = data\ninifile = c\ndatadir = d\n'
+                                  '[server]\nhttp_path = h\nabsolute_path = p\n[setup]\npass = x\n[log]\n',
+}
+
+
+@pt.mark.parametrize('parse_config', [
+    None, {}, {'server': ['http_path', 'absolute_path'], 'clients': ['path', 'inifile', 'datadir', 'default']}
+])
+@pt.mark.parametrize('name', sorted(INI_VARIANTS) + ['ilias.ini.php', 'client.ini.php', 'missing'])
+def test_ini_reader_matches_configparser(tmp_path, ilias_ini_path, client_ini_path, name, parse_config):
+    if name == 'ilias.ini.php':
+        file_path = str(ilias_ini_path)
+    elif name == 'client.ini.php':
+        file_path = str(client_ini_path)
+    else:
+        file_path = str(tmp_path / f'{name}.ini.php')
+        if name in INI_VARIANTS:
+            with open(file_path, 'w', newline='') as f:
+                f.write(INI_VARIANTS[name])
+
+    def parse(func):
+        try:
+            return func(file_path, parse_config)
+        except Exception as err:
+            return type(err)
+
+    assert parse(lambda *args: IniReader(parse_config).read(file_path)) == parse(_parse_ini_configparser)
+
+
+def test_ini_reader_read_many(ilias_ini_path, client_ini_path):
+    reader = IniReader({'db': ['host', 'port']})
+    results = reader.read_many([str(client_ini_path), str(ilias_ini_path), ''])
+
+    assert results[0]['db'] == {'host': 'localhost', 'port': ''}
+    assert results[1]['server'] == {}
+    assert results[2] is None
+    with pt.raises(TypeError):
+        IniReader(['db'])
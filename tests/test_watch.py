@@ -0,0 +1,136 @@
+# Created by Andre Machon 18/10/2026
+import json
+import time
+import pytest as pt
+
+from ilinfo import IliasFileParser, IliasPathFinder, JSONOutput
+from ilinfo.watch import InventoryWatcher, InotifyBackend, PollingBackend
+
+
+def _backends():
+    yield pt.param(lambda: PollingBackend(interval=0.01), id='polling')
+    try:
+        InotifyBackend().close()
+        yield pt.param(InotifyBackend, id='inotify')
+    except (OSError, AttributeError):
+        pass
+
+
+@pt.fixture(params=list(_backends()))
+def watcher(request, tmp_path):
+    def _watcher(max_watches=8192):
+        w = InventoryWatcher(IliasPathFinder(), IliasFileParser(), JSONOutput(output_path=tmp_path / 'results'),
+                             debounce=0.05, max_watches=max_watches, backend=request.param())
+        request.addfinalizer(w.close)
+        return w
+    return _watcher
+
+
+def _poll_until(watcher, condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        watcher.poll(timeout=0.05)
+        if condition():
+            return True
+    return False
+
+
+def _plugins(output_path):
+    data = json.loads(output_path.read_text())
+    return {d['source_file']: d for installation in data.values() for d in installation['plugin.php']}
+
+
+class TestInventoryWatcher:
+    def test_plugin_changes(self, watcher, setup_fake_plugin):
+        plugin_path = setup_fake_plugin('TestPlugin1')
+        il_path = plugin_path.parents[6]
+        w = watcher()
+        output_path = w.start(il_path.parent)
+        plugin_php = str(plugin_path / 'plugin.php')
+        assert _plugins(output_path)[plugin_php]['version'] == '1.1.0'
+        # scan root, installation root, data dir, client dir, slot dir and plugin dir
+        assert w.watch_count == 6
+
+        (plugin_path / 'plugin.php').write_text('<?php\n$version = "1.2.0";\n')
+        assert _poll_until(w, lambda: _plugins(output_path)[plugin_php].get('version') == '1.2.0')
+
+        new_plugin = plugin_path.parent / 'TestPlugin2'
+        new_plugin.mkdir()
+        (new_plugin / 'plugin.php').write_text('<?php\n$version = "0.1.0";\n')
+        assert _poll_until(w, lambda: str(new_plugin / 'plugin.php') in _plugins(output_path))
+
+        (plugin_path / 'plugin.php').unlink()
+        plugin_path.rmdir()
+        assert _poll_until(w, lambda: plugin_php not in _plugins(output_path))
+
+    def test_plugin_moved_away(self, watcher, setup_fake_plugin, tmp_path):
+        plugin_path = setup_fake_plugin('TestPlugin1')
+        w = watcher()
+        output_path = w.start(plugin_path.parents[6])
+        plugin_php = str(plugin_path / 'plugin.php')
+        assert plugin_php in _plugins(output_path)
+        watch_count = w.watch_count
+
+        plugin_path.rename(tmp_path / 'TestPlugin1')
+        assert _poll_until(w, lambda: plugin_php not in _plugins(output_path))
+        assert w.watch_count == watch_count - 1
+
+    def test_new_installations(self, watcher, setup_fake_ilias, tmp_path):
+        setup_fake_ilias('srv/a')
+        w = watcher()
+        output_path = w.start(tmp_path / 'srv')
+        # scan root, the directory of the installation, its root, data dir and client dir
+        assert w.watch_count == 5
+
+        def installations():
+            return set(json.loads(output_path.read_text()))
+
+        created = setup_fake_ilias('srv/b')
+        assert _poll_until(w, lambda: str(created) in installations())
+
+        moved = setup_fake_ilias('elsewhere').rename(tmp_path / 'srv/a/ILIAS2')
+        assert _poll_until(w, lambda: str(moved) in installations())
+
+        # an installation that is still being cloned has no ilias.php yet
+        (tmp_path / 'srv/c').mkdir()
+        watch_count = w.watch_count
+        assert _poll_until(w, lambda: w.watch_count == watch_count + 1)
+        cloned = setup_fake_ilias('srv/c')
+        assert _poll_until(w, lambda: str(cloned) in installations())
+
+    def test_client_ini_change(self, watcher, setup_fake_ilias):
+        il_path = setup_fake_ilias()
+        w = watcher()
+        output_path = w.start(il_path.parent)
+
+        client_ini = il_path / 'data/example_client/client.ini.php'
+        client_ini.write_text(client_ini.read_text().replace('CLIENT_NAME', 'RENAMED_CLIENT'))
+
+        def renamed():
+            clients = json.loads(output_path.read_text())[str(il_path)]['client.ini.php']
+            return clients[0]['client']['name'] == 'RENAMED_CLIENT'
+        assert _poll_until(w, renamed)
+
+    def test_max_watches(self, watcher, setup_fake_plugin):
+        plugin_path = setup_fake_plugin('TestPlugin1')
+        setup_fake_plugin('TestPlugin2')
+        w = watcher(max_watches=4)
+        output_path = w.start(plugin_path.parents[7])
+        assert w.watch_count == 4
+        assert w.polled_count == 2
+
+        (plugin_path / 'plugin.php').write_text('<?php\n$version = "2.0.0";\n')
+        assert _poll_until(w, lambda: _plugins(output_path)[str(plugin_path / 'plugin.php')]['version'] == '2.0.0')
+
+    def test_events_are_coalesced(self, watcher, setup_fake_plugin, monkeypatch):
+        plugin_path = setup_fake_plugin('TestPlugin1')
+        w = watcher()
+        w.start(plugin_path.parents[7])
+
+        writes = []
+        original = JSONOutput.output_data
+        monkeypatch.setattr(JSONOutput, 'output_data', lambda self, parser: writes.append(1) or original(self, parser))
+        for i in range(20):
+            (plugin_path / 'plugin.php').write_text(f'<?php\n$version = "1.0.{i}";\n')
+        assert _poll_until(w, lambda: writes)
+        assert len(writes) == 1